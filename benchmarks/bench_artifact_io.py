@@ -0,0 +1,86 @@
+"""
+Benchmark serialization of the datasets passed between pipeline components.
+
+For each hop the same data is written and read back in every artifact format, reporting write time,
+read time and file size (which is also what gets transferred to/from MinIO).
+
+Usage:
+    python benchmarks/bench_artifact_io.py --n_messages 200000
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT_DIR, 'components', 'common'))
+
+from artifact_io import read_dataset, write_dataset  # noqa: E402
+from synthetic_sms import generate_messages  # noqa: E402
+
+FORMATS = [('csv', 'none'), ('parquet', 'zstd'), ('parquet', 'snappy'), ('arrow', 'lz4'), ('arrow', 'none')]
+
+
+def time_call(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def bench_tabular(hop: str, df: pd.DataFrame, workdir: str):
+    for fmt, compression in FORMATS:
+        directory = os.path.join(workdir, f"{hop}-{fmt}-{compression}")
+        path, write_s = time_call(lambda: write_dataset(df, directory, "train", fmt, compression))
+        _, read_s = time_call(lambda: read_dataset(directory, "train"))
+        label = f"{fmt}/{compression}"
+        print(f"{hop:<14} {label:<16} {write_s:9.3f} {read_s:9.3f} {os.path.getsize(path) / 2**20:10.2f}")
+
+
+def bench_features(df: pd.DataFrame, max_features: int, workdir: str):
+    X = TfidfVectorizer(max_features=max_features).fit_transform(df['text'])
+    y = df['target'].to_numpy()
+
+    # Dense CSV, as feature engineering used to write it
+    if X.shape[0] * X.shape[1] <= 5e7:
+        dense = pd.DataFrame(X.toarray())
+        dense['label'] = y
+        path = os.path.join(workdir, 'features.csv')
+        _, write_s = time_call(lambda: dense.to_csv(path, index=False))
+        _, read_s = time_call(lambda: pd.read_csv(path))
+        print(f"{'features':<14} {'dense csv':<16} {write_s:9.3f} {read_s:9.3f} {os.path.getsize(path) / 2**20:10.2f}")
+    else:
+        print(f"{'features':<14} {'dense csv':<16} {'skipped (too large to densify)':>30}")
+
+    path = os.path.join(workdir, 'features.npz')
+    _, write_s = time_call(lambda: np.savez_compressed(path, data=X.data, indices=X.indices, indptr=X.indptr,
+                                                       shape=np.array(X.shape), label=y))
+    _, read_s = time_call(lambda: dict(np.load(path)))
+    print(f"{'features':<14} {'sparse npz':<16} {write_s:9.3f} {read_s:9.3f} {os.path.getsize(path) / 2**20:10.2f}")
+
+
+def main(n_messages: int, max_features: int, seed: int):
+    raw = pd.DataFrame(generate_messages(n_messages, seed=seed), columns=['target', 'text'])
+    # Stand-in for the preprocessing output: encoded target and normalized text
+    processed = pd.DataFrame({'target': (raw['target'] == 'spam').astype(np.int64),
+                              'text': raw['text'].str.lower().str.replace(r'[^a-z0-9 ]', '', regex=True)})
+
+    print(f"messages: {n_messages}")
+    print(f"{'hop':<14} {'format':<16} {'write s':>9} {'read s':>9} {'size MiB':>10}")
+    with tempfile.TemporaryDirectory() as workdir:
+        bench_tabular('ingest', raw, workdir)
+        bench_tabular('preprocess', processed, workdir)
+        bench_features(processed, max_features, workdir)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n_messages", type=int, default=200000, help="Number of synthetic messages")
+    parser.add_argument("--max_features", type=int, default=100, help="TF-IDF vocabulary size for the feature hop")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for the synthetic corpus")
+    args = parser.parse_args()
+    main(n_messages=args.n_messages, max_features=args.max_features, seed=args.seed)
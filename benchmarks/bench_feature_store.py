@@ -0,0 +1,97 @@
+"""
+Measure cold-start load time and peak RSS of the train/evaluate feature loading paths.
+
+Each loader runs in a fresh subprocess (as a pod would, Linux only), loads the feature matrix and reads its first
+1000 rows (the first mini-batch a consumer would touch), then reports its wall time and peak RSS:
+
+    dense csv   pd.read_csv(...).iloc[:, :-1].values, the original path
+    npz         compressed CSR arrays, decompressed into memory
+    store       feature store buffers opened with mmap (no copy)
+
+Usage:
+    python benchmarks/bench_feature_store.py --n_rows 200000 --n_features 5000
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COMMON_DIR = os.path.join(ROOT_DIR, 'components', 'common')
+sys.path.append(COMMON_DIR)
+
+from feature_store import save_features  # noqa: E402
+
+# Code executed in the child process for each loader; it prints a JSON line with its measurements
+# Library imports happen before the timer starts so that only the loading itself is measured
+CHILD_TEMPLATE = """
+import sys, time, json
+sys.path.append({common_dir!r})
+def peak_rss_kib():
+    # VmHWM is reset on exec, unlike ru_maxrss which would include this benchmark's own footprint
+    with open('/proc/self/status') as status:
+        return next(int(line.split()[1]) for line in status if line.startswith('VmHWM:'))
+import numpy as np, pandas as pd
+from scipy import sparse
+from feature_store import load_features
+rss_before = peak_rss_kib()
+start = time.perf_counter()
+{load}
+checksum = float(X[:1000].sum())
+elapsed = time.perf_counter() - start
+rss_after = peak_rss_kib()
+print(json.dumps({{'seconds': elapsed, 'peak_rss_mib': rss_after / 1024, 'rss_growth_mib': (rss_after - rss_before) / 1024}}))
+"""
+
+LOADERS = {
+    'dense csv': "df = pd.read_csv({dir!r} + '/train.csv')\nX = df.iloc[:, :-1].values\ny = df.iloc[:, -1].values",
+    'npz': ("with np.load({dir!r} + '/train.npz') as f:\n"
+            "    X = sparse.csr_matrix((f['data'], f['indices'], f['indptr']), shape=tuple(f['shape']))\n    y = f['label']"),
+    'store': "X, y = load_features({dir!r}, 'train', mmap=True)",
+}
+
+
+def run_child(code: str) -> dict:
+    output = subprocess.run([sys.executable, '-c', code], check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(n_rows: int, n_features: int, density: float, seed: int):
+    rng = np.random.default_rng(seed)
+    X = sparse.random(n_rows, n_features, density=density, format='csr', dtype=np.float32, random_state=rng)
+    y = rng.integers(0, 2, size=n_rows)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        np.savez_compressed(os.path.join(workdir, 'train.npz'), data=X.data, indices=X.indices, indptr=X.indptr,
+                            shape=np.array(X.shape), label=y)
+        save_features(X, y, workdir, 'train')
+        loaders = dict(LOADERS)
+        if n_rows * n_features <= 5e7:
+            dense = pd.DataFrame(X.toarray())
+            dense['label'] = y
+            dense.to_csv(os.path.join(workdir, 'train.csv'), index=False)
+            del dense
+        else:
+            loaders.pop('dense csv')
+
+        print(f"rows: {n_rows}  features: {n_features}  nnz: {X.nnz}")
+        print(f"{'loader':<10} {'seconds':>9} {'peak RSS MiB':>13} {'RSS growth MiB':>15}")
+        for name, load in loaders.items():
+            result = run_child(CHILD_TEMPLATE.format(common_dir=COMMON_DIR, load=load.format(dir=workdir)))
+            print(f"{name:<10} {result['seconds']:9.3f} {result['peak_rss_mib']:13.1f} {result['rss_growth_mib']:15.1f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n_rows", type=int, default=200000, help="Number of rows in the feature matrix")
+    parser.add_argument("--n_features", type=int, default=5000, help="Number of feature columns")
+    parser.add_argument("--density", type=float, default=0.002, help="Fraction of non-zero entries")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    args = parser.parse_args()
+    main(n_rows=args.n_rows, n_features=args.n_features, density=args.density, seed=args.seed)
@@ -0,0 +1,72 @@
+"""
+Compare the classifier backends of model_training.py on the same TF-IDF features.
+
+For each backend in MODEL_BACKENDS (with the hyperparameters from params.yaml) the benchmark reports the
+fit time, the time to predict the held-out rows, and test accuracy/AUC, plus the speedups relative to
+the RandomForest backend. The synthetic corpus uses word noise so the classes overlap and the accuracy
+column is meaningful.
+
+Usage:
+    python benchmarks/bench_model_backends.py --size 100000 --max_features 100
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+import yaml
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics import accuracy_score, roc_auc_score
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, 'components', 'train-model'))
+sys.path.append(os.path.join(ROOT, 'components', 'evaluate-model'))
+from synthetic_sms import generate_messages  # noqa: E402
+from model_training import MODEL_BACKENDS, build_model  # noqa: E402
+from model_evaluation import positive_class_scores  # noqa: E402
+
+
+def main(size: int, max_features: int, noise: float, seed: int, param_file_path: str):
+    with open(param_file_path, 'r') as file:
+        params = yaml.safe_load(file)['4_Model_Training']
+
+    messages = generate_messages(size, seed=seed, noise=noise)
+    split = int(size * 0.8)
+    vectorizer = TfidfVectorizer(max_features=max_features, dtype=np.float32)
+    X_train = vectorizer.fit_transform([text for _, text in messages[:split]])
+    X_test = vectorizer.transform([text for _, text in messages[split:]])
+    y = np.array([label == 'spam' for label, _ in messages], dtype=np.int64)
+    y_train, y_test = y[:split], y[split:]
+
+    print(f"rows: {size}  features: {max_features}  noise: {noise}  cores: {os.cpu_count()}")
+    print(f"{'backend':<24} {'fit s':>8} {'predict s':>10} {'accuracy':>9} {'auc':>7} {'fit speedup':>12} {'predict speedup':>16}")
+    baseline = None
+    for backend in MODEL_BACKENDS:
+        clf = build_model({**params, 'model': backend})
+        start = time.perf_counter()
+        clf.fit(X_train, y_train)
+        fit_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        y_pred = clf.predict(X_test)
+        scores = positive_class_scores(clf, X_test)
+        predict_time = time.perf_counter() - start
+
+        if baseline is None:
+            baseline = (fit_time, predict_time)
+        print(f"{backend:<24} {fit_time:>8.2f} {predict_time:>10.3f} {accuracy_score(y_test, y_pred):>9.4f} "
+              f"{roc_auc_score(y_test, scores):>7.4f} {baseline[0] / fit_time:>11.1f}x {baseline[1] / predict_time:>15.1f}x")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=100000, help="Dataset size (rows)")
+    parser.add_argument("--max_features", type=int, default=100, help="TF-IDF vocabulary size")
+    parser.add_argument("--noise", type=float, default=0.3, help="Fraction of words drawn from the other class")
+    parser.add_argument("--seed", type=int, default=2, help="Random seed")
+    parser.add_argument("--param_file_path", type=str, default=os.path.join(ROOT, 'params.yaml'), help="params.yaml to read 4_Model_Training from")
+    args = parser.parse_args()
+    main(size=args.size, max_features=args.max_features, noise=args.noise, seed=args.seed,
+         param_file_path=args.param_file_path)
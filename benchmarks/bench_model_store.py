@@ -0,0 +1,95 @@
+"""
+Compare model.mstore (components/common/model_store.py) with the plain pickle it replaces.
+
+A RandomForest is trained on synthetic TF-IDF features for each forest size; the benchmark then reports,
+for pickle and for the model store with each codec, the file size, the save time, the load time and the
+load + first prediction time (median of --repeats runs, file already in the page cache). The
+"no verify" row shows the cost of the checksum check.
+
+Usage:
+    python benchmarks/bench_model_store.py --size 50000 --n_estimators 50 200
+"""
+import gc
+import os
+import sys
+import time
+import pickle
+import argparse
+import statistics
+import tempfile
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, 'components', 'common'))
+from synthetic_sms import generate_messages  # noqa: E402
+from model_store import load_store, save_model, store_path  # noqa: E402
+
+
+def _median_time(fn, repeats: int) -> float:
+    times = []
+    for _ in range(repeats):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def _pickle_save(model, directory: str) -> str:
+    path = os.path.join(directory, 'model.pkl')
+    with open(path, 'wb') as file:
+        pickle.dump(model, file)
+    return path
+
+
+def _pickle_load(path: str):
+    with open(path, 'rb') as file:
+        return pickle.load(file)
+
+
+def main(size: int, forest_sizes: list, max_features: int, repeats: int, seed: int):
+    messages = generate_messages(size, seed=seed, noise=0.3)
+    X = TfidfVectorizer(max_features=max_features, dtype=np.float32).fit_transform([text for _, text in messages])
+    y = np.array([label == 'spam' for label, _ in messages], dtype=np.int64)
+    sample = X[:1]
+
+    print(f"rows: {size}  features: {max_features}  repeats: {repeats}")
+    print(f"{'trees':>6} {'format':<18} {'size MB':>8} {'save s':>8} {'load s':>8} {'load+predict s':>15} {'load speedup':>13}")
+    for n_estimators in forest_sizes:
+        model = RandomForestClassifier(n_estimators=n_estimators, random_state=seed, n_jobs=-1).fit(X, y)
+        with tempfile.TemporaryDirectory() as tmp:
+            start = time.perf_counter()
+            pickle_path = _pickle_save(model, tmp)
+            variants = [('pickle', time.perf_counter() - start, pickle_path, lambda path: _pickle_load(path))]
+            for compression in ('none', 'lz4', 'zstd'):
+                directory = os.path.join(tmp, compression)
+                start = time.perf_counter()
+                path = save_model(model, directory, compression)
+                variants.append((f"mstore {compression}", time.perf_counter() - start, path, load_store))
+            variants.append(('mstore no verify', None, store_path(os.path.join(tmp, 'none')),
+                             lambda path: load_store(path, verify=False)))
+
+            baseline = None
+            for name, save_time, path, loader in variants:
+                load_time = _median_time(lambda: loader(path), repeats)
+                first_prediction = _median_time(lambda: loader(path).predict_proba(sample), repeats)
+                baseline = baseline or load_time
+                save_column = f"{save_time:>8.3f}" if save_time is not None else f"{'-':>8}"
+                print(f"{n_estimators:>6} {name:<18} {os.path.getsize(path) / 2**20:>8.1f} {save_column} "
+                      f"{load_time:>8.3f} {first_prediction:>15.3f} {baseline / load_time:>12.1f}x")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=50000, help="Training rows (larger data grows deeper trees)")
+    parser.add_argument("--n_estimators", type=int, nargs='+', default=[50, 200], help="Forest sizes to benchmark")
+    parser.add_argument("--max_features", type=int, default=100, help="TF-IDF vocabulary size")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed loads per format (median is reported)")
+    parser.add_argument("--seed", type=int, default=2, help="Random seed")
+    args = parser.parse_args()
+    main(size=args.size, forest_sizes=args.n_estimators, max_features=args.max_features, repeats=args.repeats,
+         seed=args.seed)
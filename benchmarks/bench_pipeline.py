@@ -0,0 +1,279 @@
+"""
+End-to-end benchmark of the pipeline components on synthetic SMS corpora, compared with a stored baseline.
+
+For each corpus size a raw CSV with the spam.csv schema ingest.py expects (v1, v2, Unnamed: 2-4) is
+generated (and kept in --workdir for later runs). Then every component's main() runs in this process,
+no containers, in pipeline order:
+
+    data_ingestion -> data_preprocessing -> feature_engineering -> [model_tuning] -> train_model
+    -> evaluate_model -> batch_score (on the raw CSV)
+
+Each component writes its stage_metrics.json (components/common/instrumentation.py); the benchmark
+collects the wall time, CPU time, rows/second and peak memory of every stage (median over --repeats
+runs) and compares the times with --baseline. Peak memory is that of the benchmark process while the
+stage ran, so it includes what earlier components left allocated. A stage is flagged when it is slower
+than the baseline by more than --threshold percent and by at least --min_seconds (very short stages are
+mostly noise). The exit status is 1 when a stage is flagged, so the benchmark can gate CI. The pusher is
+not run, it needs an MLflow registry.
+
+Baselines are machine specific: record one on the machine that runs the comparison with
+--update_baseline (sizes already in the file and not benchmarked are kept).
+
+Usage:
+    python benchmarks/bench_pipeline.py --rows 10000 100000
+    python benchmarks/bench_pipeline.py --rows 10000 --update_baseline
+    python benchmarks/bench_pipeline.py --rows 1000000 --threshold 10 --repeats 3 --tuning
+"""
+import os
+import sys
+import json
+import shutil
+import logging
+import argparse
+import platform
+import statistics
+import importlib.util
+from datetime import datetime, timezone
+
+import yaml
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COMPONENTS = os.path.join(ROOT, 'components')
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from synthetic_sms import write_raw_corpus  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+
+def load_component(name: str, relative_path: str, verbose: bool):
+    """Import a component script (its directory name is not a valid package name) as a module."""
+    spec = importlib.util.spec_from_file_location(name, os.path.join(COMPONENTS, relative_path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    if not verbose and hasattr(module, 'console_handler'):
+        module.console_handler.setLevel(logging.WARNING)
+    return module
+
+
+def corpus_path(workdir: str, rows: int, seed: int, noise: float) -> str:
+    """Generate the raw corpus once per size, seed and noise level."""
+    path = os.path.join(workdir, f"raw_{rows}_{seed}_{noise}.csv")
+    if not os.path.exists(path):
+        print(f"Generating {rows} messages into {path}")
+        write_raw_corpus(path + '.tmp', rows, seed=seed, noise=noise)
+        os.replace(path + '.tmp', path)
+    return path
+
+
+def benchmark_params(params_path: str, run_dir: str, profile: bool) -> str:
+    """Copy params.yaml with the step and normalization caches off (every run recomputes) and profiling as requested."""
+    with open(params_path) as file:
+        params = yaml.safe_load(file)
+    params['step_cache'] = {**(params.get('step_cache') or {}), 'enabled': False}
+    preprocessing = params.get('2_Data_Preprocessing') or {}
+    params['2_Data_Preprocessing'] = {**preprocessing, 'normalization_cache': {
+        **(preprocessing.get('normalization_cache') or {}), 'enabled': False}}
+    params['instrumentation'] = {**(params.get('instrumentation') or {}), 'profile': profile}
+    path = os.path.join(run_dir, 'params.yaml')
+    with open(path, 'w') as file:
+        yaml.safe_dump(params, file)
+    return path
+
+
+def _require(step: str, *paths: str) -> None:
+    # Component mains log errors instead of raising; a missing output means the step failed
+    for path in paths:
+        if not os.path.exists(path) or (os.path.isdir(path) and not os.listdir(path)):
+            raise RuntimeError(f"{step} produced no output at {path}; see logs/ in the work directory.")
+
+
+def run_pipeline(modules: dict, raw_csv: str, run_dir: str, params_path: str, tuning: bool, workers: int) -> dict:
+    """Run every component once; return {component: stage_metrics dict}."""
+    out = lambda *parts: os.path.join(run_dir, *parts)
+    metrics = lambda step: out('stage_metrics', step)
+
+    modules['data_ingestion'].main(params_path, raw_csv, out('train'), out('test'), stage_metrics_path=metrics('data_ingestion'))
+    _require('data_ingestion', out('train'), out('test'))
+
+    modules['data_preprocessing'].main(out('train'), out('test'), out('train_processed'), out('test_processed'), 'text', 'target',
+                                       workers=workers, param_file_path=params_path,
+                                       stage_metrics_path=metrics('data_preprocessing'))
+    _require('data_preprocessing', out('train_processed'), out('test_processed'))
+
+    modules['feature_engineering'].main(params_path, out('train_processed'), out('test_processed'), out('train_tfidf'),
+                                        out('test_tfidf'), vectorizer_output_path=out('vectorizer'),
+                                        stage_metrics_path=metrics('feature_engineering'))
+    _require('feature_engineering', out('train_tfidf'), out('test_tfidf'), out('vectorizer'))
+
+    best_params_path = None
+    if tuning:
+        modules['model_tuning'].search(params_path, out('train_tfidf'), out('trials'), shard_index=0, num_shards=1,
+                                       stage_metrics_path=metrics('model_tuning'))
+        modules['model_tuning'].select([out('trials')], out('best_params'))
+        best_params_path = out('best_params')
+
+    modules['train_model'].main(params_path, out('train_tfidf'), out('model'), best_params_path=best_params_path,
+                                vectorizer_path=out('vectorizer'), stage_metrics_path=metrics('train_model'))
+    _require('train_model', out('model'))
+
+    modules['evaluate_model'].main(out('model'), out('test_tfidf'), out('metrics'), param_file_path=params_path,
+                                   stage_metrics_path=metrics('evaluate_model'))
+    _require('evaluate_model', out('metrics'))
+
+    modules['batch_score'].main(out('model'), raw_csv, out('scores'), param_file_path=params_path, text_column='v2',
+                                stage_metrics_path=metrics('batch_score'))
+    _require('batch_score', out('scores'))
+
+    results = {}
+    for step in modules:
+        path = os.path.join(out('stage_metrics'), step, 'stage_metrics.json')
+        if os.path.exists(path):
+            with open(path) as file:
+                results[step] = json.load(file)
+    return results
+
+
+def summarize(runs: list) -> dict:
+    """Median time per stage over repeated runs; peak memory is the largest seen."""
+    samples = {}
+    for run in runs:
+        for component, stage_metrics in run.items():
+            for stage in stage_metrics['stages']:
+                samples.setdefault(f"{component}/{stage['name']}", []).append(stage)
+            samples.setdefault(f"{component}/total", []).append(
+                {'seconds': stage_metrics['total_seconds'], 'cpu_seconds': None, 'rows': None,
+                 'peak_rss_mb': stage_metrics['peak_rss_mb']})
+
+    results = {}
+    for key, stages in samples.items():
+        seconds = statistics.median(stage['seconds'] for stage in stages)
+        cpu = [stage['cpu_seconds'] for stage in stages if stage['cpu_seconds'] is not None]
+        peaks = [stage['peak_rss_mb'] for stage in stages if stage['peak_rss_mb'] is not None]
+        rows = stages[0]['rows']
+        results[key] = {
+            'seconds': round(seconds, 4),
+            'cpu_seconds': round(statistics.median(cpu), 4) if cpu else None,
+            'rows': rows,
+            'rows_per_second': round(rows / seconds, 1) if rows and seconds > 0 else None,
+            'peak_rss_mb': max(peaks) if peaks else None,
+        }
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float, min_seconds: float) -> list:
+    """Print current vs baseline per stage; return the keys of stages flagged as slower."""
+    flagged = []
+    print(f"{'stage':<48} {'baseline s':>10} {'current s':>10} {'change':>8} {'rows/s':>11} {'peak MB':>8}")
+    for key, current in results.items():
+        base = baseline.get(key)
+        change = ''
+        flag = ''
+        if base and base['seconds'] > 0:
+            percent = (current['seconds'] - base['seconds']) / base['seconds'] * 100
+            change = f"{percent:+.1f}%"
+            if percent > threshold and current['seconds'] - base['seconds'] >= min_seconds:
+                flag = '  SLOWER'
+                flagged.append(key)
+        base_seconds = f"{base['seconds']:>10.3f}" if base else f"{'-':>10}"
+        rows_per_second = f"{current['rows_per_second']:>11.0f}" if current['rows_per_second'] else f"{'-':>11}"
+        peak = f"{current['peak_rss_mb']:>8.1f}" if current['peak_rss_mb'] is not None else f"{'-':>8}"
+        print(f"{key:<48} {base_seconds} {current['seconds']:>10.3f} {change:>8} {rows_per_second} {peak}{flag}")
+    return flagged
+
+
+def machine_info() -> dict:
+    return {'cpu_count': os.cpu_count(), 'python': platform.python_version(), 'platform': platform.platform()}
+
+
+def main(sizes: list, workdir: str, baseline_path: str, params_path: str, threshold: float, min_seconds: float,
+         repeats: int, update_baseline: bool, tuning: bool, workers: int, profile: bool, seed: int, noise: float,
+         output_path: str, verbose: bool) -> int:
+    workdir = os.path.abspath(workdir)
+    os.makedirs(workdir, exist_ok=True)
+    baseline_path, params_path = os.path.abspath(baseline_path), os.path.abspath(params_path)
+    output_path = os.path.abspath(output_path) if output_path else None
+    # Components write logs/ relative to the working directory; keep them out of the repository
+    os.chdir(workdir)
+    # In pipeline order (results are listed in this order too)
+    modules = {
+        'data_ingestion': load_component('ingest', 'data-ingestion/ingest.py', verbose),
+        'data_preprocessing': load_component('preprocess', 'data-preprocessing/preprocess.py', verbose),
+        'feature_engineering': load_component('feature_engineering', 'feature-engineering/feature_engineering.py', verbose),
+        'model_tuning': load_component('model_tuning', 'tune-model/model_tuning.py', verbose) if tuning else None,
+        'train_model': load_component('model_training', 'train-model/model_training.py', verbose),
+        'evaluate_model': load_component('model_evaluation', 'evaluate-model/model_evaluation.py', verbose),
+        'batch_score': load_component('batch_scoring', 'batch-score/batch_scoring.py', verbose),
+    }
+
+    baseline = {}
+    if os.path.exists(baseline_path):
+        with open(baseline_path) as file:
+            baseline = json.load(file)
+        if baseline.get('machine', {}).get('cpu_count') != os.cpu_count():
+            print(f"Warning: baseline was recorded on a machine with {baseline.get('machine', {}).get('cpu_count')} "
+                  f"cores, this one has {os.cpu_count()}")
+
+    all_results, flagged = {}, []
+    for rows in sizes:
+        raw_csv = corpus_path(workdir, rows, seed, noise)
+        runs = []
+        for repeat in range(repeats):
+            run_dir = os.path.join(workdir, f"run_{rows}")
+            shutil.rmtree(run_dir, ignore_errors=True)
+            os.makedirs(run_dir)
+            print(f"Running the pipeline on {rows} messages ({repeat + 1}/{repeats})")
+            runs.append(run_pipeline(modules, raw_csv, run_dir, benchmark_params(params_path, run_dir, profile),
+                                     tuning, workers))
+        all_results[str(rows)] = summarize(runs)
+
+        print(f"\n{rows} messages, median of {repeats} run(s):")
+        flagged += [f"{rows}: {key}" for key in
+                    compare(all_results[str(rows)], baseline.get('results', {}).get(str(rows), {}), threshold, min_seconds)]
+        print()
+
+    report = {'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'), 'machine': machine_info(),
+              'settings': {'repeats': repeats, 'tuning': tuning, 'workers': workers, 'seed': seed, 'noise': noise},
+              'results': all_results}
+    if output_path:
+        with open(output_path, 'w') as file:
+            json.dump(report, file, indent=4)
+
+    if update_baseline:
+        report['results'] = {**baseline.get('results', {}), **all_results}
+        with open(baseline_path, 'w') as file:
+            json.dump(report, file, indent=4)
+        print(f"Baseline written to {baseline_path}")
+        return 0
+
+    if flagged:
+        print(f"{len(flagged)} stage(s) slower than the baseline by more than {threshold}%:")
+        for key in flagged:
+            print(f"  {key}")
+        return 1
+    print(f"No stage slower than the baseline by more than {threshold}%." if baseline else
+          f"No baseline at {baseline_path}; run with --update_baseline to record one.")
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs='+', default=[10000], help="Corpus sizes to benchmark (e.g. 10000 up to 10000000)")
+    parser.add_argument("--workdir", type=str, default=os.path.join(ROOT, '.benchmark'), help="Corpora, pipeline outputs and logs")
+    parser.add_argument("--baseline", type=str, default=DEFAULT_BASELINE, help="Baseline JSON to compare with (or to write)")
+    parser.add_argument("--params", type=str, default=os.path.join(ROOT, 'params.yaml'), help="params.yaml the components run with")
+    parser.add_argument("--threshold", type=float, default=20.0, help="Flag stages slower than the baseline by more than this percentage")
+    parser.add_argument("--min_seconds", type=float, default=0.05, help="Ignore slowdowns smaller than this many seconds")
+    parser.add_argument("--repeats", type=int, default=1, help="Pipeline runs per size (the median time is reported)")
+    parser.add_argument("--update_baseline", action='store_true', help="Store these results as the baseline instead of comparing")
+    parser.add_argument("--tuning", action='store_true', help="Also run the hyperparameter search (one shard)")
+    parser.add_argument("--workers", type=int, default=1, help="Text normalization processes in preprocessing")
+    parser.add_argument("--profile", action='store_true', help="Write cProfile files per stage (slows the run down)")
+    parser.add_argument("--seed", type=int, default=42, help="Corpus seed")
+    parser.add_argument("--noise", type=float, default=0.1, help="Corpus class overlap (see synthetic_sms.generate_messages)")
+    parser.add_argument("--output", type=str, default=None, help="Also write this run's results to a JSON file")
+    parser.add_argument("--verbose", action='store_true', help="Show the components' INFO/DEBUG logs")
+    args = parser.parse_args()
+    sys.exit(main(sizes=args.rows, workdir=args.workdir, baseline_path=args.baseline, params_path=args.params,
+                  threshold=args.threshold, min_seconds=args.min_seconds, repeats=args.repeats,
+                  update_baseline=args.update_baseline, tuning=args.tuning, workers=args.workers, profile=args.profile,
+                  seed=args.seed, noise=args.noise, output_path=args.output, verbose=args.verbose))
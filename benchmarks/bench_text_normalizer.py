@@ -0,0 +1,64 @@
+"""
+Benchmark the cached TextNormalizer against the original per-row transform_text.
+
+Usage:
+    python benchmarks/bench_text_normalizer.py --n_messages 20000
+"""
+import os
+import sys
+import time
+import string
+import argparse
+
+import nltk
+from nltk.corpus import stopwords
+from nltk.stem.porter import PorterStemmer
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT_DIR, 'components', 'data-preprocessing'))
+
+from preprocess import TextNormalizer  # noqa: E402
+from synthetic_sms import generate_messages  # noqa: E402
+
+
+# Original implementation of transform_text, kept here as the benchmark baseline
+def legacy_transform_text(text: str) -> str:
+    ps = PorterStemmer()
+    text = text.lower()
+    text = nltk.word_tokenize(text)
+    text = [word for word in text if word.isalnum()]
+    text = [word for word in text if word not in stopwords.words('english')]
+    text = [word for word in text if word not in string.punctuation]
+    text = [ps.stem(word) for word in text]
+    return " ".join(text)
+
+
+def main(n_messages: int, seed: int):
+    texts = [text for _, text in generate_messages(n_messages, seed=seed)]
+
+    start = time.perf_counter()
+    legacy_output = [legacy_transform_text(text) for text in texts]
+    legacy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    normalizer = TextNormalizer()
+    new_output = normalizer.normalize_batch(texts)
+    new_seconds = time.perf_counter() - start
+
+    if legacy_output != new_output:
+        mismatches = sum(a != b for a, b in zip(legacy_output, new_output))
+        raise SystemExit(f"Output mismatch on {mismatches} of {n_messages} messages")
+
+    print(f"messages:              {n_messages}")
+    print(f"legacy transform_text: {n_messages / legacy_seconds:12.1f} msg/s ({legacy_seconds:.2f}s)")
+    print(f"TextNormalizer:        {n_messages / new_seconds:12.1f} msg/s ({new_seconds:.2f}s)")
+    print(f"speedup:               {legacy_seconds / new_seconds:12.1f}x")
+    print(f"stem cache:            {normalizer.cache_info()}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n_messages", type=int, default=20000, help="Number of synthetic messages")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for the synthetic corpus")
+    args = parser.parse_args()
+    main(n_messages=args.n_messages, seed=args.seed)
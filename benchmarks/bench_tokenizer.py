@@ -0,0 +1,130 @@
+"""
+Equivalence report and benchmark of the 'alnum' tokenizer against the NLTK one on a real dataset.
+
+TextNormalizer (components/common/text_normalizer.py) tokenizes with nltk.word_tokenize by default;
+2_Data_Preprocessing.tokenizer: alnum splits messages into runs of alphanumeric characters instead. This
+script normalizes every message of a raw CSV both ways and reports how far the results are apart:
+
+  * token streams (lowercased, alphanumeric tokens before stopword removal): messages whose streams
+    differ, and the multiset overlap of all tokens (shared / union)
+  * normalized messages (what preprocessing writes): messages whose text differs
+  * vocabulary: overlap of the --max_features most frequent stems (what a capped TF-IDF would keep)
+  * the tokens most often produced by only one of the two tokenizers
+  * throughput of TextNormalizer.normalize_batch with each tokenizer
+
+Usage:
+    python benchmarks/bench_tokenizer.py
+    python benchmarks/bench_tokenizer.py --data_url path/to/spam.csv --text_column v2 --output tokenizer_report.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from collections import Counter
+
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT_DIR, 'components', 'common'))
+
+from text_normalizer import TextNormalizer  # noqa: E402
+
+DEFAULT_DATA_URL = 'https://raw.githubusercontent.com/PrakashD2003/DATASETS/main/spam.csv'
+
+
+def overlap(first: Counter, second: Counter) -> float:
+    """Multiset overlap |first & second| / |first | second| (1.0 when both are empty)."""
+    union = sum((first | second).values())
+    return sum((first & second).values()) / union if union else 1.0
+
+
+def token_report(texts, nltk_normalizer: TextNormalizer, alnum_normalizer: TextNormalizer, top: int) -> dict:
+    """Compare the lowercased alphanumeric token streams of every distinct message."""
+    differing = 0
+    nltk_tokens, alnum_tokens = Counter(), Counter()
+    only_nltk, only_alnum = Counter(), Counter()
+    for text in texts:
+        text = text.lower()
+        first = Counter(nltk_normalizer.tokenize(text))
+        second = Counter(alnum_normalizer.tokenize(text))
+        nltk_tokens.update(first)
+        alnum_tokens.update(second)
+        if first != second:
+            differing += 1
+            only_nltk.update(first - second)
+            only_alnum.update(second - first)
+    return {'messages_differing': differing,
+            'messages_differing_pct': round(100.0 * differing / len(texts), 2) if texts else 0.0,
+            'nltk_tokens': sum(nltk_tokens.values()), 'alnum_tokens': sum(alnum_tokens.values()),
+            'token_overlap': round(overlap(nltk_tokens, alnum_tokens), 4),
+            'top_only_nltk': only_nltk.most_common(top), 'top_only_alnum': only_alnum.most_common(top)}
+
+
+def timed_normalize(normalizer: TextNormalizer, texts) -> tuple:
+    start = time.perf_counter()
+    normalized = normalizer.normalize_batch(texts)
+    return normalized, time.perf_counter() - start
+
+
+def main(data_url: str, text_column: str, encoding: str, max_features: int, top: int, output: str = None):
+    texts = pd.read_csv(data_url, encoding=encoding)[text_column].fillna("").astype(str).tolist()
+    distinct = list(dict.fromkeys(texts))
+
+    # Fresh normalizers, so both runs start with an empty stem cache
+    nltk_output, nltk_seconds = timed_normalize(TextNormalizer(tokenizer='nltk'), texts)
+    alnum_output, alnum_seconds = timed_normalize(TextNormalizer(tokenizer='alnum'), texts)
+
+    tokens = token_report(distinct, TextNormalizer(tokenizer='nltk'), TextNormalizer(tokenizer='alnum'), top)
+    normalized_differing = sum(first != second for first, second in zip(nltk_output, alnum_output))
+    nltk_stems = Counter(stem for text in nltk_output for stem in text.split())
+    alnum_stems = Counter(stem for text in alnum_output for stem in text.split())
+    nltk_top = {stem for stem, _ in nltk_stems.most_common(max_features)}
+    alnum_top = {stem for stem, _ in alnum_stems.most_common(max_features)}
+
+    report = {
+        'data_url': data_url, 'messages': len(texts), 'distinct_messages': len(distinct),
+        'tokens': tokens,
+        'normalized': {'messages_differing': normalized_differing,
+                       'messages_differing_pct': round(100.0 * normalized_differing / len(texts), 2) if texts else 0.0,
+                       'stem_overlap': round(overlap(nltk_stems, alnum_stems), 4)},
+        'vocabulary': {'max_features': max_features, 'nltk_terms': len(nltk_top), 'alnum_terms': len(alnum_top),
+                       'shared': len(nltk_top & alnum_top),
+                       'only_nltk': sorted(nltk_top - alnum_top), 'only_alnum': sorted(alnum_top - nltk_top)},
+        'throughput': {'nltk_messages_per_second': round(len(texts) / nltk_seconds, 1),
+                       'alnum_messages_per_second': round(len(texts) / alnum_seconds, 1),
+                       'speedup': round(nltk_seconds / alnum_seconds, 1)},
+    }
+
+    print(f"messages:                    {len(texts)} ({len(distinct)} distinct)")
+    print(f"token streams differing:     {tokens['messages_differing']} of {len(distinct)} distinct messages "
+          f"({tokens['messages_differing_pct']}%)")
+    print(f"tokens (nltk / alnum):       {tokens['nltk_tokens']} / {tokens['alnum_tokens']}, "
+          f"overlap {tokens['token_overlap']:.2%}")
+    print(f"normalized text differing:   {normalized_differing} of {len(texts)} messages "
+          f"({report['normalized']['messages_differing_pct']}%), stem overlap {report['normalized']['stem_overlap']:.2%}")
+    print(f"top {max_features} stems shared:       {report['vocabulary']['shared']} of {len(nltk_top)} / {len(alnum_top)} "
+          f"(only nltk: {report['vocabulary']['only_nltk']}, only alnum: {report['vocabulary']['only_alnum']})")
+    print(f"tokens only from nltk:       {tokens['top_only_nltk']}")
+    print(f"tokens only from alnum:      {tokens['top_only_alnum']}")
+    print(f"nltk tokenizer:              {report['throughput']['nltk_messages_per_second']:12.1f} msg/s ({nltk_seconds:.2f}s)")
+    print(f"alnum tokenizer:             {report['throughput']['alnum_messages_per_second']:12.1f} msg/s ({alnum_seconds:.2f}s)")
+    print(f"speedup:                     {report['throughput']['speedup']:12.1f}x")
+
+    if output:
+        with open(output, 'w') as file:
+            json.dump(report, file, indent=4)
+        print(f"report written to {output}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data_url", type=str, default=DEFAULT_DATA_URL, help="Raw CSV (path or URL), e.g. the pipeline's spam.csv")
+    parser.add_argument("--text_column", type=str, default='v2', help="Column holding the raw messages")
+    parser.add_argument("--encoding", type=str, default='utf-8', help="Encoding of the CSV")
+    parser.add_argument("--max_features", type=int, default=100, help="Vocabulary size compared (3_Feature_Engineering.max_features)")
+    parser.add_argument("--top", type=int, default=15, help="Number of tokens listed per tokenizer")
+    parser.add_argument("--output", type=str, default=None, help="Also write the report to a JSON file")
+    args = parser.parse_args()
+    main(data_url=args.data_url, text_column=args.text_column, encoding=args.encoding,
+         max_features=args.max_features, top=args.top, output=args.output)
@@ -0,0 +1,60 @@
+"""
+Compare RandomForest training wall-clock time: serial, parallel (n_jobs) and warm-start (incremental).
+
+For each dataset size the TF-IDF features of a synthetic corpus are used to train:
+
+    serial       n_jobs=1, all trees from scratch (the original behaviour)
+    parallel     n_jobs=-1, all trees from scratch
+    warm start   a forest trained on the first half of the data is extended with the same number of
+                 new trees on the second half (only the second fit is timed), n_jobs=-1
+
+Usage:
+    python benchmarks/bench_training.py --sizes 10000 50000 100000 --n_estimators 40
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from synthetic_sms import generate_messages  # noqa: E402
+
+
+def timed_fit(clf, X, y) -> float:
+    start = time.perf_counter()
+    clf.fit(X, y)
+    return time.perf_counter() - start
+
+
+def main(sizes: list, n_estimators: int, max_features: int, seed: int):
+    print(f"cores: {os.cpu_count()}  trees: {n_estimators}  features: {max_features}")
+    print(f"{'rows':>9} {'serial s':>9} {'parallel s':>11} {'warm start s':>13} {'speedup par':>12} {'speedup warm':>13}")
+    for size in sizes:
+        messages = generate_messages(size, seed=seed)
+        X = TfidfVectorizer(max_features=max_features, dtype=np.float32).fit_transform([text for _, text in messages])
+        y = np.array([label == 'spam' for label, _ in messages], dtype=np.int64)
+
+        serial = timed_fit(RandomForestClassifier(n_estimators=n_estimators, random_state=seed, n_jobs=1), X, y)
+        parallel = timed_fit(RandomForestClassifier(n_estimators=n_estimators, random_state=seed, n_jobs=-1), X, y)
+
+        half = size // 2
+        forest = RandomForestClassifier(n_estimators=n_estimators // 2, random_state=seed, n_jobs=-1, warm_start=True)
+        forest.fit(X[:half], y[:half])
+        forest.set_params(n_estimators=n_estimators)
+        warm = timed_fit(forest, X[half:], y[half:])
+
+        print(f"{size:>9} {serial:>9.2f} {parallel:>11.2f} {warm:>13.2f} {serial / parallel:>11.1f}x {serial / warm:>12.1f}x")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs='+', default=[10000, 50000, 100000], help="Dataset sizes (rows)")
+    parser.add_argument("--n_estimators", type=int, default=40, help="Number of trees")
+    parser.add_argument("--max_features", type=int, default=100, help="TF-IDF vocabulary size")
+    parser.add_argument("--seed", type=int, default=2, help="Random seed")
+    args = parser.parse_args()
+    main(sizes=args.sizes, n_estimators=args.n_estimators, max_features=args.max_features, seed=args.seed)
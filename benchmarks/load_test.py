@@ -0,0 +1,124 @@
+"""
+Load test for the inference server (components/serve-model/inference_server.py).
+
+Replays messages from a JSONL file (one JSON object per line, the message taken from the first of
+--fields present, e.g. 'text' or 'body') or from the synthetic SMS generator, with --concurrency client
+threads each keeping one HTTP connection open. Every request carries --batch messages. The harness
+reports throughput and latency percentiles, plus the server's mean micro-batch size, and exits with
+status 1 when the p99 latency exceeds --p99_target_ms.
+
+Usage:
+    python components/serve-model/inference_server.py <model_dir> <vectorizer_dir> --param_file_path params.yaml
+    python benchmarks/load_test.py --requests_file requests.jsonl --fields text body --concurrency 32 --requests 5000
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import http.client
+from urllib.parse import urlparse
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from synthetic_sms import generate_messages  # noqa: E402
+
+
+def load_messages(requests_file: str, fields: list) -> list:
+    messages = []
+    with open(requests_file, 'r', encoding='utf-8') as file:
+        for line in file:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            for field in fields:
+                if isinstance(record.get(field), str):
+                    messages.append(record[field])
+                    break
+    if not messages:
+        raise ValueError(f"No message found in {requests_file} under fields {fields}.")
+    return messages
+
+
+def client(url, payloads: list, latencies: list, errors: list) -> None:
+    connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=60)
+    for body in payloads:
+        start = time.perf_counter()
+        try:
+            connection.request('POST', '/predict', body=body, headers={'Content-Type': 'application/json'})
+            response = connection.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+                continue
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(str(e))
+            connection.close()
+            connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=60)
+            continue
+        latencies.append(time.perf_counter() - start)
+    connection.close()
+
+
+def get_json(url, path: str) -> dict:
+    connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=10)
+    connection.request('GET', path)
+    return json.loads(connection.getresponse().read())
+
+
+def main(url: str, requests_file: str, fields: list, n_requests: int, concurrency: int, batch: int,
+         p99_target_ms: float, seed: int) -> int:
+    url = urlparse(url)
+    if requests_file:
+        messages = load_messages(requests_file, fields)
+    else:
+        messages = [text for _, text in generate_messages(max(n_requests * batch, 1), seed=seed)]
+
+    # Replay the messages in order (cycling through the file) and deal requests round-robin to the clients
+    payloads = []
+    for i in range(n_requests):
+        texts = [messages[(i * batch + j) % len(messages)] for j in range(batch)]
+        payloads.append(json.dumps({'text': texts[0]} if batch == 1 else {'texts': texts}).encode('utf-8'))
+    latencies, errors = [], []
+    before = get_json(url, '/stats')
+    threads = [threading.Thread(target=client, args=(url, payloads[k::concurrency], latencies, errors))
+               for k in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    after = get_json(url, '/stats')
+
+    latencies_ms = np.array(latencies) * 1000
+    p50, p90, p99 = np.percentile(latencies_ms, [50, 90, 99]) if len(latencies_ms) else (float('nan'),) * 3
+    batches = after['batches'] - before['batches']
+    mean_batch = (after['messages'] - before['messages']) / batches if batches else 0.0
+    print(f"requests: {n_requests}  concurrency: {concurrency}  messages/request: {batch}  errors: {len(errors)}")
+    print(f"throughput: {len(latencies) / elapsed:.1f} req/s  ({len(latencies) * batch / elapsed:.1f} msg/s)")
+    print(f"latency ms: p50 {p50:.2f}  p90 {p90:.2f}  p99 {p99:.2f}  max {latencies_ms.max() if len(latencies_ms) else float('nan'):.2f}")
+    print(f"server batches: {batches}  mean batch size: {mean_batch:.1f} messages")
+
+    if errors or not p99 <= p99_target_ms:
+        print(f"FAILED: p99 {p99:.2f} ms (target {p99_target_ms} ms), {len(errors)} errors")
+        return 1
+    print(f"OK: p99 {p99:.2f} ms <= target {p99_target_ms} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", type=str, default="http://127.0.0.1:8080", help="Base URL of the inference server")
+    parser.add_argument("--requests_file", type=str, default=None, help="JSONL file to replay (default: synthetic SMS messages)")
+    parser.add_argument("--fields", type=str, nargs='+', default=['text'], help="Record fields to take the message from, in order of preference")
+    parser.add_argument("--requests", type=int, default=2000, help="Number of requests to send")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent client connections")
+    parser.add_argument("--batch", type=int, default=1, help="Messages per request")
+    parser.add_argument("--p99_target_ms", type=float, default=50.0, help="p99 latency target in milliseconds")
+    parser.add_argument("--seed", type=int, default=2, help="Seed of the synthetic messages")
+    args = parser.parse_args()
+    sys.exit(main(url=args.url, requests_file=args.requests_file, fields=args.fields, n_requests=args.requests,
+                  concurrency=args.concurrency, batch=args.batch, p99_target_ms=args.p99_target_ms, seed=args.seed))
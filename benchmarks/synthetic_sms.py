@@ -0,0 +1,63 @@
+import random
+import csv
+from typing import Iterator, List
+
+# Small vocabularies used to assemble synthetic SMS messages
+HAM_WORDS = [
+    "hey", "are", "you", "coming", "tonight", "i'll", "be", "there", "at", "home", "later", "call", "me",
+    "when", "get", "this", "ok", "lol", "dinner", "sorry", "can't", "talk", "now", "meeting", "tomorrow",
+    "love", "miss", "u", "going", "to", "the", "shop", "need", "anything", "running", "late", "good",
+    "morning", "night", "what's", "up", "happy", "birthday", "thanks", "see", "soon", "wat", "time",
+]
+SPAM_WORDS = [
+    "free", "win", "winner", "prize", "claim", "now", "urgent", "cash", "call", "txt", "reply", "stop",
+    "mobile", "offer", "guaranteed", "£1000", "award", "selected", "congratulations", "ringtone", "www",
+    "click", "link", "150p", "per", "msg", "chat", "dating", "service", "won", "voucher", "customer",
+    "landline", "08001234567", "expires", "today", "bonus", "entry", "weekly", "competition",
+]
+PUNCTUATION = ["", "", "", ".", "!", "?", ",", "...", "!!", " :)", " &lt;#&gt;"]
+
+
+def iter_messages(n_messages: int, spam_ratio: float = 0.13, seed: int = 42, noise: float = 0.0) -> Iterator[tuple]:
+    """Yield the synthetic (label, message) pairs of generate_messages one by one (same sequence for a seed)."""
+    rng = random.Random(seed)
+    for _ in range(n_messages):
+        is_spam = rng.random() < spam_ratio
+        words, other = (SPAM_WORDS, HAM_WORDS) if is_spam else (HAM_WORDS, SPAM_WORDS)
+        tokens = [rng.choice(other if noise and rng.random() < noise else words) + rng.choice(PUNCTUATION)
+                  for _ in range(rng.randint(3, 30))]
+        if rng.random() < 0.5:
+            tokens[0] = tokens[0].capitalize()
+        yield ("spam" if is_spam else "ham", " ".join(tokens))
+
+
+def generate_messages(n_messages: int, spam_ratio: float = 0.13, seed: int = 42, noise: float = 0.0) -> List[tuple]:
+    """
+    Generate synthetic (label, message) pairs that resemble the SMS spam corpus.
+
+    :param n_messages: Number of messages to generate
+    :param spam_ratio: Fraction of messages labelled 'spam'
+    :param seed: Random seed so that corpora are reproducible
+    :param noise: Probability that a word is drawn from the other class's vocabulary (0 keeps the classes
+                  perfectly separable; model comparisons need some overlap)
+    :return: List of (label, message) tuples with labels 'ham'/'spam'
+    """
+    return list(iter_messages(n_messages, spam_ratio, seed, noise))
+
+
+# Columns of the raw spam.csv that ingest.py reads (the three unnamed columns are empty)
+RAW_COLUMNS = ['v1', 'v2', 'Unnamed: 2', 'Unnamed: 3', 'Unnamed: 4']
+
+
+def write_raw_corpus(path: str, n_messages: int, spam_ratio: float = 0.13, seed: int = 42, noise: float = 0.0) -> str:
+    """
+    Write a synthetic corpus with the raw spam.csv schema (v1 label, v2 message, empty Unnamed: 2-4).
+
+    Rows are streamed to the file, so corpora of millions of messages are written in constant memory.
+    """
+    with open(path, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        writer.writerow(RAW_COLUMNS)
+        for label, message in iter_messages(n_messages, spam_ratio, seed, noise):
+            writer.writerow((label, message, '', '', ''))
+    return path
@@ -0,0 +1,250 @@
+import os
+import json
+import time
+import logging
+from collections import deque
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional
+import numpy as np
+import pandas as pd
+import yaml
+from datetime import datetime
+import argparse
+import sys
+
+# Shared helpers live in components/common (copied next to this script inside the container image)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from artifact_io import DatasetWriter, artifact_settings
+from inference_pipeline import LABELS, SpamInferencePipeline, load_inference_pipeline
+from instrumentation import StageRecorder, timed
+from text_normalizer import tokenizer_from_params
+
+# Ensure that a directory named 'logs' exist in our root folder (if not it creates one)(for storing log file)
+log_dir = 'logs'
+os.makedirs(log_dir,exist_ok=True)
+
+# Logging Configuration
+logger = logging.getLogger('Batch_Scoring')
+logger.setLevel('DEBUG')
+
+# Creating Handlers
+console_handler = logging.StreamHandler()
+file_handler_path = os.path.join(log_dir,"Batch_Scoring.log")
+file_handler = logging.FileHandler(file_handler_path,encoding="utf-8")
+
+# Setting Log Levels for Handlers
+console_handler.setLevel('DEBUG')
+file_handler.setLevel('DEBUG')
+
+# Creating a Formatter and attaching it to handelers
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+console_handler.setFormatter(formatter)
+file_handler.setFormatter(formatter)
+
+# Adding handlers to the logger
+logger.addHandler(console_handler)
+logger.addHandler(file_handler)
+
+
+logger.info("\n" + " "*50 + "="*60)
+logger.info(f"NEW RUN STARTED AT {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+logger.info("="*60 + "\n")
+
+# Function to Load Parameters from params.yaml
+def load_params(param_path:str) ->dict:
+    try:
+        logger.debug("Loading Params From: %s",param_path)
+        with open(param_path,'r') as file:
+            params = yaml.safe_load(file)
+        logger.info("Params Loaded Successfully From: %s",param_path)
+        return params
+    except FileNotFoundError:
+        logger.error('File not found: %s',param_path)
+        raise
+    except yaml.YAMLError as e:
+        logger.error('YAML error: %s',e)
+        raise
+    except Exception as e:
+        logger.debug('Unexpected error occured while loadind parameters: %s',e)
+        raise
+
+# Function to stream the input messages chunk by chunk
+def iter_message_chunks(input_path: str, columns: List[str], chunk_size: int, encoding: str = 'utf-8') -> Iterator[pd.DataFrame]:
+    """
+    Yield DataFrame chunks of at most chunk_size rows holding `columns` of the input.
+
+    The format is taken from the extension: .parquet and .arrow are read batch by batch with pyarrow,
+    .jsonl/.json as JSON lines, .txt as one message per line (column 'text'), anything else as CSV
+    (local path or URL). Only one chunk is held in memory at a time.
+    """
+    lower = input_path.lower()
+    if lower.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(input_path).iter_batches(batch_size=chunk_size, columns=columns):
+            yield batch.to_pandas()
+    elif lower.endswith('.arrow'):
+        import pyarrow as pa
+        with pa.memory_map(input_path, 'r') as source:
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i).select(columns)
+                for start in range(0, batch.num_rows, chunk_size):
+                    yield batch.slice(start, chunk_size).to_pandas()
+    elif lower.endswith(('.jsonl', '.json')):
+        for chunk in pd.read_json(input_path, lines=True, chunksize=chunk_size, encoding=encoding):
+            yield chunk[columns]
+    elif lower.endswith('.txt'):
+        if columns != ['text']:
+            raise ValueError("Plain text input has a single 'text' column.")
+        with open(input_path, 'r', encoding=encoding) as file:
+            lines = []
+            for line in file:
+                lines.append(line.rstrip('\n'))
+                if len(lines) == chunk_size:
+                    yield pd.DataFrame({'text': lines})
+                    lines = []
+            if lines:
+                yield pd.DataFrame({'text': lines})
+    else:
+        for chunk in pd.read_csv(input_path, usecols=columns, chunksize=chunk_size, encoding=encoding):
+            yield chunk
+
+# Model owned by a pool worker process, loaded once by the pool initializer
+_worker_pipeline: Optional[SpamInferencePipeline] = None
+
+@timed('load_model')
+def _init_scoring_worker(model_path: Optional[str], vectorizer_path: Optional[str],
+                         pipeline: Optional[SpamInferencePipeline] = None, tokenizer: str = 'nltk') -> None:
+    """Pool initializer: load the inference pipeline once per worker process (or adopt one already in memory)."""
+    global _worker_pipeline
+    _worker_pipeline = pipeline if pipeline is not None else load_inference_pipeline(model_path, vectorizer_path,
+                                                                                     tokenizer=tokenizer)
+
+def _score_texts(texts: List[str]) -> tuple:
+    """Normalize, vectorize and score one chunk of messages inside a worker."""
+    return _worker_pipeline.predict_scores(texts)
+
+# Function to score an input file into a columnar output, chunk by chunk
+def score_file(input_path: str, output_dir: Optional[str], model_path: Optional[str], vectorizer_path: Optional[str] = None,
+               text_column: str = 'text', keep_columns: Optional[List[str]] = None, chunk_size: int = 10000,
+               workers: int = 1, fmt: str = 'parquet', compression: Optional[str] = None, encoding: str = 'utf-8',
+               pipeline: Optional[SpamInferencePipeline] = None, tokenizer: str = 'nltk') -> dict:
+    """
+    Stream input_path through the inference pipeline and write scores.<fmt> into output_dir.
+
+    Each chunk is scored on a worker pool; at most two chunks per worker are in flight, so memory stays
+    bounded whatever the input size, and results are written in input order as soon as they are ready.
+
+    :param output_dir: Output directory; None only counts the predictions (nothing is written)
+    :param keep_columns: Input columns copied to the output next to the scores (e.g. an id column)
+    :param pipeline: Inference pipeline already in memory, used instead of loading model_path (forked
+                     workers inherit it)
+    :param tokenizer: Tokenizer preprocessing used, for a bare classifier (a bundled model keeps its own)
+    :return: Summary with row count, spam count, elapsed seconds and messages per second
+    """
+    keep_columns = [column for column in (keep_columns or []) if column != text_column]
+    columns = [text_column] + keep_columns
+    start_time = time.perf_counter()
+    rows = spam = 0
+
+    if workers > 1:
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_scoring_worker,
+                                   initargs=(model_path, vectorizer_path, pipeline, tokenizer))
+        score = lambda texts: pool.submit(_score_texts, texts)
+    else:
+        pool = None
+        _init_scoring_worker(model_path, vectorizer_path, pipeline, tokenizer)
+        score = lambda texts: _score_texts(texts)
+    max_in_flight = 2 * workers
+
+    def write_result(writer, chunk: pd.DataFrame, first_row: int, result) -> int:
+        is_spam, scores = result.result() if pool is not None else result
+        if writer is None:
+            return int(np.count_nonzero(is_spam))
+        output = pd.DataFrame({'row': np.arange(first_row, first_row + len(chunk), dtype=np.int64)})
+        for column in keep_columns:
+            output[column] = chunk[column].values
+        output['label'] = np.where(is_spam, LABELS[1], LABELS[0])
+        output['spam_score'] = np.asarray(scores, dtype=np.float64)
+        writer.write(output)
+        return int(np.count_nonzero(is_spam))
+
+    try:
+        with DatasetWriter(output_dir, 'scores', fmt, compression) if output_dir else nullcontext() as writer:
+            pending = deque()
+            for chunk in iter_message_chunks(input_path, columns, chunk_size, encoding):
+                texts = chunk[text_column].fillna("").astype(str).tolist()
+                pending.append((chunk, rows, score(texts)))
+                rows += len(chunk)
+                # Keep the number of chunks held in memory bounded
+                while len(pending) >= max_in_flight or (pool is None and pending):
+                    spam += write_result(writer, *pending.popleft())
+                logger.debug("Submitted %d messages", rows)
+            while pending:
+                spam += write_result(writer, *pending.popleft())
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    elapsed = time.perf_counter() - start_time
+    return {'rows': rows, 'spam': spam, 'seconds': round(elapsed, 3),
+            'messages_per_second': round(rows / elapsed, 1) if elapsed > 0 else None,
+            'workers': workers, 'chunk_size': chunk_size}
+
+def main(model_path: str, input_path: str, output_path: str, vectorizer_path: Optional[str] = None,
+         param_file_path: Optional[str] = None, text_column: str = 'text', keep_columns: Optional[List[str]] = None,
+         workers: Optional[int] = None, chunk_size: Optional[int] = None, stage_metrics_path: Optional[str] = None):
+    recorder = None
+    try:
+        params = load_params(param_file_path) if param_file_path else {}
+        recorder = StageRecorder.from_params('batch_score', params)
+        scoring_params = params.get('batch_scoring', {}) or {}
+        fmt, compression = artifact_settings(params)
+        chunk_size = chunk_size or scoring_params.get('chunk_size', 10000)
+        workers = workers or scoring_params.get('workers', 1)
+        if workers < 0:
+            workers = os.cpu_count() or 1
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be a positive integer.")
+
+        logger.info("Scoring %s with %d workers in chunks of %d messages", input_path, workers, chunk_size)
+        with recorder.stage('score') as stage:
+            summary = score_file(input_path, output_path, model_path, vectorizer_path, text_column=text_column,
+                                 keep_columns=keep_columns, chunk_size=chunk_size, workers=workers, fmt=fmt,
+                                 compression=compression, encoding=scoring_params.get('encoding', 'utf-8'),
+                                 tokenizer=tokenizer_from_params(params))
+            stage.rows = summary['rows']
+        logger.info("Scored %d messages (%d spam) in %.2fs: %s messages/s", summary['rows'], summary['spam'],
+                    summary['seconds'], summary['messages_per_second'])
+
+        with open(os.path.join(output_path, 'summary.json'), 'w') as file:
+            json.dump(summary, file, indent=4)
+        logger.info("Scores saved to %s", output_path)
+    except Exception as e:
+        logger.error('Failed to complete batch scoring: %s', e)
+        print(f"Error: {e}")
+    finally:
+        # Stage timings are written even when the step failed
+        if recorder is not None:
+            logger.info("Stage metrics:\n%s", recorder.summary())
+            if stage_metrics_path:
+                recorder.write(stage_metrics_path)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("model_path", type=str, help="Directory containing the saved model (model.mstore or model.pkl)")
+    parser.add_argument("input_path", type=str, help="Messages to score (.csv, .jsonl, .txt, .parquet or .arrow; CSV/JSONL may be a URL)")
+    parser.add_argument("output_path", type=str, help="Output directory for the scores and summary.json")
+    parser.add_argument("--vectorizer_path", type=str, default=None, help="Directory containing vectorizer.pkl (only for a bare classifier)")
+    parser.add_argument("--param_file_path", type=str, default=None, help="Path of the Params.yaml (batch_scoring and artifact_io sections)")
+    parser.add_argument("--text_column", type=str, default='text', help="Column holding the raw messages")
+    parser.add_argument("--keep_columns", type=str, nargs='*', default=None, help="Input columns copied to the output (e.g. an id)")
+    parser.add_argument("--workers", type=int, default=None, help="Scoring processes (overrides batch_scoring.workers)")
+    parser.add_argument("--chunk_size", type=int, default=None, help="Messages per chunk (overrides batch_scoring.chunk_size)")
+    parser.add_argument("--stage_metrics_path", type=str, default=None, help="Output directory for stage_metrics.json")
+    args = parser.parse_args()
+    main(model_path=args.model_path, input_path=args.input_path, output_path=args.output_path,
+         vectorizer_path=args.vectorizer_path, param_file_path=args.param_file_path, text_column=args.text_column,
+         keep_columns=args.keep_columns, workers=args.workers, chunk_size=args.chunk_size,
+         stage_metrics_path=args.stage_metrics_path)
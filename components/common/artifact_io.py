@@ -0,0 +1,170 @@
+"""
+Shared dataset artifact I/O for the pipeline components.
+
+Tabular datasets passed between components (train/test splits) are written in a columnar binary
+format by default and read back with the format detected from the file extension:
+
+    parquet -> <name>.parquet   (compressed, column pruning, memory-mapped reads)
+    arrow   -> <name>.arrow     (Arrow IPC file, zero-copy memory-mapped reads when uncompressed)
+    csv     -> <name>.csv       (fallback, same layout the pipeline used originally)
+"""
+import os
+from typing import List, Optional
+
+import pandas as pd
+
+# Formats in the order they are looked up when reading
+ARTIFACT_FORMATS = {
+    'parquet': '.parquet',
+    'arrow': '.arrow',
+    'csv': '.csv',
+}
+DEFAULT_FORMAT = 'parquet'
+DEFAULT_COMPRESSION = {'parquet': 'zstd', 'arrow': 'lz4', 'csv': None}
+
+
+def artifact_settings(params: Optional[dict]) -> tuple:
+    """
+    Return (format, compression) from the 'artifact_io' section of params.yaml.
+
+    :param params: Full params dictionary (may be None or lack the section)
+    """
+    section = (params or {}).get('artifact_io', {}) or {}
+    fmt = section.get('format', DEFAULT_FORMAT)
+    if fmt not in ARTIFACT_FORMATS:
+        raise ValueError(f"Unsupported artifact format '{fmt}'. Expected one of {list(ARTIFACT_FORMATS)}.")
+    compression = section.get('compression', DEFAULT_COMPRESSION[fmt])
+    return fmt, compression
+
+
+def dataset_path(directory: str, name: str, fmt: str) -> str:
+    """Return the file path of dataset `name` stored in `fmt` inside `directory`."""
+    return os.path.join(directory, name + ARTIFACT_FORMATS[fmt])
+
+
+def find_dataset(directory: str, name: str) -> tuple:
+    """
+    Locate dataset `name` inside `directory`, whatever format it was written in.
+
+    :return: (file_path, format)
+    :raises FileNotFoundError: If no supported file exists
+    """
+    for fmt in ARTIFACT_FORMATS:
+        path = dataset_path(directory, name, fmt)
+        if os.path.exists(path):
+            return path, fmt
+    raise FileNotFoundError(f"No '{name}' dataset ({', '.join(ARTIFACT_FORMATS.values())}) found in {directory}")
+
+
+def write_dataset(df: pd.DataFrame, directory: str, name: str, fmt: str = DEFAULT_FORMAT,
+                  compression: Optional[str] = None) -> str:
+    """
+    Write a DataFrame as dataset `name` inside `directory`.
+
+    :param fmt: One of 'parquet', 'arrow' or 'csv'
+    :param compression: Codec name (e.g. 'zstd', 'lz4', 'snappy'), 'none' to disable; None uses the format default
+    :return: Path of the written file
+    """
+    with DatasetWriter(directory, name, fmt, compression) as writer:
+        writer.write(df)
+    return writer.path
+
+
+def read_dataset(directory: str, name: str, columns: Optional[List[str]] = None, memory_map: bool = True) -> pd.DataFrame:
+    """
+    Read dataset `name` from `directory`, detecting the format from the file extension.
+
+    :param columns: Only read these columns (the others are never decoded for parquet/arrow)
+    :param memory_map: Memory-map the file instead of reading it into a buffer first
+    """
+    path, fmt = find_dataset(directory, name)
+    if fmt == 'csv':
+        return pd.read_csv(path, usecols=columns)
+
+    import pyarrow as pa
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        table = pq.read_table(path, columns=columns, memory_map=memory_map)
+    else:
+        source = pa.memory_map(path, 'r') if memory_map else pa.OSFile(path, 'rb')
+        with source:
+            table = pa.ipc.open_file(source).read_all()
+        if columns is not None:
+            table = table.select(columns)
+    return table.to_pandas()
+
+
+class DatasetWriter:
+    """
+    Incrementally write DataFrame chunks to a single dataset file.
+
+    All chunks must have the same columns; their Arrow types are aligned to the first chunk's schema.
+
+        with DatasetWriter(output_dir, 'train', 'parquet') as writer:
+            for chunk in chunks:
+                writer.write(chunk)
+    """
+
+    def __init__(self, directory: str, name: str, fmt: str = DEFAULT_FORMAT, compression: Optional[str] = None):
+        if fmt not in ARTIFACT_FORMATS:
+            raise ValueError(f"Unsupported artifact format '{fmt}'. Expected one of {list(ARTIFACT_FORMATS)}.")
+        os.makedirs(directory, exist_ok=True)
+        self.fmt = fmt
+        if compression is None:
+            compression = DEFAULT_COMPRESSION[fmt]
+        # 'none' disables compression; pyarrow's IPC writer and pandas expect None for that
+        self.compression = None if str(compression).lower() in ('none', 'uncompressed') else compression
+        self.path = dataset_path(directory, name, fmt)
+        self.rows_written = 0
+        self._writer = None
+        self._sink = None
+        self._schema = None
+        self._csv_header_written = False
+
+    def write(self, df: pd.DataFrame) -> None:
+        """Append one chunk of rows."""
+        if self.fmt == 'csv':
+            df.to_csv(self.path, mode='a' if self._csv_header_written else 'w',
+                      header=not self._csv_header_written, index=False, compression=self.compression)
+            self._csv_header_written = True
+            self.rows_written += len(df)
+            return
+
+        import pyarrow as pa
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if self._writer is None:
+            self._schema = table.schema
+            self._open(table.schema)
+        elif table.schema != self._schema:
+            table = table.cast(self._schema)
+        self._writer.write_table(table)
+        self.rows_written += len(df)
+
+    def _open(self, schema) -> None:
+        import pyarrow as pa
+        if self.fmt == 'parquet':
+            import pyarrow.parquet as pq
+            self._writer = pq.ParquetWriter(self.path, schema, compression=self.compression or 'none')
+        else:
+            self._sink = pa.OSFile(self.path, 'wb')
+            options = pa.ipc.IpcWriteOptions(compression=self.compression)
+            self._writer = pa.ipc.new_file(self._sink, schema, options=options)
+
+    def close(self) -> None:
+        """Finish the file. An empty file with no columns is produced if nothing was written."""
+        if self.fmt == 'csv':
+            if not self._csv_header_written:
+                pd.DataFrame().to_csv(self.path, index=False)
+            return
+        if self._writer is None:
+            import pyarrow as pa
+            self._open(pa.schema([]))
+        self._writer.close()
+        if self._sink is not None:
+            self._sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
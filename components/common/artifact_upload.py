@@ -0,0 +1,305 @@
+"""
+Concurrent, resumable multipart upload of artifact files to S3/MinIO or a file-backed artifact store.
+
+A file is split into fixed-size parts that are uploaded by a thread pool, each with retries and
+exponential backoff. Progress lives next to the destination, so an upload that fails (or a pod that is
+restarted) resumes with the parts that are missing instead of starting from zero:
+
+    s3://bucket/key   S3 multipart upload. An unfinished multipart upload of the same key is found with
+                      list_multipart_uploads; its parts are kept when their ETag (the MD5 of the part)
+                      matches the local data. MinIO or another S3 stand-in is used through the
+                      MLFLOW_S3_ENDPOINT_URL environment variable, as MLflow itself does.
+    file:///path      Parts are written at their offsets into <path>.partial; <path>.partial.json records
+                      the finished parts and the file's size and CRC32. The partial file is renamed into
+                      place when every part is written.
+
+Files no larger than one part are uploaded in a single request.
+
+Resuming needs the same destination on every attempt, so callers whose final location changes per attempt
+(e.g. a new MLflow run per push) upload into a staging location keyed by the content, then move it with
+copy_directory (a server-side copy for S3) and delete_directory. Unfinished uploads nobody resumes are
+removed by cleanup_stale_uploads, so abandoned S3 parts do not stay billed in the bucket.
+"""
+import os
+import json
+import time
+import zlib
+import hashlib
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+from urllib.parse import urlparse, unquote
+
+DEFAULT_PART_SIZE = 8 * 2**20  # S3 requires parts of at least 5 MB (except the last)
+SUPPORTED_SCHEMES = ('s3', 'file')
+
+
+def is_supported(destination_uri: str) -> bool:
+    """Return True if the destination can be uploaded to by this module (s3:// or file://)."""
+    return urlparse(destination_uri).scheme in SUPPORTED_SCHEMES
+
+
+def _s3_client(s3_client=None):
+    import boto3
+    return s3_client or boto3.client('s3', endpoint_url=os.environ.get('MLFLOW_S3_ENDPOINT_URL'))
+
+
+def _retry(fn: Callable, max_retries: int, retry_delay: float):
+    for attempt in range(max_retries + 1):
+        try:
+            return fn()
+        except Exception:
+            if attempt == max_retries:
+                raise
+            time.sleep(retry_delay * 2 ** attempt)
+
+
+class _FileTarget:
+    """Parts written at their offsets into <path>.partial, progress kept in <path>.partial.json."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.partial_path = path + '.partial'
+        self.state_path = self.partial_path + '.json'
+
+    def put_object(self, data) -> None:
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.partial_path, 'wb') as file:
+            file.write(data)
+        os.replace(self.partial_path, self.path)
+
+    def begin(self, size: int, part_size: int, checksum: int, part_data: Callable) -> set:
+        """Prepare the partial file and return the part numbers already written by an earlier attempt."""
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        identity = {'size': size, 'part_size': part_size, 'crc32': checksum}
+        self._state = {**identity, 'parts': []}
+        if os.path.exists(self.state_path) and os.path.exists(self.partial_path):
+            with open(self.state_path) as file:
+                previous = json.load(file)
+            if {key: previous.get(key) for key in identity} == identity:
+                self._state['parts'] = previous['parts']
+        if not self._state['parts']:
+            with open(self.partial_path, 'wb') as file:
+                file.truncate(size)
+        self._handle = open(self.partial_path, 'r+b')
+        self._lock = threading.Lock()
+        self._save_state()
+        return set(self._state['parts'])
+
+    def _save_state(self) -> None:
+        with open(self.state_path + '.tmp', 'w') as file:
+            json.dump(self._state, file)
+        os.replace(self.state_path + '.tmp', self.state_path)
+
+    def upload_part(self, number: int, offset: int, data) -> None:
+        os.pwrite(self._handle.fileno(), data, offset)
+
+    def part_done(self, number: int) -> None:
+        with self._lock:
+            self._state['parts'].append(number)
+            self._save_state()
+
+    def complete(self) -> None:
+        self._handle.close()
+        os.replace(self.partial_path, self.path)
+        os.remove(self.state_path)
+
+    def abort(self) -> None:
+        self._handle.close()
+
+
+class _S3Target:
+    """S3 multipart upload, resumed from an unfinished upload of the same key."""
+
+    def __init__(self, bucket: str, key: str, client=None):
+        self.bucket = bucket
+        self.key = key
+        self.client = _s3_client(client)
+
+    def put_object(self, data) -> None:
+        self.client.put_object(Bucket=self.bucket, Key=self.key, Body=data)
+
+    def begin(self, size: int, part_size: int, checksum: int, part_data: Callable) -> set:
+        self._etags = {}
+        self.upload_id = None
+        uploads = self.client.list_multipart_uploads(Bucket=self.bucket, Prefix=self.key).get('Uploads', [])
+        for upload in sorted(uploads, key=lambda upload: upload['Initiated'], reverse=True):
+            if upload['Key'] != self.key:
+                continue
+            if self.upload_id is None:
+                parts = self.client.list_parts(Bucket=self.bucket, Key=self.key, UploadId=upload['UploadId']).get('Parts', [])
+                # Keep only parts whose content matches the local file (ETag = MD5 of the part)
+                matching = {part['PartNumber']: part['ETag'] for part in parts
+                            if part['ETag'].strip('"') == hashlib.md5(part_data(part['PartNumber'])).hexdigest()}
+                if matching:
+                    self.upload_id = upload['UploadId']
+                    self._etags = matching
+                    continue
+            # Other unfinished uploads of this key will never be completed; free their parts
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=upload['UploadId'])
+        if self.upload_id is None:
+            self.upload_id = self.client.create_multipart_upload(Bucket=self.bucket, Key=self.key)['UploadId']
+        return set(self._etags)
+
+    def upload_part(self, number: int, offset: int, data) -> None:
+        response = self.client.upload_part(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                                           PartNumber=number, Body=data)
+        self._etags[number] = response['ETag']
+
+    def part_done(self, number: int) -> None:
+        pass
+
+    def complete(self) -> None:
+        parts = [{'PartNumber': number, 'ETag': etag} for number, etag in sorted(self._etags.items())]
+        self.client.complete_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                                              MultipartUpload={'Parts': parts})
+
+    def abort(self) -> None:
+        # The unfinished upload is left in place so the next attempt at the same key can resume it;
+        # cleanup_stale_uploads aborts it if no attempt comes
+        pass
+
+
+def _target(destination_uri: str, s3_client=None):
+    parsed = urlparse(destination_uri)
+    if parsed.scheme == 's3':
+        return _S3Target(parsed.netloc, parsed.path.lstrip('/'), s3_client)
+    if parsed.scheme == 'file':
+        return _FileTarget(unquote(parsed.path))
+    raise ValueError(f"Unsupported artifact destination '{destination_uri}'. Expected one of {SUPPORTED_SCHEMES}.")
+
+
+def upload_file(local_path: str, destination_uri: str, part_size: int = DEFAULT_PART_SIZE, max_workers: int = 8,
+                max_retries: int = 3, retry_delay: float = 0.5, s3_client=None,
+                on_request: Optional[Callable[[str], None]] = None) -> dict:
+    """
+    Upload one file in parts, concurrently, resuming an earlier unfinished upload of it.
+
+    :param on_request: Called with the operation name ('put_object', 'upload_part') for each upload request
+    :return: {'bytes', 'parts', 'resumed_parts'}
+    """
+    target = _target(destination_uri, s3_client)
+    size = os.path.getsize(local_path)
+    notify = on_request or (lambda operation: None)
+    with open(local_path, 'rb') as file:
+        if size <= part_size:
+            data = file.read()
+            notify('put_object')
+            _retry(lambda: target.put_object(data), max_retries, retry_delay)
+            return {'bytes': size, 'parts': 1, 'resumed_parts': 0}
+
+        n_parts = -(-size // part_size)
+
+        def part_data(number: int) -> bytes:
+            # pread is positional, so worker threads can read their parts from the shared descriptor
+            return os.pread(file.fileno(), part_size, (number - 1) * part_size)
+
+        checksum = 0
+        for number in range(1, n_parts + 1):
+            checksum = zlib.crc32(part_data(number), checksum)
+        done = target.begin(size, part_size, checksum, part_data)
+
+        def send(number: int) -> None:
+            notify('upload_part')
+            _retry(lambda: target.upload_part(number, (number - 1) * part_size, part_data(number)),
+                   max_retries, retry_delay)
+            target.part_done(number)
+
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                futures = [pool.submit(send, number) for number in range(1, n_parts + 1) if number not in done]
+                for future in futures:
+                    future.result()
+            target.complete()
+        except BaseException:
+            target.abort()
+            raise
+    return {'bytes': size, 'parts': n_parts, 'resumed_parts': len(done)}
+
+
+def _split_s3(uri: str) -> tuple:
+    parsed = urlparse(uri)
+    return parsed.netloc, parsed.path.strip('/')
+
+
+def _check_scheme(uri: str) -> str:
+    scheme = urlparse(uri).scheme
+    if scheme not in SUPPORTED_SCHEMES:
+        raise ValueError(f"Unsupported artifact destination '{uri}'. Expected one of {SUPPORTED_SCHEMES}.")
+    return scheme
+
+
+def copy_directory(source_uri: str, destination_uri: str, s3_client=None) -> int:
+    """
+    Copy every file under source_uri to the same relative path under destination_uri (same scheme).
+    S3 objects are copied server side (multipart for large objects). Return the number of files copied.
+    """
+    if _check_scheme(source_uri) == 'file':
+        source, destination = unquote(urlparse(source_uri).path), unquote(urlparse(destination_uri).path)
+        shutil.copytree(source, destination, dirs_exist_ok=True)
+        return sum(len(filenames) for _, _, filenames in os.walk(source))
+    client = _s3_client(s3_client)
+    bucket, prefix = _split_s3(source_uri)
+    destination_bucket, destination_prefix = _split_s3(destination_uri)
+    copied = 0
+    for page in client.get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=prefix + '/'):
+        for obj in page.get('Contents', []):
+            relative = obj['Key'][len(prefix) + 1:]
+            client.copy({'Bucket': bucket, 'Key': obj['Key']}, destination_bucket, f"{destination_prefix}/{relative}")
+            copied += 1
+    return copied
+
+
+def delete_directory(uri: str, s3_client=None) -> None:
+    """Delete every file under uri."""
+    if _check_scheme(uri) == 'file':
+        shutil.rmtree(unquote(urlparse(uri).path), ignore_errors=True)
+        return
+    client = _s3_client(s3_client)
+    bucket, prefix = _split_s3(uri)
+    for page in client.get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=prefix + '/'):
+        keys = [{'Key': obj['Key']} for obj in page.get('Contents', [])]
+        if keys:
+            client.delete_objects(Bucket=bucket, Delete={'Objects': keys})
+
+
+def cleanup_stale_uploads(prefix_uri: str, max_age_seconds: float, s3_client=None) -> int:
+    """
+    Remove unfinished uploads under prefix_uri started more than max_age_seconds ago: abort S3 multipart
+    uploads (freeing their stored parts) or delete .partial files and their progress files.
+    Return the number of uploads removed.
+    """
+    cutoff = time.time() - max_age_seconds
+    removed = 0
+    if _check_scheme(prefix_uri) == 'file':
+        root = unquote(urlparse(prefix_uri).path)
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                if filename.endswith('.partial') and os.path.getmtime(path) < cutoff:
+                    for stale in (path, path + '.json'):
+                        if os.path.exists(stale):
+                            os.remove(stale)
+                    removed += 1
+        return removed
+    client = _s3_client(s3_client)
+    bucket, prefix = _split_s3(prefix_uri)
+    for page in client.get_paginator('list_multipart_uploads').paginate(Bucket=bucket, Prefix=prefix + '/'):
+        for upload in page.get('Uploads', []):
+            if upload['Initiated'].timestamp() < cutoff:
+                client.abort_multipart_upload(Bucket=bucket, Key=upload['Key'], UploadId=upload['UploadId'])
+                removed += 1
+    return removed
+
+
+def upload_directory(local_dir: str, destination_uri: str, **kwargs) -> Dict[str, dict]:
+    """Upload every file under local_dir to the same relative path under destination_uri (see upload_file)."""
+    results = {}
+    for dirpath, _, filenames in os.walk(local_dir):
+        for filename in sorted(filenames):
+            local_path = os.path.join(dirpath, filename)
+            relative = os.path.relpath(local_path, local_dir).replace(os.sep, '/')
+            results[relative] = upload_file(local_path, destination_uri.rstrip('/') + '/' + relative, **kwargs)
+    return results
+
@@ -0,0 +1,154 @@
+"""
+Persistent document-frequency state for incremental TF-IDF fitting.
+
+TfidfVectorizer.fit only needs, for every term of the training set, its document frequency (for the IDF)
+and its total count (to keep the max_features most frequent terms), plus the number of documents.
+DocumentFrequencyState keeps those counts for the whole vocabulary, so a run folds in only the training
+documents it has not seen and rebuilds the fitted vectorizer from the counts, without tokenizing the
+historical text again. The result is identical to TfidfVectorizer(max_features=...).fit on all documents:
+terms are ranked and capped with the same operations on the same alphabetically ordered counts, and the
+IDF is computed with the same formula (smooth_idf=True).
+
+Which documents are already counted is tracked by a 64-bit digest per document (a multiset, so repeated
+messages count as often as they occur). When documents the state has counted are no longer in the training
+set, as happens when a random train/test split is redrawn, the counts cannot be reduced without the old text
+and the state is rebuilt from the current training set instead. With a content-hashed split
+(1_Data_Ingestion.streaming) a growing dataset only ever adds training documents.
+"""
+import os
+import json
+import hashlib
+from collections import Counter
+from typing import Iterable, Optional
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+STATE_VERSION = 1
+STATE_FILE = 'df_state.npz'
+HEADER_FILE = 'df_state.json'
+
+
+def document_digests(texts: Iterable[str]) -> np.ndarray:
+    """64-bit digests of documents, identifying the ones already counted."""
+    return np.array([int.from_bytes(hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=8).digest(), 'little')
+                     for text in texts], dtype=np.uint64)
+
+
+class DocumentFrequencyState:
+    """Per-term document frequencies and counts of every document folded in so far."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget every document."""
+        self.terms = {}
+        self._document_frequency = []
+        self._term_frequency = []
+        self.n_documents = 0
+        # Sorted digests of the counted documents (repeated for repeated documents)
+        self.documents = np.zeros(0, dtype=np.uint64)
+
+    @property
+    def vocabulary_size(self) -> int:
+        return len(self.terms)
+
+    def new_rows(self, texts) -> Optional[np.ndarray]:
+        """
+        Return the positions in texts of the documents not counted yet, or None when the state has counted
+        documents that texts no longer contains (it then has to be rebuilt from texts).
+        """
+        digests = document_digests(texts)
+        order = np.argsort(digests, kind='stable')
+        sorted_digests = digests[order]
+        # Occurrence number of each document among equal ones: the first `counted` occurrences are known
+        first = np.searchsorted(sorted_digests, sorted_digests, side='left')
+        occurrence = np.arange(len(sorted_digests)) - first
+        counted = (np.searchsorted(self.documents, sorted_digests, side='right')
+                   - np.searchsorted(self.documents, sorted_digests, side='left'))
+        if len(self.documents):
+            known, known_counts = np.unique(self.documents, return_counts=True)
+            present = (np.searchsorted(sorted_digests, known, side='right')
+                       - np.searchsorted(sorted_digests, known, side='left'))
+            if np.any(present < known_counts):
+                return None
+        return np.sort(order[occurrence >= counted])
+
+    def update(self, texts) -> int:
+        """Count the documents in texts (tokenized like a default TfidfVectorizer); return how many were added."""
+        analyze = TfidfVectorizer().build_analyzer()
+        terms, document_frequency, term_frequency = self.terms, self._document_frequency, self._term_frequency
+        texts = list(texts)
+        for text in texts:
+            for term, count in Counter(analyze(text)).items():
+                index = terms.get(term)
+                if index is None:
+                    index = terms[term] = len(document_frequency)
+                    document_frequency.append(0)
+                    term_frequency.append(0)
+                document_frequency[index] += 1
+                term_frequency[index] += count
+        self.n_documents += len(texts)
+        self.documents = np.sort(np.concatenate([self.documents, document_digests(texts)]))
+        return len(texts)
+
+    def vectorizer(self, max_features: Optional[int] = None) -> TfidfVectorizer:
+        """Build the TfidfVectorizer(max_features=max_features) that fitting on all counted documents gives."""
+        if not self.terms:
+            raise ValueError("empty vocabulary; the state holds no terms")
+        names = np.array(sorted(self.terms), dtype=object)
+        positions = np.array([self.terms[name] for name in names], dtype=np.int64)
+        document_frequency = np.asarray(self._document_frequency, dtype=np.int64)[positions]
+        term_frequency = np.asarray(self._term_frequency, dtype=np.int64)[positions]
+
+        # Same ranking as CountVectorizer._limit_features on the alphabetically sorted vocabulary
+        kept = np.arange(len(names))
+        if max_features is not None and len(names) > max_features:
+            kept = np.sort((-term_frequency).argsort()[:max_features])
+
+        # Same arithmetic as TfidfTransformer.fit with smooth_idf=True
+        idf = np.full(len(kept), fill_value=self.n_documents + 1, dtype=np.float64)
+        idf /= document_frequency[kept].astype(np.float64) + 1.0
+        np.log(idf, out=idf)
+        idf += 1.0
+
+        vectorizer = TfidfVectorizer(max_features=max_features)
+        vectorizer.vocabulary_ = {name: index for index, name in enumerate(names[kept])}
+        vectorizer.idf_ = idf
+        return vectorizer
+
+    def save(self, output_dir: str) -> str:
+        """Write the state into output_dir (df_state.npz plus a small JSON header); return the npz path."""
+        os.makedirs(output_dir, exist_ok=True)
+        path = os.path.join(output_dir, STATE_FILE)
+        terms = np.empty(len(self.terms), dtype=object)
+        for term, index in self.terms.items():
+            terms[index] = term
+        np.savez(path, terms=terms.astype(str) if len(terms) else np.zeros(0, dtype='<U1'),
+                 document_frequency=np.asarray(self._document_frequency, dtype=np.int64),
+                 term_frequency=np.asarray(self._term_frequency, dtype=np.int64), documents=self.documents)
+        with open(os.path.join(output_dir, HEADER_FILE), 'w') as file:
+            json.dump({'version': STATE_VERSION, 'n_documents': self.n_documents,
+                       'vocabulary_size': self.vocabulary_size}, file, indent=4)
+        return path
+
+    @classmethod
+    def load(cls, input_dir: str) -> 'DocumentFrequencyState':
+        """Read a state written by save()."""
+        with open(os.path.join(input_dir, HEADER_FILE), 'r') as file:
+            header = json.load(file)
+        if header.get('version') != STATE_VERSION:
+            raise ValueError(f"Unsupported document-frequency state version {header.get('version')}.")
+        state = cls()
+        with np.load(os.path.join(input_dir, STATE_FILE), allow_pickle=False) as data:
+            state.terms = {term: index for index, term in enumerate(data['terms'].tolist())}
+            state._document_frequency = data['document_frequency'].tolist()
+            state._term_frequency = data['term_frequency'].tolist()
+            state.documents = data['documents']
+        state.n_documents = header['n_documents']
+        return state
+
+    @staticmethod
+    def exists(input_dir: str) -> bool:
+        return os.path.exists(os.path.join(input_dir, HEADER_FILE))
@@ -0,0 +1,107 @@
+"""
+Memory-mappable feature matrix store shared by feature engineering, training and evaluation.
+
+A feature set `<name>` inside a directory consists of a small JSON header plus one raw .npy file per buffer:
+
+    <name>.header.json     format version, layout ('csr' or 'dense'), shape, dtypes, nnz
+    <name>.data.npy        CSR values            (layout 'csr')
+    <name>.indices.npy     CSR column indices    (layout 'csr')
+    <name>.indptr.npy      CSR row pointers      (layout 'csr')
+    <name>.X.npy           dense feature block   (layout 'dense')
+    <name>.label.npy       target labels
+
+The .npy files are uncompressed, so readers open them with mmap and build the matrix on top of the mapped
+buffers without copying them; pages are only read from disk when they are touched.
+"""
+import os
+import json
+from typing import Optional
+
+import numpy as np
+from scipy import sparse
+
+STORE_VERSION = 1
+
+
+def _buffer_path(directory: str, name: str, buffer: str) -> str:
+    return os.path.join(directory, f"{name}.{buffer}.npy")
+
+
+def header_path(directory: str, name: str) -> str:
+    """Return the path of the header file of feature set `name`."""
+    return os.path.join(directory, f"{name}.header.json")
+
+
+def save_features(X, y: np.ndarray, directory: str, name: str, dtype: Optional[str] = None) -> str:
+    """
+    Save a feature matrix and its labels as feature set `name` inside `directory`.
+
+    :param X: Sparse matrix (stored as CSR) or dense 2-D array
+    :param y: Label array with one entry per row of X
+    :param dtype: Optional dtype to cast the feature values to before saving (e.g. 'float32')
+    :return: Path of the header file
+    """
+    if X.shape[0] != len(y):
+        raise ValueError("X and y must have the same number of rows.")
+    os.makedirs(directory, exist_ok=True)
+    y = np.asarray(y)
+
+    if sparse.issparse(X):
+        X = sparse.csr_matrix(X)
+        if dtype is not None:
+            X = X.astype(dtype, copy=False)
+        buffers = {'data': X.data, 'indices': X.indices, 'indptr': X.indptr}
+        header = {'layout': 'csr', 'nnz': int(X.nnz), 'index_dtype': str(X.indices.dtype)}
+    else:
+        X = np.ascontiguousarray(X, dtype=dtype)
+        buffers = {'X': X}
+        header = {'layout': 'dense'}
+
+    for buffer, array in {**buffers, 'label': y}.items():
+        np.save(_buffer_path(directory, name, buffer), array, allow_pickle=False)
+
+    header.update({
+        'version': STORE_VERSION,
+        'shape': [int(n) for n in X.shape],
+        'dtype': str(X.dtype),
+        'label_dtype': str(y.dtype),
+    })
+    path = header_path(directory, name)
+    with open(path, 'w') as file:
+        json.dump(header, file, indent=4)
+    return path
+
+
+def read_header(directory: str, name: str) -> dict:
+    """Read and validate the header of feature set `name`."""
+    with open(header_path(directory, name), 'r') as file:
+        header = json.load(file)
+    if header.get('version') != STORE_VERSION:
+        raise ValueError(f"Unsupported feature store version {header.get('version')} (expected {STORE_VERSION}).")
+    return header
+
+
+def load_features(directory: str, name: str, mmap: bool = True) -> tuple:
+    """
+    Load feature set `name` from `directory`.
+
+    :param mmap: Memory-map the buffers (read-only, no copy) instead of reading them into memory
+    :return: (X, y) where X is a CSR matrix or a dense array, depending on how it was saved
+    """
+    header = read_header(directory, name)
+    mmap_mode = 'r' if mmap else None
+
+    def load(buffer: str) -> np.ndarray:
+        return np.load(_buffer_path(directory, name, buffer), mmap_mode=mmap_mode, allow_pickle=False)
+
+    shape = tuple(header['shape'])
+    if header['layout'] == 'csr':
+        X = sparse.csr_matrix((load('data'), load('indices'), load('indptr')), shape=shape, copy=False)
+    elif header['layout'] == 'dense':
+        X = load('X')
+    else:
+        raise ValueError(f"Unknown feature layout '{header['layout']}'.")
+
+    if X.shape != shape or str(X.dtype) != header['dtype']:
+        raise ValueError(f"Feature set '{name}' does not match its header ({X.shape}/{X.dtype} vs {shape}/{header['dtype']}).")
+    return X, load('label')
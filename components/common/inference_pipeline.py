@@ -0,0 +1,120 @@
+"""
+Single loadable artifact for raw text -> spam prediction.
+
+SpamInferencePipeline bundles the three fitted stages the pipeline produces:
+
+    TextNormalizer  (preprocessing: lowercase, tokenize, drop stopwords, stem)
+    vectorizer      (feature engineering: fitted TfidfVectorizer or hashing pipeline)
+    classifier      (training: any backend of model_training.py)
+
+Training saves the bundle with the model store (model.mstore). predict/predict_proba take raw
+messages in bulk; each stage runs once per call on the whole batch. Steps that already hold features (evaluation on the feature
+store) use the wrapped `classifier` directly.
+
+Unpickling needs this module and text_normalizer.py importable under the same names, which is why the
+images copy them next to the component scripts.
+"""
+import os
+import pickle
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+from sklearn.base import BaseEstimator, ClassifierMixin
+from sklearn.utils.metaestimators import available_if
+
+from model_store import load_model
+from text_normalizer import TextNormalizer
+
+# Label names of the encoded target (LabelEncoder in preprocessing sorts 'ham' < 'spam')
+LABELS = ('ham', 'spam')
+
+
+def _as_texts(texts) -> List[str]:
+    """Accept a list/array of strings, a pandas Series or a one-column DataFrame (MLflow pyfunc input)."""
+    if hasattr(texts, 'columns'):
+        if len(texts.columns) != 1:
+            raise ValueError(f"Expected a single text column, got {list(texts.columns)}.")
+        texts = texts.iloc[:, 0]
+    if isinstance(texts, str):
+        raise TypeError("Expected a collection of messages, got a single string.")
+    return ["" if text is None else str(text) for text in texts]
+
+
+def _classifier_has(attribute: str):
+    return lambda self: hasattr(self.classifier, attribute)
+
+
+class SpamInferencePipeline(ClassifierMixin, BaseEstimator):
+    """
+    Fitted normalizer + vectorizer + classifier with a raw-text interface.
+
+    :param normalizer: TextNormalizer used by preprocessing
+    :param vectorizer: Fitted transformer from feature engineering
+    :param classifier: Fitted classifier trained on the vectorizer's output
+    """
+
+    def __init__(self, normalizer: TextNormalizer, vectorizer, classifier):
+        self.normalizer = normalizer
+        self.vectorizer = vectorizer
+        self.classifier = classifier
+
+    def check_compatible(self) -> None:
+        """Raise ValueError if the vectorizer's output width differs from what the classifier was trained on."""
+        n_features = self.vectorizer.transform([""]).shape[1]
+        expected = getattr(self.classifier, 'n_features_in_', n_features)
+        if n_features != expected:
+            raise ValueError(f"Vectorizer produces {n_features} features but the classifier expects {expected}.")
+
+    @property
+    def classes_(self) -> np.ndarray:
+        return self.classifier.classes_
+
+    def transform(self, texts: Iterable[str]):
+        """Normalize and vectorize raw messages into the classifier's feature space."""
+        return self.vectorizer.transform(self.normalizer.normalize_batch(_as_texts(texts)))
+
+    def predict(self, texts: Iterable[str]) -> np.ndarray:
+        """Predict encoded labels (0 = ham, 1 = spam) for raw messages."""
+        return self.classifier.predict(self.transform(texts))
+
+    @available_if(_classifier_has('predict_proba'))
+    def predict_proba(self, texts: Iterable[str]) -> np.ndarray:
+        return self.classifier.predict_proba(self.transform(texts))
+
+    @available_if(_classifier_has('decision_function'))
+    def decision_function(self, texts: Iterable[str]) -> np.ndarray:
+        return self.classifier.decision_function(self.transform(texts))
+
+    def predict_scores(self, texts: Iterable[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return (is_spam, spam_score) for raw messages from a single transform.
+
+        spam_score is P(spam) when the classifier has predict_proba, otherwise its decision margin.
+        """
+        X = self.transform(texts)
+        if hasattr(self.classifier, 'predict_proba'):
+            scores = self.classifier.predict_proba(X)[:, 1]
+            return scores > 0.5, scores
+        scores = self.classifier.decision_function(X)
+        return scores > 0, scores
+
+
+def load_inference_pipeline(model_dir: str, vectorizer_dir: Optional[str] = None,
+                            stem_cache_size: int = 100_000, tokenizer: str = 'nltk') -> SpamInferencePipeline:
+    """
+    Load the model saved in `model_dir` as a SpamInferencePipeline.
+
+    A model saved by training with a vectorizer already is one; a bare classifier is wrapped with a new
+    TextNormalizer (with `tokenizer`, which must be the one preprocessing used) and the vectorizer.pkl found
+    in `vectorizer_dir`.
+    """
+    model = load_model(model_dir)
+    if isinstance(model, SpamInferencePipeline):
+        return model
+    if not vectorizer_dir:
+        raise ValueError("The saved model is a bare classifier; the vectorizer artifact directory is needed as well.")
+    with open(os.path.join(vectorizer_dir, 'vectorizer.pkl'), 'rb') as file:
+        vectorizer = pickle.load(file)
+    pipeline = SpamInferencePipeline(normalizer=TextNormalizer(stem_cache_size, tokenizer), vectorizer=vectorizer, classifier=model)
+    pipeline.check_compatible()
+    return pipeline
@@ -0,0 +1,255 @@
+"""
+Per-stage timing, memory and throughput instrumentation shared by the pipeline components.
+
+A component creates one StageRecorder and wraps its steps in `recorder.stage(name)` blocks (or decorates
+functions with `timed(name)`, which records into the active recorder and does nothing without one).
+Every stage records:
+
+    seconds          wall-clock time
+    cpu_seconds      CPU time of this process (work done in worker processes is not included)
+    peak_rss_mb      peak resident memory of this process while the stage ran, sampled by a background
+                     thread every rss_sample_interval_seconds (Linux /proc; elsewhere the process-lifetime
+                     peak from getrusage)
+    rss_delta_mb     resident memory after the stage minus before it
+    rows             rows handled, when given, and rows_per_second
+
+Stages may nest (names are joined with '/'). With `profile` enabled, each outermost stage also runs
+under cProfile and is dumped as a pstats file (profiles/<stage>.prof, readable with pstats or snakeviz)
+next to stage_metrics.json.
+
+Settings come from the `instrumentation` section of params.yaml:
+
+    instrumentation:
+      profile: false
+      rss_sample_interval_seconds: 0.05
+"""
+import os
+import json
+import time
+import cProfile
+import resource
+import threading
+import functools
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Callable, Optional, Union
+
+STAGE_METRICS_FILE = 'stage_metrics.json'
+PROFILE_DIR = 'profiles'
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+_current: Optional['StageRecorder'] = None
+
+
+def current_rss() -> Optional[int]:
+    """Resident memory of this process in bytes, or None where /proc is unavailable."""
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def peak_rss(who: int = resource.RUSAGE_SELF) -> int:
+    """Process-lifetime peak resident memory in bytes (RUSAGE_CHILDREN: of the largest finished child)."""
+    maxrss = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return maxrss if os.uname().sysname == 'Darwin' else maxrss * 1024
+
+
+def _mb(value: Optional[int]) -> Optional[float]:
+    return None if value is None else round(value / 2**20, 1)
+
+
+class Stage:
+    """One timed block; `add_rows` counts rows processed inside it (e.g. per chunk of a stream)."""
+
+    def __init__(self, name: str, rows: Optional[int] = None):
+        self.name = name
+        self.rows = rows
+        self.peak_rss = None
+
+    def add_rows(self, rows: int) -> None:
+        self.rows = (self.rows or 0) + int(rows)
+
+    def observe(self, rss: Optional[int]) -> None:
+        if rss is not None and (self.peak_rss is None or rss > self.peak_rss):
+            self.peak_rss = rss
+
+
+class StageRecorder:
+    """Record the stages of one component run and write them as stage_metrics.json."""
+
+    def __init__(self, component: str, profile: bool = False, rss_sample_interval: float = 0.05):
+        global _current
+        self.component = component
+        self.profile = profile
+        self.rss_sample_interval = rss_sample_interval
+        self.records = []
+        self.profiles = {}
+        self.started_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._open = []
+        self._sampler = None
+        self._stop = threading.Event()
+        _current = self
+
+    @classmethod
+    def from_params(cls, component: str, params: Optional[dict]) -> 'StageRecorder':
+        """Create the recorder from the `instrumentation` section of params.yaml (defaults when absent)."""
+        settings = (params or {}).get('instrumentation', {}) or {}
+        return cls(component, profile=settings.get('profile', False),
+                   rss_sample_interval=settings.get('rss_sample_interval_seconds', 0.05))
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.rss_sample_interval):
+            rss = current_rss()
+            with self._lock:
+                for stage in self._open:
+                    stage.observe(rss)
+
+    def _start_sampler(self) -> None:
+        if self._sampler is None and self.rss_sample_interval and current_rss() is not None:
+            self._sampler = threading.Thread(target=self._sample, name='rss-sampler', daemon=True)
+            self._sampler.start()
+
+    @contextmanager
+    def stage(self, name: str, rows: Optional[int] = None):
+        """Time the enclosed block; yields the Stage so rows can be added while it runs."""
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        full_name = '/'.join([*(stage.name for stage in stack), name])
+        stage = Stage(full_name, rows)
+        rss_before = current_rss()
+        stage.observe(rss_before)
+        with self._lock:
+            self._open.append(stage)
+        self._start_sampler()
+
+        profiler = cProfile.Profile() if self.profile and not stack else None
+        stack.append(stage)
+        start, cpu_start = time.perf_counter(), time.process_time()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield stage
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            seconds, cpu_seconds = time.perf_counter() - start, time.process_time() - cpu_start
+            stack.pop()
+            rss_after = current_rss()
+            with self._lock:
+                self._open.remove(stage)
+                stage.observe(rss_after)
+                if profiler is not None:
+                    self.profiles[full_name] = profiler
+                self.records.append({
+                    'name': full_name,
+                    'offset_seconds': round(start - self._start, 4),
+                    'seconds': round(seconds, 4),
+                    'cpu_seconds': round(cpu_seconds, 4),
+                    'peak_rss_mb': _mb(stage.peak_rss if stage.peak_rss is not None else peak_rss()),
+                    'rss_delta_mb': _mb(rss_after - rss_before) if rss_before is not None else None,
+                    'rows': stage.rows,
+                    'rows_per_second': round(stage.rows / seconds, 1) if stage.rows and seconds > 0 else None,
+                })
+
+    def timed(self, name: str, rows: Optional[Union[int, Callable]] = None):
+        """Decorator form of `stage`; `rows` may be a callable applied to the function's result."""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.stage(name) as stage:
+                    result = fn(*args, **kwargs)
+                    stage.rows = rows(result) if callable(rows) else rows
+                    return result
+            return wrapper
+        return decorator
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            # Records are added as stages finish; list them in the order they started
+            stages = sorted(self.records, key=lambda record: record['offset_seconds'])
+        return {
+            'component': self.component,
+            'started_at': self.started_at,
+            'total_seconds': round(time.perf_counter() - self._start, 4),
+            'peak_rss_mb': _mb(peak_rss()),
+            'children_peak_rss_mb': _mb(peak_rss(resource.RUSAGE_CHILDREN)) or None,
+            'stages': stages,
+            'profiles': [os.path.join(PROFILE_DIR, _profile_file(name)) for name in self.profiles],
+        }
+
+    def summary(self) -> str:
+        """One line per stage, for the component's log."""
+        lines = []
+        for record in self.to_dict()['stages']:
+            line = f"  {record['name']:<28} {record['seconds']:>9.3f}s  cpu {record['cpu_seconds']:>8.3f}s"
+            if record['peak_rss_mb'] is not None:
+                line += f"  peak {record['peak_rss_mb']:>8.1f} MB"
+            if record['rows_per_second'] is not None:
+                line += f"  {record['rows']} rows ({record['rows_per_second']:.0f}/s)"
+            lines.append(line)
+        return '\n'.join(lines)
+
+    def close(self) -> None:
+        """Stop the memory sampler thread (stages started afterwards only sample at their start and end)."""
+        self._stop.set()
+
+    def write(self, output_dir: str) -> str:
+        """Write stage_metrics.json (and the profiles, if any) into output_dir; return the JSON path."""
+        self.close()
+        os.makedirs(output_dir, exist_ok=True)
+        for name, profiler in self.profiles.items():
+            os.makedirs(os.path.join(output_dir, PROFILE_DIR), exist_ok=True)
+            profiler.dump_stats(os.path.join(output_dir, PROFILE_DIR, _profile_file(name)))
+        path = os.path.join(output_dir, STAGE_METRICS_FILE)
+        with open(path, 'w') as file:
+            json.dump(self.to_dict(), file, indent=4)
+        return path
+
+
+def _profile_file(stage_name: str) -> str:
+    return stage_name.replace('/', '__') + '.prof'
+
+
+def _reset_after_fork() -> None:
+    # Only the forking thread survives in a forked worker: the inherited lock may be held by the sampler
+    # thread, which does not exist there. Stages recorded in the worker stay in the worker's copy.
+    recorder = _current
+    if recorder is not None:
+        recorder._lock = threading.Lock()
+        recorder._local = threading.local()
+        recorder._open = []
+        recorder._sampler = None
+        recorder._stop = threading.Event()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def current_recorder() -> Optional[StageRecorder]:
+    """The most recently created StageRecorder of this process, if any."""
+    return _current
+
+
+def timed(name: str, rows: Optional[Union[int, Callable]] = None):
+    """
+    Record calls of the decorated function as a stage of the active recorder (see current_recorder).
+
+    Without a recorder the function runs unchanged, so decorated helpers can still be imported and
+    used elsewhere (e.g. by the inference server or in worker processes).
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            recorder = _current
+            if recorder is None:
+                return fn(*args, **kwargs)
+            return recorder.timed(name, rows)(fn)(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,184 @@
+"""
+Model serialization shared by training, evaluation, pushing and serving.
+
+Models are written as a single `model.mstore` file instead of a plain pickle:
+
+    MAGIC (8 bytes) | manifest length (uint64) | manifest JSON | padding | payload
+
+The payload holds the pickle stream (protocol 5) followed by the out-of-band buffers pickle hands
+out for numpy arrays (tree node tables, coefficients, vocabularies...), each aligned to 64 bytes. The
+manifest records their offsets, lengths, the compression codec and a CRC32 checksum of the payload
+(it guards against truncated or corrupted files; CRC32 runs at memory speed, so verifying it costs a
+fraction of unpickling).
+
+Loading memory-maps the file and passes the buffers back to pickle as views into the map, so array data
+is neither read into a bytes object first nor copied a second time while unpickling; pages are read from
+disk when the model touches them. The map is copy-on-write, so a loaded model can still be modified
+(e.g. partial_fit) without touching the file. Compressed stores (zlib, or lz4/zstd through pyarrow) are
+smaller on disk but their buffers are decompressed on load.
+
+Directories written by earlier versions of the pipeline only contain model.pkl; load_model falls back
+to it.
+"""
+import os
+import json
+import mmap
+import pickle
+import struct
+import zlib
+from typing import Optional
+
+MAGIC = b'MSTORE01'
+STORE_VERSION = 1
+STORE_FILE = 'model.mstore'
+LEGACY_FILE = 'model.pkl'
+COMPRESSIONS = ('none', 'zlib', 'lz4', 'zstd')
+_ALIGNMENT = 64
+_HEADER = struct.Struct('<8sQ')
+
+
+def _padding(offset: int) -> int:
+    return -offset % _ALIGNMENT
+
+
+def _compress(data, compression: str) -> bytes:
+    if compression == 'zlib':
+        return zlib.compress(data, 3)
+    import pyarrow as pa
+    return pa.Codec(compression).compress(data, asbytes=True)
+
+
+def _decompress(data, compression: str, length: int):
+    if compression == 'zlib':
+        return zlib.decompress(data)
+    import pyarrow as pa
+    return pa.Codec(compression).decompress(data, decompressed_size=length)
+
+
+def store_path(directory: str) -> str:
+    """Return the path of the model store file inside a model artifact directory."""
+    return os.path.join(directory, STORE_FILE)
+
+
+def save_model(model, directory: str, compression: Optional[str] = None) -> str:
+    """
+    Serialize `model` into `directory`/model.mstore.
+
+    :param compression: 'none' (default, memory-mappable), 'zlib', 'lz4' or 'zstd'
+    :return: Path of the written file
+    """
+    compression = (compression or 'none').lower()
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unsupported model store compression '{compression}'. Expected one of {COMPRESSIONS}.")
+
+    buffers = []
+    stream = pickle.dumps(model, protocol=5, buffer_callback=buffers.append)
+    raw_parts = [memoryview(stream)] + [buffer.raw() for buffer in buffers]
+    parts = raw_parts if compression == 'none' else [_compress(part, compression) for part in raw_parts]
+
+    # Lay the parts out back to back, each starting on an aligned offset of the payload
+    entries, offset = [], 0
+    for raw, stored in zip(raw_parts, parts):
+        entries.append({'offset': offset, 'length': raw.nbytes, 'stored_length': len(stored) if compression != 'none' else raw.nbytes})
+        offset += entries[-1]['stored_length']
+        offset += _padding(offset)
+
+    checksum = 0
+    for entry, part in zip(entries, parts):
+        checksum = zlib.crc32(part, checksum)
+        checksum = zlib.crc32(b'\0' * _padding(entry['offset'] + entry['stored_length']), checksum)
+
+    manifest = {
+        'version': STORE_VERSION,
+        'compression': compression,
+        'model_class': f"{type(model).__module__}.{type(model).__qualname__}",
+        'pickle': entries[0],
+        'buffers': entries[1:],
+        'payload_length': offset,
+        'checksum': f"crc32:{checksum:08x}",
+    }
+    manifest_bytes = json.dumps(manifest).encode('utf-8')
+    header_length = _HEADER.size + len(manifest_bytes)
+
+    os.makedirs(directory, exist_ok=True)
+    path = store_path(directory)
+    with open(path, 'wb') as file:
+        file.write(_HEADER.pack(MAGIC, len(manifest_bytes)))
+        file.write(manifest_bytes)
+        file.write(b'\0' * _padding(header_length))
+        for entry, part in zip(entries, parts):
+            file.write(part)
+            file.write(b'\0' * _padding(entry['offset'] + entry['stored_length']))
+    return path
+
+
+def read_manifest(path: str) -> dict:
+    """Read the manifest of a model store file without loading the model."""
+    with open(path, 'rb') as file:
+        return _read_manifest(file.read(_HEADER.size), file)
+
+
+def _read_manifest(header: bytes, source) -> dict:
+    magic, manifest_length = _HEADER.unpack(header[:_HEADER.size])
+    if magic != MAGIC:
+        raise ValueError("Not a model store file (bad magic bytes).")
+    manifest_bytes = source.read(manifest_length) if hasattr(source, 'read') else source[_HEADER.size:_HEADER.size + manifest_length]
+    manifest = json.loads(bytes(manifest_bytes))
+    if manifest.get('version') != STORE_VERSION:
+        raise ValueError(f"Unsupported model store version {manifest.get('version')} (expected {STORE_VERSION}).")
+    manifest['_payload_start'] = _HEADER.size + manifest_length + _padding(_HEADER.size + manifest_length)
+    return manifest
+
+
+def load_store(path: str, use_mmap: bool = True, verify: bool = True):
+    """
+    Load a model from a model store file.
+
+    :param use_mmap: Memory-map the file (copy-on-write) instead of reading it into memory
+    :param verify: Check the payload checksum before unpickling
+    :raises ValueError: If the file is not a model store or the checksum does not match
+    """
+    with open(path, 'rb') as file:
+        if use_mmap:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_COPY)
+        else:
+            data = file.read()
+    view = memoryview(data)
+    manifest = _read_manifest(view[:_HEADER.size], view)
+    start = manifest['_payload_start']
+    payload = view[start:start + manifest['payload_length']]
+    if len(payload) != manifest['payload_length']:
+        raise ValueError(f"Model store {path} is truncated.")
+
+    if verify:
+        if f"crc32:{zlib.crc32(payload):08x}" != manifest['checksum']:
+            raise ValueError(f"Checksum mismatch for {path}; the model file is corrupted.")
+
+    compression = manifest['compression']
+
+    def part(entry: dict):
+        stored = payload[entry['offset']:entry['offset'] + entry['stored_length']]
+        return stored if compression == 'none' else _decompress(stored, compression, entry['length'])
+
+    return pickle.loads(part(manifest['pickle']), buffers=[part(entry) for entry in manifest['buffers']])
+
+
+def load_model(directory: str, use_mmap: bool = True, verify: bool = True):
+    """
+    Load the model saved in a model artifact directory: model.mstore, or model.pkl from older runs.
+
+    :raises FileNotFoundError: If the directory holds neither file
+    """
+    path = store_path(directory)
+    if os.path.exists(path):
+        return load_store(path, use_mmap=use_mmap, verify=verify)
+    legacy_path = os.path.join(directory, LEGACY_FILE)
+    if os.path.exists(legacy_path):
+        with open(legacy_path, 'rb') as file:
+            return pickle.load(file)
+    raise FileNotFoundError(f"No {STORE_FILE} or {LEGACY_FILE} found in {directory}")
+
+
+def has_model(directory: str) -> bool:
+    """Return True if the directory holds a saved model in either format."""
+    return os.path.exists(store_path(directory)) or os.path.exists(os.path.join(directory, LEGACY_FILE))
@@ -0,0 +1,229 @@
+"""
+Persistent per-message cache of normalized text for the preprocessing step.
+
+Normalizing a message (tokenizing, stopword removal, stemming) costs far more than looking it up, and a
+growing training set mostly consists of messages an earlier run already normalized. The cache is a SQLite
+table keyed by a 128-bit digest of the raw message:
+
+    entries(key BLOB PRIMARY KEY, value TEXT, size INTEGER, last_used INTEGER)
+
+Lookups are batched, only the misses are normalized (by whatever normalizer or worker pool the caller
+passes) and the new entries are written back in one transaction per batch. The database also records the
+normalizer version it was built with; a different version (e.g. a changed text_normalizer.py) clears it,
+so cached text is always what the current normalizer would produce.
+
+On close, entries not used for max_age_days are evicted, then the least recently used ones until the
+stored text fits in max_size_mb. Settings come from 2_Data_Preprocessing.normalization_cache in
+params.yaml:
+
+    normalization_cache:
+      enabled: true
+      backend: minio            # local | minio
+      local_path: .normalization_cache/normalized.sqlite
+      max_age_days: 90
+      max_size_mb: 1024
+      minio:
+        endpoint: http://minio-service.kubeflow:9000
+        bucket: mlpipeline
+        key: normalization-cache/normalized.sqlite
+
+With the minio backend the database file is downloaded when the cache is opened and uploaded again when it
+is closed (the last writer wins when runs overlap; a lost update only costs recomputation). MinIO
+credentials are read by boto3 from the usual AWS_ACCESS_KEY_ID / AWS_SECRET_ACCESS_KEY variables.
+"""
+import os
+import time
+import sqlite3
+import hashlib
+import tempfile
+from typing import Callable, List, Optional
+
+SCHEMA_VERSION = 1
+# Keys per SELECT/UPDATE statement (SQLite limits the number of bound parameters)
+_BATCH_SIZE = 900
+
+
+def text_key(text: str) -> bytes:
+    """Digest of a raw message used as its cache key."""
+    return hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+
+class NormalizationCache:
+    """
+    SQLite-backed map from raw message to normalized message.
+
+    :param path: Database file (created if missing)
+    :param version: Version of the normalization (entries of another version are discarded)
+    :param max_age_days: Evict entries not used for this many days (None keeps them)
+    :param max_size_mb: Evict least recently used entries beyond this much stored text (None: no limit)
+    """
+
+    def __init__(self, path: str, version: str, max_age_days: Optional[float] = None, max_size_mb: Optional[float] = None):
+        self.path = path
+        self.version = version
+        self.max_age_days = max_age_days
+        self.max_size_mb = max_size_mb
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self.cleared = False
+        self._now = int(time.time())
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        with self._conn:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS entries (key BLOB PRIMARY KEY, value TEXT NOT NULL, "
+                               "size INTEGER NOT NULL, last_used INTEGER NOT NULL)")
+            stored = dict(self._conn.execute("SELECT name, value FROM meta"))
+            if stored.get('schema') != str(SCHEMA_VERSION) or stored.get('version') != version:
+                self.cleared = bool(stored)
+                self._conn.execute("DELETE FROM entries")
+                self._conn.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                                       [('schema', str(SCHEMA_VERSION)), ('version', version)])
+        if self.cleared:
+            self._vacuum()
+
+    @classmethod
+    def from_params(cls, section: Optional[dict], version: str) -> Optional['NormalizationCache']:
+        """Open the cache described by a normalization_cache section of params.yaml, or None if it is disabled."""
+        section = section or {}
+        if not section.get('enabled', False):
+            return None
+        backend = section.get('backend', 'local')
+        limits = {'max_age_days': section.get('max_age_days'), 'max_size_mb': section.get('max_size_mb')}
+        if backend == 'local':
+            return cls(section.get('local_path', '.normalization_cache/normalized.sqlite'), version, **limits)
+        if backend == 'minio':
+            minio = section.get('minio', {}) or {}
+            return MinioNormalizationCache(minio['endpoint'], minio['bucket'],
+                                           minio.get('key', 'normalization-cache/normalized.sqlite'), version, **limits)
+        raise ValueError(f"Unknown normalization cache backend '{backend}'. Expected 'local' or 'minio'.")
+
+    def describe(self) -> str:
+        return f"local:{self.path}"
+
+    def get_many(self, keys: List[bytes]) -> dict:
+        """Return {key: normalized text} for the keys present, marking them as used."""
+        found = {}
+        for start in range(0, len(keys), _BATCH_SIZE):
+            batch = keys[start:start + _BATCH_SIZE]
+            placeholders = ','.join('?' * len(batch))
+            found.update(self._conn.execute(f"SELECT key, value FROM entries WHERE key IN ({placeholders})", batch))
+        if found:
+            with self._conn:
+                hit_keys = list(found)
+                for start in range(0, len(hit_keys), _BATCH_SIZE):
+                    batch = hit_keys[start:start + _BATCH_SIZE]
+                    self._conn.execute(f"UPDATE entries SET last_used = ? WHERE key IN ({','.join('?' * len(batch))})",
+                                       [self._now, *batch])
+        return found
+
+    def put_many(self, items: List[tuple]) -> None:
+        """Store (key, normalized text) pairs in one transaction."""
+        with self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+                                   [(key, value, len(key) + len(value.encode('utf-8', 'surrogatepass')), self._now)
+                                    for key, value in items])
+
+    def normalize_batch(self, texts: List[str], normalize: Callable[[List[str]], List[str]]) -> List[str]:
+        """
+        Normalize texts, computing only the distinct messages missing from the cache.
+
+        :param normalize: Function normalizing a list of messages (e.g. TextNormalizer.normalize_batch or a
+                          worker pool); it is called once, with the misses
+        :return: Normalized messages aligned with texts
+        """
+        keys = {}
+        for text in texts:
+            if text not in keys:
+                keys[text] = text_key(text)
+        found = self.get_many(list(keys.values()))
+        missing = [text for text, key in keys.items() if key not in found]
+        self.hits += len(keys) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            normalized = normalize(missing)
+            items = [(keys[text], value) for text, value in zip(missing, normalized)]
+            self.put_many(items)
+            found.update(items)
+        return [found[keys[text]] for text in texts]
+
+    @property
+    def hit_rate(self) -> Optional[float]:
+        """Share of distinct messages looked up so far that were found in the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else None
+
+    def stats(self) -> dict:
+        entries, stored = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hit_rate, 'evicted': self.evicted,
+                'entries': entries, 'size_mb': round(stored / 2**20, 1), 'cleared': self.cleared}
+
+    def evict(self) -> int:
+        """Evict entries older than max_age_days, then the least recently used beyond max_size_mb."""
+        evicted = 0
+        with self._conn:
+            if self.max_age_days is not None:
+                cutoff = self._now - int(self.max_age_days * 86400)
+                evicted += self._conn.execute("DELETE FROM entries WHERE last_used < ?", (cutoff,)).rowcount
+            if self.max_size_mb is not None:
+                # Keep the most recently used entries whose running size stays within the limit
+                evicted += self._conn.execute(
+                    "DELETE FROM entries WHERE rowid IN (SELECT rowid FROM (SELECT rowid, SUM(size) OVER "
+                    "(ORDER BY last_used DESC, rowid DESC) AS kept FROM entries) WHERE kept > ?)",
+                    (int(self.max_size_mb * 2**20),)).rowcount
+        if evicted:
+            self._vacuum()
+        self.evicted += evicted
+        return evicted
+
+    def _vacuum(self) -> None:
+        # Give the freed pages back to the file system; executescript steps the pragma to completion
+        # (a single execute() frees one page)
+        self._conn.executescript("PRAGMA incremental_vacuum;")
+
+    def close(self) -> dict:
+        """Apply eviction, close the database and return its final stats()."""
+        self.evict()
+        stats = self.stats()
+        self._conn.close()
+        return stats
+
+
+class MinioNormalizationCache(NormalizationCache):
+    """NormalizationCache whose database file is kept as one object in a MinIO/S3 bucket between runs."""
+
+    def __init__(self, endpoint: str, bucket: str, key: str, version: str, **limits):
+        try:
+            import boto3
+            from botocore.exceptions import ClientError
+        except ImportError as e:
+            raise ImportError("The 'minio' normalization cache backend requires boto3 (pip install boto3).") from e
+        self.client = boto3.client('s3', endpoint_url=endpoint)
+        self.bucket = bucket
+        self.key = key
+        self._tmp_dir = tempfile.mkdtemp(prefix='normalization-cache-')
+        path = os.path.join(self._tmp_dir, os.path.basename(key) or 'normalized.sqlite')
+        try:
+            self.client.download_file(bucket, key, path)
+        except ClientError as e:
+            # The first run starts from an empty database
+            if e.response.get('Error', {}).get('Code') not in ('404', 'NoSuchKey', 'NotFound'):
+                raise
+        super().__init__(path, version, **limits)
+
+    def describe(self) -> str:
+        return f"s3://{self.bucket}/{self.key}"
+
+    def close(self) -> dict:
+        """Apply eviction, upload the database and return its final stats()."""
+        stats = super().close()
+        try:
+            self.client.upload_file(self.path, self.bucket, self.key)
+        finally:
+            os.remove(self.path)
+            os.rmdir(self._tmp_dir)
+        return stats
@@ -0,0 +1,256 @@
+"""
+Content-addressed cache for pipeline step outputs.
+
+A step's cache key is a digest of everything that determines its outputs:
+
+    * the component name and the source code of the files it runs,
+    * the params.yaml sections (or other settings) it reads,
+    * the content of its input artifacts (files/directories) or, for http(s) URLs, their address and the
+      version the server reports for them (ETag, Last-Modified and Content-Length of a HEAD request).
+
+A URL whose server reports none of these cannot be told apart from its next revision, so digest_input
+raises UncacheableInputError for it (and for other remote addresses); the step then runs uncached unless
+the caller keys it by a version pinned in its settings instead.
+
+On entry a component looks its key up; on a hit the cached output directories are copied into the
+Kubeflow output paths and the step returns without recomputing. After a miss the outputs are stored
+under the key. Entries live in a local directory or in a MinIO/S3 bucket, configured by the
+'step_cache' section of params.yaml:
+
+    step_cache:
+      enabled: true
+      backend: minio            # local | minio
+      local_dir: .step_cache
+      minio:
+        endpoint: http://minio-service.kubeflow:9000
+        bucket: mlpipeline
+        prefix: step-cache
+
+MinIO credentials are read by boto3 from the usual AWS_ACCESS_KEY_ID / AWS_SECRET_ACCESS_KEY variables.
+"""
+import os
+import sys
+import json
+import shutil
+import hashlib
+import tempfile
+import urllib.request
+from typing import Dict, Iterable, List, Optional
+
+CACHE_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+_CHUNK_SIZE = 1 << 20
+_VERSION_HEADERS = ('ETag', 'Last-Modified', 'Content-Length')
+_HEAD_TIMEOUT_SECONDS = 10
+
+
+class UncacheableInputError(Exception):
+    """Raised when an input's content cannot be identified, so its step must not be cached."""
+
+
+def _hash_file(hasher, path: str) -> None:
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(_CHUNK_SIZE), b''):
+            hasher.update(block)
+
+
+def digest_path(path: str) -> str:
+    """
+    Return a digest of a file or directory tree.
+
+    Directories are hashed from their relative file names and file contents in sorted order, so the
+    digest does not depend on where the artifact was downloaded to.
+    """
+    hasher = hashlib.blake2b(digest_size=32)
+    if os.path.isdir(path):
+        for rel_path in sorted(_iter_files(path)):
+            hasher.update(rel_path.replace(os.sep, '/').encode('utf-8') + b'\0')
+            _hash_file(hasher, os.path.join(path, rel_path))
+            hasher.update(b'\0')
+    else:
+        _hash_file(hasher, path)
+    return hasher.hexdigest()
+
+
+def remote_version(url: str, timeout: float = _HEAD_TIMEOUT_SECONDS) -> Dict[str, str]:
+    """Return the version headers (ETag, Last-Modified, Content-Length) the server reports for `url`."""
+    request = urllib.request.Request(url, method='HEAD')
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return {name: response.headers[name] for name in _VERSION_HEADERS if response.headers.get(name)}
+
+
+def digest_input(value: str) -> str:
+    """
+    Digest an input that is either a local file/directory (by content) or an http(s) URL (by address and
+    the version headers of a HEAD request).
+
+    :raises UncacheableInputError: for a URL without version headers, an unreachable URL or another remote address
+    """
+    if os.path.exists(value):
+        return 'content:' + digest_path(value)
+    if value.startswith(('http://', 'https://')):
+        try:
+            version = remote_version(value)
+        except OSError as e:
+            raise UncacheableInputError(f"Could not read the version of {value}: {e}") from e
+        if not version:
+            raise UncacheableInputError(f"{value} reports no ETag, Last-Modified or Content-Length.")
+        return 'address:' + value + '@' + json.dumps(version, sort_keys=True)
+    raise UncacheableInputError(f"{value} is neither a local path nor an http(s) URL.")
+
+
+def module_files(*objects) -> List[str]:
+    """Return the source files of the modules defining `objects` (e.g. shared helper functions a step uses)."""
+    return sorted({os.path.abspath(sys.modules[obj.__module__].__file__) for obj in objects})
+
+
+def _iter_files(root: str) -> Iterable[str]:
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            yield os.path.relpath(os.path.join(dirpath, filename), root)
+
+
+class LocalCacheStore:
+    """Cache entries stored as directories under a local root: <root>/<key>/<output>/..."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def describe(self) -> str:
+        return f"local:{self.root}"
+
+    def has(self, key: str) -> bool:
+        return os.path.exists(os.path.join(self.root, key, MANIFEST_NAME))
+
+    def get(self, key: str, outputs: Dict[str, str]) -> None:
+        entry = os.path.join(self.root, key)
+        for name, target in outputs.items():
+            shutil.copytree(os.path.join(entry, name), target, dirs_exist_ok=True)
+
+    def put(self, key: str, outputs: Dict[str, str], manifest: dict) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        entry = os.path.join(self.root, key)
+        # Build the entry next to its final location and rename it into place, so readers never see a partial entry
+        staging = tempfile.mkdtemp(prefix=f".{key}-", dir=self.root)
+        try:
+            for name, source in outputs.items():
+                shutil.copytree(source, os.path.join(staging, name))
+            with open(os.path.join(staging, MANIFEST_NAME), 'w') as file:
+                json.dump(manifest, file, indent=4)
+            if os.path.exists(entry):
+                shutil.rmtree(entry)
+            os.replace(staging, entry)
+        finally:
+            if os.path.exists(staging):
+                shutil.rmtree(staging)
+
+
+class MinioCacheStore:
+    """Cache entries stored as objects in a MinIO/S3 bucket: <prefix>/<key>/<output>/..."""
+
+    def __init__(self, endpoint: str, bucket: str, prefix: str = 'step-cache'):
+        try:
+            import boto3
+        except ImportError as e:
+            raise ImportError("The 'minio' step cache backend requires boto3 (pip install boto3).") from e
+        self.client = boto3.client('s3', endpoint_url=endpoint)
+        self.bucket = bucket
+        self.prefix = prefix.strip('/')
+
+    def describe(self) -> str:
+        return f"s3://{self.bucket}/{self.prefix}"
+
+    def _object_key(self, key: str, *parts: str) -> str:
+        return '/'.join([self.prefix, key, *parts])
+
+    def has(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._object_key(key, MANIFEST_NAME))
+            return True
+        except ClientError:
+            return False
+
+    def get(self, key: str, outputs: Dict[str, str]) -> None:
+        paginator = self.client.get_paginator('list_objects_v2')
+        for name, target in outputs.items():
+            object_prefix = self._object_key(key, name) + '/'
+            for page in paginator.paginate(Bucket=self.bucket, Prefix=object_prefix):
+                for obj in page.get('Contents', []):
+                    local_path = os.path.join(target, *obj['Key'][len(object_prefix):].split('/'))
+                    os.makedirs(os.path.dirname(local_path), exist_ok=True)
+                    self.client.download_file(self.bucket, obj['Key'], local_path)
+
+    def put(self, key: str, outputs: Dict[str, str], manifest: dict) -> None:
+        for name, source in outputs.items():
+            for rel_path in _iter_files(source):
+                self.client.upload_file(os.path.join(source, rel_path), self.bucket,
+                                        self._object_key(key, name, *rel_path.split(os.sep)))
+        # The manifest is written last and marks the entry as complete
+        self.client.put_object(Bucket=self.bucket, Key=self._object_key(key, MANIFEST_NAME),
+                               Body=json.dumps(manifest, indent=4).encode('utf-8'))
+
+
+class StepCache:
+    """Look up and store step outputs by content hash."""
+
+    def __init__(self, store):
+        self.store = store
+
+    @classmethod
+    def from_params(cls, params: Optional[dict]) -> Optional['StepCache']:
+        """Create the cache described by the 'step_cache' section of params.yaml, or None if it is disabled."""
+        section = (params or {}).get('step_cache', {}) or {}
+        if not section.get('enabled', False):
+            return None
+        backend = section.get('backend', 'local')
+        if backend == 'local':
+            return cls(LocalCacheStore(section.get('local_dir', '.step_cache')))
+        if backend == 'minio':
+            minio = section.get('minio', {}) or {}
+            return cls(MinioCacheStore(endpoint=minio['endpoint'], bucket=minio['bucket'],
+                                       prefix=minio.get('prefix', 'step-cache')))
+        raise ValueError(f"Unknown step cache backend '{backend}'. Expected 'local' or 'minio'.")
+
+    @staticmethod
+    def key(component: str, source_files: List[str], settings, inputs: List[str]) -> str:
+        """
+        Compute the cache key of a step.
+
+        :param component: Component name
+        :param source_files: Source files whose code determines the outputs
+        :param settings: JSON-serializable settings the step reads (e.g. its params.yaml section)
+        :param inputs: Input artifact paths (hashed by content) or http(s) URLs (hashed by address and version)
+        :raises UncacheableInputError: if an input cannot be identified (see digest_input)
+        """
+        description = {
+            'version': CACHE_VERSION,
+            'component': component,
+            'sources': [digest_path(path) for path in source_files],
+            'settings': settings,
+            'inputs': [digest_input(value) for value in inputs],
+        }
+        payload = json.dumps(description, sort_keys=True, default=str).encode('utf-8')
+        return hashlib.blake2b(payload, digest_size=32).hexdigest()
+
+    def restore(self, key: str, outputs: Dict[str, str]) -> bool:
+        """
+        Copy the cached outputs for `key` into the output directories.
+
+        :param outputs: Mapping of output name to output directory
+        :return: True on a cache hit, False on a miss
+        """
+        if not self.store.has(key):
+            return False
+        for target in outputs.values():
+            os.makedirs(target, exist_ok=True)
+        self.store.get(key, outputs)
+        return True
+
+    def save(self, key: str, outputs: Dict[str, str], component: str = '') -> None:
+        """Store the output directories under `key`."""
+        manifest = {'version': CACHE_VERSION, 'component': component, 'outputs': sorted(outputs)}
+        self.store.put(key, outputs, manifest)
+
+    def describe(self) -> str:
+        return self.store.describe()
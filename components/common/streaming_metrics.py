@@ -0,0 +1,128 @@
+"""
+Streaming classification metrics with Poisson-bootstrap resamples.
+
+StreamingEvaluator accumulates a confusion matrix and per-class score histograms chunk by chunk, so
+memory does not grow with the evaluated set, and updates every bootstrap resample with one matrix
+product per chunk. Used by model evaluation (metrics.json with confidence intervals) and by the
+pusher's paired champion/challenger comparison, where one evaluator draws the resample weights of each
+chunk (draw_weights) and both are updated with them, so their per-resample metrics are paired.
+"""
+from typing import Optional
+
+import numpy as np
+from scipy import sparse
+from scipy.special import expit
+
+METRICS = ('accuracy', 'precision', 'recall', 'f1_score', 'auc')
+
+# Poisson(1) quantiles of 2**16 evenly spaced probabilities: indexing this table with uniform uint16 draws
+# samples bootstrap weights ~5x faster than Generator.poisson (each probability is off by < 2**-16)
+_POISSON_WEIGHTS = np.searchsorted(np.cumsum(np.exp(-1.0) / np.cumprod([1, *range(1, 20)])),
+                                   (np.arange(2**16) + 0.5) / 2**16).astype(np.float64)
+
+
+def metrics_from_counts(counts: np.ndarray, histograms: np.ndarray) -> dict:
+    """
+    Compute accuracy, precision, recall, F1 and AUC from accumulated counts.
+
+    Works on a single evaluation or on a batch of bootstrap resamples at once (leading axes are kept).
+
+    :param counts: [..., 4] weighted counts of (tn, fp, fn, tp)
+    :param histograms: [..., 2, n_bins] weighted score histograms of the negative and positive class
+    """
+    tn, fp, fn, tp = np.moveaxis(np.asarray(counts, dtype=np.float64), -1, 0)
+    negatives, positives = np.moveaxis(np.asarray(histograms, dtype=np.float64), -2, 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Undefined precision/recall/F1 count as 0, like sklearn's zero_division default
+        precision = np.where(tp + fp > 0, tp / (tp + fp), 0.0)
+        recall = np.where(tp + fn > 0, tp / (tp + fn), 0.0)
+        f1_score = np.where(2 * tp + fp + fn > 0, 2 * tp / (2 * tp + fp + fn), 0.0)
+        # Mann-Whitney AUC over the histogram bins: a positive beats every negative in a lower bin and
+        # ties with the negatives of its own bin
+        negatives_below = np.cumsum(negatives, axis=-1) - negatives
+        auc = (np.sum(positives * (negatives_below + 0.5 * negatives), axis=-1)
+               / (positives.sum(axis=-1) * negatives.sum(axis=-1)))
+        accuracy = (tp + tn) / (tn + fp + fn + tp)
+    return {'accuracy': accuracy, 'precision': precision, 'recall': recall, 'f1_score': f1_score, 'auc': auc}
+
+
+class StreamingEvaluator:
+    """
+    Accumulate classification metrics over chunks of predictions, with Poisson-bootstrap resamples.
+
+    Every chunk adds to a confusion matrix and to per-class histograms of the scores (n_bins bins over
+    [0, 1]; decision-function margins are mapped through the logistic function first). The AUC is
+    computed from the histograms: exact when the scores take at most one value per bin (e.g.
+    RandomForest probabilities), otherwise scores sharing a bin count as ties.
+
+    Bootstrap resamples are drawn as Poisson(1) weights per row and resample (the streaming equivalent
+    of resampling with replacement). The weights of a chunk form a [rows, n_resamples] matrix, and a
+    sparse one-hot [rows, 4 + 2 * n_bins] matrix of each row's confusion cell and score bin turns the
+    update of all resamples into one matrix product.
+    """
+
+    def __init__(self, n_bins: int = 1000, n_resamples: int = 1000, random_state: Optional[int] = None,
+                 max_weights: int = 8_000_000):
+        self.n_bins = n_bins
+        self.n_resamples = n_resamples
+        self.max_weights = max_weights
+        self._rng = np.random.default_rng(random_state)
+        self._totals = np.zeros(4 + 2 * n_bins, dtype=np.float64)
+        self._resampled = np.zeros((4 + 2 * n_bins, n_resamples), dtype=np.float64)
+        self.n_samples = 0
+
+    def _score_bins(self, scores: np.ndarray, probabilities: bool) -> np.ndarray:
+        scores = np.asarray(scores, dtype=np.float64)
+        if not probabilities:
+            scores = expit(scores)
+        return np.clip((scores * self.n_bins).astype(np.int64), 0, self.n_bins - 1)
+
+    def draw_weights(self, rows: int) -> np.ndarray:
+        """Draw Poisson(1) bootstrap weights for `rows` rows as a [rows, n_resamples] matrix."""
+        return _POISSON_WEIGHTS[self._rng.integers(0, 2**16, size=(rows, self.n_resamples), dtype=np.uint16)]
+
+    def update(self, y_true: np.ndarray, y_pred: np.ndarray, scores: np.ndarray, probabilities: bool = True,
+               weights: Optional[np.ndarray] = None) -> None:
+        """
+        Add one chunk of labels (0/1), predicted labels and positive-class scores.
+
+        :param weights: [rows, n_resamples] bootstrap weights to use instead of drawing them (e.g. the
+                        weights another evaluator drew, for paired resamples)
+        """
+        y_true = np.asarray(y_true, dtype=np.int64)
+        rows = len(y_true)
+        cells = 2 * y_true + np.asarray(y_pred, dtype=np.int64)  # tn, fp, fn, tp
+        bins = 4 + y_true * self.n_bins + self._score_bins(scores, probabilities)
+        columns = np.stack([cells, bins], axis=1).ravel()
+        one_hot = sparse.csr_matrix((np.ones(2 * rows), columns, np.arange(0, 2 * rows + 1, 2)),
+                                    shape=(rows, len(self._totals)))
+        self._totals += np.bincount(columns, minlength=len(self._totals))
+        self.n_samples += rows
+
+        if self.n_resamples and weights is not None:
+            if weights.shape != (rows, self.n_resamples):
+                raise ValueError(f"Expected bootstrap weights of shape {(rows, self.n_resamples)}, got {weights.shape}.")
+            self._resampled += one_hot.T @ weights
+        elif self.n_resamples:
+            # Bound the [rows, n_resamples] weight matrix held at once
+            step = max(1, self.max_weights // self.n_resamples)
+            for start in range(0, rows, step):
+                self._resampled += one_hot[start:start + step].T @ self.draw_weights(min(step, rows - start))
+
+    def _split(self, values: np.ndarray) -> tuple:
+        return values[:4], values[4:].reshape(2, self.n_bins, *values.shape[1:])
+
+    def compute(self) -> dict:
+        """Metrics of the whole stream."""
+        return {name: float(value) for name, value in metrics_from_counts(*self._split(self._totals)).items()}
+
+    def resampled_metrics(self) -> dict:
+        """Every metric on every bootstrap resample, as {metric: array of n_resamples values}."""
+        counts, histograms = self._split(self._resampled)
+        return metrics_from_counts(np.moveaxis(counts, -1, 0), np.moveaxis(histograms, -1, 0))
+
+    def compute_intervals(self, confidence_level: float = 0.95) -> dict:
+        """Percentile bootstrap interval of every metric, as {metric: (lower, upper)}."""
+        alpha = (1.0 - confidence_level) / 2
+        return {name: tuple(float(bound) for bound in np.nanquantile(values, [alpha, 1.0 - alpha]))
+                for name, values in self.resampled_metrics().items()}
@@ -0,0 +1,128 @@
+"""
+Text normalization shared by preprocessing and online inference.
+
+TextNormalizer reproduces the original per-row transform_text of the preprocessing step: lowercasing,
+tokenizing with nltk.word_tokenize, dropping non-alphanumeric tokens and English stopwords, and Porter
+stemming. Keeping it in one module guarantees that the text a served model sees is normalized exactly
+like the text it was trained on.
+
+The tokenizer is selectable (2_Data_Preprocessing.tokenizer in params.yaml):
+
+    nltk   nltk.word_tokenize (Punkt sentence splitting and Treebank rules), then alphanumeric tokens only
+    alnum  maximal runs of alphanumeric characters: str.translate turns every other character into a
+           space and the text is split on whitespace
+
+Both keep exactly the characters str.isalnum() accepts, but they split differently: the Treebank rules
+turn "don't" into "do" + "n't" (dropped as non-alphanumeric) while alnum gives "don" + "t", and a word
+with inner punctuation ("u.s", "www.site.com") is one dropped token for NLTK but several kept ones for
+alnum. benchmarks/bench_tokenizer.py measures the difference on a dataset. The tokenizer is saved with
+the normalizer, so a model bundled with it is served with the tokenizer it was trained with.
+"""
+from functools import lru_cache
+from typing import Iterable, List, Optional
+
+import nltk
+from nltk.corpus import stopwords
+from nltk.data import path as nltk_data_path
+from nltk.stem.porter import PorterStemmer
+
+# Location of the NLTK data inside the container images
+nltk_data_path.append('/usr/share/nltk_data')
+
+TOKENIZERS = ('nltk', 'alnum')
+
+
+class _AlnumSeparators(dict):
+    """str.translate table mapping every non-alphanumeric character to a space, filled in on first use."""
+
+    def __missing__(self, codepoint: int):
+        value = self[codepoint] = codepoint if chr(codepoint).isalnum() else ' '
+        return value
+
+
+_SEPARATORS = _AlnumSeparators()
+
+
+def tokenizer_from_params(params: Optional[dict]) -> str:
+    """Return the tokenizer selected by 2_Data_Preprocessing.tokenizer (default 'nltk')."""
+    tokenizer = ((params or {}).get('2_Data_Preprocessing', {}) or {}).get('tokenizer', 'nltk')
+    if tokenizer not in TOKENIZERS:
+        raise ValueError(f"Unknown tokenizer '{tokenizer}'. Expected one of {', '.join(TOKENIZERS)}.")
+    return tokenizer
+
+
+class TextNormalizer:
+    """
+    Reusable text normalization engine producing (with the default 'nltk' tokenizer) exactly the same output
+    as the original per-row transform_text: lowercasing, tokenizing, dropping non-alphanumeric tokens and stopwords, and stemming.
+
+    The stemmer and stopword list are loaded once per instance, stopwords are checked against a frozenset
+    and token stems are memoized in a bounded LRU cache, so whole batches of messages can be processed cheaply.
+
+    :param stem_cache_size: Maximum number of token -> stem entries kept in the LRU cache
+    :param tokenizer: 'nltk' (nltk.word_tokenize) or 'alnum' (runs of alphanumeric characters)
+    :raises LookupError: If the NLTK stopwords corpus is not installed
+    """
+
+    def __init__(self, stem_cache_size: int = 100_000, tokenizer: str = 'nltk'):
+        if tokenizer not in TOKENIZERS:
+            raise ValueError(f"Unknown tokenizer '{tokenizer}'. Expected one of {', '.join(TOKENIZERS)}.")
+        self.stem_cache_size = stem_cache_size
+        self.tokenizer = tokenizer
+        self._stop_words = frozenset(stopwords.words('english'))
+        self._build_stemmer()
+
+    def _build_stemmer(self) -> None:
+        self._stemmer = PorterStemmer()
+        self._stem = lru_cache(maxsize=self.stem_cache_size)(self._stemmer.stem)
+
+    def __getstate__(self) -> dict:
+        # The LRU-cached stem function cannot be pickled; the stopwords travel with the object
+        return {'stem_cache_size': self.stem_cache_size, 'tokenizer': self.tokenizer,
+                'stop_words': sorted(self._stop_words)}
+
+    def __setstate__(self, state: dict) -> None:
+        self.stem_cache_size = state['stem_cache_size']
+        # Normalizers pickled before the tokenizer was selectable used NLTK
+        self.tokenizer = state.get('tokenizer', 'nltk')
+        self._stop_words = frozenset(state['stop_words'])
+        self._build_stemmer()
+
+    @property
+    def stop_word_count(self) -> int:
+        return len(self._stop_words)
+
+    def tokenize(self, text: str) -> List[str]:
+        """Split a lowercased message into its alphanumeric tokens, before stopword removal."""
+        if self.tokenizer == 'alnum':
+            return text.translate(_SEPARATORS).split()
+        return [word for word in nltk.word_tokenize(text) if word.isalnum()]
+
+    def normalize(self, text: str) -> str:
+        """Normalize a single message."""
+        stop_words = self._stop_words
+        stem = self._stem
+        # The original string.punctuation check is implied here: an alphanumeric token can never be
+        # a substring of string.punctuation, so it never removed anything after the isalnum() filter.
+        return " ".join([stem(word) for word in self.tokenize(text.lower()) if word not in stop_words])
+
+    def normalize_batch(self, texts: Iterable[str]) -> List[str]:
+        """
+        Normalize a batch of messages, processing each distinct message only once.
+
+        :param texts: Iterable of raw messages
+        :return: List of normalized messages in the same order as the input
+        """
+        seen = {}
+        normalize = self.normalize
+        result = []
+        for text in texts:
+            normalized = seen.get(text)
+            if normalized is None:
+                normalized = seen[text] = normalize(text)
+            result.append(normalized)
+        return result
+
+    def cache_info(self):
+        """Return hit/miss statistics of the stem cache."""
+        return self._stem.cache_info()
@@ -1,10 +1,19 @@
 import pandas as pd
+import numpy as np
 import os
+import hashlib
 from sklearn.model_selection import train_test_split
 import logging
 import yaml
 from datetime import datetime
 import argparse
+import sys
+
+# Shared helpers live in components/common (copied next to this script inside the container image)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from artifact_io import DatasetWriter, artifact_settings, write_dataset
+from step_cache import StepCache, UncacheableInputError, module_files
+from instrumentation import StageRecorder
 
 
 # Ensure that a directory named 'logs' exist in our root folder (if not it creates one)(for storing log file)
@@ -98,20 +107,82 @@ def preprocessing_data (df: pd.DataFrame) -> pd.DataFrame:
         logger.error("Unexpected error occeured while preprocessing: %s", e)
         raise
 
-# Function to save processed train and test dataset
-def save_data(train_data: pd.DataFrame, test_data: pd.DataFrame, train_output_path: str, test_output_path: str):
-    """Save the train and test datasets."""
+# Function to split rows into train/test deterministically from their content
+def hash_split(df: pd.DataFrame, test_size: float, seed: int) -> tuple:
+    """
+    Split rows into train and test sets using a seeded hash of each row's content.
+
+    Each row is assigned on its own, so the split can be computed chunk by chunk and is reproducible
+    for a given seed. The expected test fraction equals test_size.
+
+    :param df: DataFrame (or chunk) to split
+    :param test_size: Fraction of rows to put in the test set (0 < test_size < 1)
+    :param seed: Seed mixed into the row hash
+    :return: (train_df, test_df)
+    """
     try:
-        train_output_path = os.path.join(train_output_path, "train.csv")
-        test_output_path = os.path.join(test_output_path, "test.csv")
+        if not 0 < test_size < 1:
+            raise ValueError("test_size must be between 0 and 1.")
+        # hash_pandas_object needs a 16 character key, derive one from the seed
+        hash_key = hashlib.md5(str(seed).encode('utf-8')).hexdigest()[:16]
+        row_hashes = pd.util.hash_pandas_object(df, index=False, hash_key=hash_key).to_numpy()
+        is_test = row_hashes < np.uint64(int(test_size * 2**64))
+        return df[~is_test], df[is_test]
+    except Exception as e:
+        logger.error("Unexpected error occurred while splitting the data: %s", e)
+        raise
 
-        # Make sure parent directories exist
-        os.makedirs(os.path.dirname(train_output_path), exist_ok=True)
-        os.makedirs(os.path.dirname(test_output_path), exist_ok=True)
-        
-        logger.info("Saving train and test datasets...")
-        train_data.to_csv(train_output_path, index=False)
-        test_data.to_csv(test_output_path, index=False)
+# Function to ingest the dataset chunk by chunk with bounded memory
+def ingest_streaming(data_url: str, train_output_path: str, test_output_path: str, test_size: float, seed: int, chunksize: int,
+                     fmt: str = 'csv', compression: str = None):
+    """
+    Stream the raw CSV in chunks, clean each chunk and append its rows to the train or test dataset.
+
+    Only one chunk is held in memory at a time, so memory use does not grow with the dataset size.
+
+    :param chunksize: Number of rows read per chunk
+    :param fmt: Artifact format of the train/test datasets ('parquet', 'arrow' or 'csv')
+    :param compression: Compression codec for the artifacts (None uses the format default)
+    :return: (train rows, test rows) written
+    """
+    try:
+        if not isinstance(chunksize, int) or chunksize <= 0:
+            raise ValueError("chunksize must be a positive integer.")
+
+        logger.debug("Streaming data from %s in chunks of %d rows...", data_url, chunksize)
+        with DatasetWriter(train_output_path, "train", fmt, compression) as train_writer, \
+                DatasetWriter(test_output_path, "test", fmt, compression) as test_writer:
+            for i, chunk in enumerate(pd.read_csv(data_url, chunksize=chunksize)):
+                chunk = preprocessing_data(chunk)
+                train_chunk, test_chunk = hash_split(chunk, test_size, seed)
+                train_writer.write(train_chunk)
+                test_writer.write(test_chunk)
+                logger.debug("Chunk %d: %d train rows, %d test rows", i, len(train_chunk), len(test_chunk))
+
+        n_train, n_test = train_writer.rows_written, test_writer.rows_written
+        n_total = n_train + n_test
+        logger.info("Streaming ingestion completed: %d train rows, %d test rows (test fraction %.4f, expected %.4f)",
+                    n_train, n_test, n_test / n_total if n_total else 0.0, test_size)
+        logger.info('Training and test data saved to: "%s" & "%s" respectively.', train_writer.path, test_writer.path)
+        return n_train, n_test
+    except pd.errors.ParserError as e:
+        logger.error("Failed to parse the CSV file: %s", e)
+        raise
+    except FileNotFoundError as e:
+        logger.error('File not found: %s', e)
+        raise
+    except Exception as e:
+        logger.error("Unexpected error occurred during streaming ingestion: %s", e)
+        raise
+
+# Function to save processed train and test dataset
+def save_data(train_data: pd.DataFrame, test_data: pd.DataFrame, train_output_path: str, test_output_path: str,
+              fmt: str = 'csv', compression: str = None):
+    """Save the train and test datasets in the given artifact format ('parquet', 'arrow' or 'csv')."""
+    try:
+        logger.info("Saving train and test datasets as %s...", fmt)
+        train_output_path = write_dataset(train_data, train_output_path, "train", fmt, compression)
+        test_output_path = write_dataset(test_data, test_output_path, "test", fmt, compression)
        
         logger.info('Training and test data saved to: "%s" & "%s" respectively.', train_output_path, test_output_path)
     except Exception as e:
@@ -120,44 +191,98 @@ def save_data(train_data: pd.DataFrame, test_data: pd.DataFrame, train_output_pa
 
         
 # Define the main function to execute the data processing pipeline
-def main(param_file_path:str, data_url:str, train_output_path: str, test_output_path: str)->str:
+def main(param_file_path:str, data_url:str, train_output_path: str, test_output_path: str,
+         stage_metrics_path: str = None)->str:
+    recorder = None
     try:
         # Loading Parameters From params.yaml
         params = load_params(param_file_path)
+        recorder = StageRecorder.from_params('data_ingestion', params)
         
         # Set the test dataset size for splitting
-        test_size = params['1_Data_Ingestion']['test_size']
-        
-        # Define the URL of the dataset (CSV file)
-        #data_url = "https://raw.githubusercontent.com/PrakashD2003/DATASETS/refs/heads/main/spam.csv"
-        
-        # Load the dataset from the provided URL
-        df = load_data(data_url=data_url)
-        
-        # Preprocess the dataset (e.g., cleaning, feature extraction, transformation)
-        final_df = preprocessing_data(df)
-        
-        # Split the dataset into training and testing sets
-        train_data, test_data = train_test_split(final_df, test_size=test_size, random_state=2)
-        
-        # Save the train and test data to the specified directory
-        save_data(train_data, test_data,train_output_path=train_output_path, test_output_path=test_output_path)
+        ingestion_params = params['1_Data_Ingestion']
+        test_size = ingestion_params['test_size']
+        random_state = ingestion_params.get('random_state', 2)
+        fmt, compression = artifact_settings(params)
+
+        # Skip the step when the data source, settings and code are unchanged since a cached run
+        cache = StepCache.from_params(params)
+        outputs = {'train_data': train_output_path, 'test_data': test_output_path}
+        if cache is not None:
+            # A pinned data_version identifies the source, otherwise its content or HTTP version headers do
+            pinned = ingestion_params.get('data_version') is not None
+            try:
+                cache_key = StepCache.key('data_ingestion', [os.path.abspath(__file__), *module_files(write_dataset)],
+                                          {'1_Data_Ingestion': ingestion_params, 'artifact_io': params.get('artifact_io'),
+                                           'data_url': data_url if pinned else None},
+                                          [] if pinned else [data_url])
+            except UncacheableInputError as e:
+                logger.warning("Step cache skipped, the data source cannot be versioned (pin 1_Data_Ingestion.data_version): %s", e)
+                cache = None
+        if cache is not None:
+            with recorder.stage('cache_restore'):
+                restored = cache.restore(cache_key, outputs)
+            if restored:
+                logger.info("Step cache hit (%s): outputs restored from %s", cache_key[:16], cache.describe())
+                return
+            logger.info("Step cache miss (%s)", cache_key[:16])
+
+        # Stream the source in chunks instead of loading it all into memory
+        if ingestion_params.get('streaming', False):
+            with recorder.stage('ingest_streaming') as stage:
+                stage.add_rows(sum(ingest_streaming(data_url, train_output_path, test_output_path, test_size=test_size,
+                                                    seed=random_state, chunksize=ingestion_params.get('chunksize', 100000),
+                                                    fmt=fmt, compression=compression)))
+        else:
+            # Define the URL of the dataset (CSV file)
+            #data_url = "https://raw.githubusercontent.com/PrakashD2003/DATASETS/refs/heads/main/spam.csv"
+            
+            # Load the dataset from the provided URL
+            with recorder.stage('load_data') as stage:
+                df = load_data(data_url=data_url)
+                stage.rows = len(df)
+            
+            # Preprocess the dataset (e.g., cleaning, feature extraction, transformation)
+            with recorder.stage('clean', rows=len(df)):
+                final_df = preprocessing_data(df)
+            
+            # Split the dataset into training and testing sets
+            with recorder.stage('split', rows=len(final_df)):
+                train_data, test_data = train_test_split(final_df, test_size=test_size, random_state=random_state)
+            
+            # Save the train and test data to the specified directory
+            with recorder.stage('save_data', rows=len(final_df)):
+                save_data(train_data, test_data,train_output_path=train_output_path, test_output_path=test_output_path,
+                          fmt=fmt, compression=compression)
+
+        if cache is not None:
+            with recorder.stage('cache_save'):
+                cache.save(cache_key, outputs, component='data_ingestion')
+            logger.info("Step outputs stored in cache %s", cache.describe())
 
     # Handle any unexpected exceptions that may occur during execution
     except Exception as e:
         logger.error('Failed to complete the data ingestion process: %s', e)
         print(f"Error: {e}")
+    finally:
+        # Stage timings are written even when the step failed or was restored from the cache
+        if recorder is not None:
+            logger.info("Stage metrics:\n%s", recorder.summary())
+            if stage_metrics_path:
+                recorder.write(stage_metrics_path)
 
 # Ensure that the main function runs only when the script is executed directly
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument("param_file_path", type=str, help="Path to params.yaml")
     parser.add_argument("data_url", type=str, help="URL to raw data")
-    parser.add_argument("train_output_path", type=str, help="Output file path for train.csv")
-    parser.add_argument("test_output_path", type=str, help="Output file path for test.csv")
+    parser.add_argument("train_output_path", type=str, help="Output directory for the train dataset")
+    parser.add_argument("test_output_path", type=str, help="Output directory for the test dataset")
+    parser.add_argument("--stage_metrics_path", type=str, default=None, help="Output directory for stage_metrics.json")
     args = parser.parse_args()
 
-    main(args.param_file_path, args.data_url, args.train_output_path, args.test_output_path)
+    main(args.param_file_path, args.data_url, args.train_output_path, args.test_output_path,
+         stage_metrics_path=args.stage_metrics_path)
 
 
 
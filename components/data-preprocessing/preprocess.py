@@ -2,13 +2,22 @@ import os
 import logging
 import pandas as pd
 from sklearn.preprocessing import LabelEncoder
-from nltk.stem.porter import PorterStemmer
-from nltk.corpus import stopwords
-import string
 import nltk
 from nltk.data import path as nltk_data_path
 import argparse
 from datetime import datetime
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import List, Optional
+import sys
+
+# Shared helpers live in components/common (copied next to this script inside the container image)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from artifact_io import find_dataset, read_dataset, write_dataset
+from step_cache import StepCache, module_files
+from instrumentation import StageRecorder
+from normalization_cache import NormalizationCache
+from text_normalizer import TextNormalizer, tokenizer_from_params
+import yaml
 
 # Explicitly tell nltk where to find the data
 # Explicitly add path (again for extra safety)
@@ -47,22 +56,39 @@ logger.info("="*60 + "\n")
 
 logger.debug(f"NLTK paths: {nltk.data.path}") 
 
+# Function to Load Parameters from params.yaml
+def load_params(param_path:str) ->dict:
+    try:
+        logger.debug("Loading Params From: %s",param_path)
+        with open(param_path,'r') as file:
+            params = yaml.safe_load(file)
+        logger.info("Params Loaded Successfully From: %s",param_path)
+        return params
+    except FileNotFoundError:
+        logger.debug('File not found: %s',param_path)
+        raise
+    except yaml.YAMLError as e:
+        logger.debug('Yaml error: %s',e)
+        raise
+    except Exception as e:
+        logger.debug('Unexpected error occured while loadind parameters: %s',e)
+        raise
+
 # Function for loading the Dataset
 def load_data(input_dir: str, train_data: bool) -> pd.DataFrame:
     """
-    Load train or test CSV from a Kubeflow-mounted directory path.
+    Load the train or test dataset (parquet, arrow or CSV) from a Kubeflow-mounted directory path.
 
     :param input_dir: Directory path (e.g., train_data.path or test_data.path)
-    :param train_data: Flag to determine whether to load 'train.csv' or 'test.csv'
+    :param train_data: Flag to determine whether to load the 'train' or 'test' dataset
     :return: Loaded DataFrame
     """
     try:
-        filename = "train.csv" if train_data else "test.csv"
-        file_path = os.path.join(input_dir, filename)
+        name = "train" if train_data else "test"
 
-        logger.debug("Attempting to load data from: %s", file_path)
-        df = pd.read_csv(file_path)
-        logger.info("Data successfully loaded from %s", file_path)
+        logger.debug("Attempting to load %s data from: %s", name, input_dir)
+        df = read_dataset(input_dir, name)
+        logger.info("Data successfully loaded from %s (%d rows)", input_dir, len(df))
         return df
 
     except pd.errors.ParserError as e:
@@ -75,35 +101,144 @@ def load_data(input_dir: str, train_data: bool) -> pd.DataFrame:
         logger.error("Unexpected error occurred while loading the data: %s", e)
         raise
 
+# Function to create a TextNormalizer (the class lives in components/common so serving can share it)
+def create_normalizer(stem_cache_size: int = 100_000, tokenizer: str = 'nltk') -> TextNormalizer:
+    """Create a TextNormalizer with the given tokenizer ('nltk' or 'alnum'), loading the NLTK stemmer and stopword list."""
+    try:
+        logger.debug("Initializing TextNormalizer (stem cache size: %d, tokenizer: %s)...", stem_cache_size, tokenizer)
+        normalizer = TextNormalizer(stem_cache_size=stem_cache_size, tokenizer=tokenizer)
+        logger.info("TextNormalizer initialized with %d stopwords and the %s tokenizer", normalizer.stop_word_count, tokenizer)
+        return normalizer
+    except LookupError as e:
+        logger.error("NLTK resource not available: %s", e)
+        raise
+    except Exception as e:
+        logger.error("Unexpected error occurred while initializing TextNormalizer: %s", e)
+        raise
+
+# Lazily created normalizer shared by transform_text calls
+_default_normalizer: Optional[TextNormalizer] = None
+
+def get_default_normalizer() -> TextNormalizer:
+    """Return the process-wide TextNormalizer, creating it on first use."""
+    global _default_normalizer
+    if _default_normalizer is None:
+        _default_normalizer = create_normalizer()
+    return _default_normalizer
+
 # Function to tranform the input text
 def transform_text(text: str) ->str:
     """
     Transforms the input text by converting it to lowercase, tokenizing, removing stopwords and punctuation, and stemming.
     """
     try:
-        # Creating Instance of PorterStemmer
-        ps = PorterStemmer()
-        # Convert to lowercase
-        text = text.lower()
-        # Tokenize the text
-        text = nltk.word_tokenize(text)
-        # Remove non-alphanumeric tokens
-        text = [word for word in text if word.isalnum()]
-        # Remove stopwords and punctuation
-        text = [word for word in text if word not in stopwords.words('english')]
-        text = [word for word in text if word not in string.punctuation]
-        # Stem the words
-        text = [ps.stem(word) for word in text]
-        # Join the tokens back into a single string
-        return " ".join(text)
+        return get_default_normalizer().normalize(text)
     except Exception as e:
         logger.error("Unexpected error occured while transforming text data: %s", e)
         raise
 
+# Normalizer owned by a pool worker process, created once by the pool initializer
+_worker_normalizer: Optional[TextNormalizer] = None
+
+def _init_normalizer_worker(stem_cache_size: int, tokenizer: str = 'nltk') -> None:
+    """Pool initializer: load NLTK resources and the stemmer once per worker process."""
+    global _worker_normalizer
+    _worker_normalizer = create_normalizer(stem_cache_size=stem_cache_size, tokenizer=tokenizer)
+
+def _normalize_chunk(texts: List[str]) -> List[str]:
+    """Normalize one chunk of messages inside a pool worker."""
+    return _worker_normalizer.normalize_batch(texts)
+
+# Function to create the process pool shared by train and test preprocessing
+def create_normalizer_pool(workers: int, stem_cache_size: int = 100_000, tokenizer: str = 'nltk') -> ProcessPoolExecutor:
+    """
+    Create a process pool whose workers each hold their own TextNormalizer.
+
+    :param workers: Number of worker processes
+    :param stem_cache_size: Size of the stem LRU cache in each worker
+    :param tokenizer: Tokenizer of the workers' normalizers ('nltk' or 'alnum')
+    :return: ProcessPoolExecutor to pass to preprocess_df
+    """
+    try:
+        if not isinstance(workers, int) or workers < 1:
+            raise ValueError("workers must be a positive integer.")
+        logger.debug("Starting text normalization pool with %d workers...", workers)
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_normalizer_worker, initargs=(stem_cache_size, tokenizer))
+        logger.info("Text normalization pool started with %d workers", workers)
+        return pool
+    except Exception as e:
+        logger.error("Failed to start text normalization pool: %s", e)
+        raise
+
+# Function to normalize texts in chunks across a process pool
+def normalize_parallel(texts: List[str], pool: Executor, workers: int, chunk_size: Optional[int] = None) -> List[str]:
+    """
+    Split texts into chunks, normalize them on the pool and reassemble them in the original order.
+
+    :param texts: Raw messages
+    :param pool: Executor created by create_normalizer_pool
+    :param workers: Number of workers in the pool, used to size chunks
+    :param chunk_size: Messages per chunk (defaults to about four chunks per worker)
+    :return: Normalized messages, aligned with texts
+    """
+    try:
+        if not texts:
+            return []
+        if chunk_size is None:
+            chunk_size = max(1, -(-len(texts) // (workers * 4)))
+        chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+        logger.debug("Normalizing %d messages in %d chunks of up to %d", len(texts), len(chunks), chunk_size)
+        # Executor.map yields results in submission order, so the row order is preserved
+        return [text for chunk in pool.map(_normalize_chunk, chunks) for text in chunk]
+    except Exception as e:
+        logger.error("Unexpected error occurred during parallel text normalization: %s", e)
+        raise
+
+# Function to open the persistent normalization cache configured in params.yaml
+def open_normalization_cache(params: Optional[dict]) -> Optional[NormalizationCache]:
+    """
+    Open the cache of 2_Data_Preprocessing.normalization_cache, or return None when it is disabled.
+
+    Cached text is tied to the normalizer code, the selected tokenizer and the NLTK version. The cache only saves time, so one that
+    cannot be opened (e.g. MinIO unreachable) is logged and every message is normalized instead.
+    """
+    section = ((params or {}).get('2_Data_Preprocessing', {}) or {}).get('normalization_cache')
+    try:
+        version = StepCache.key('normalization', module_files(TextNormalizer),
+                                {'nltk': nltk.__version__, 'tokenizer': tokenizer_from_params(params)}, [])
+        cache = NormalizationCache.from_params(section, version)
+        if cache is not None:
+            stats = cache.stats()
+            logger.info("Normalization cache %s opened: %d entries (%.1f MB)%s", cache.describe(), stats['entries'],
+                        stats['size_mb'], ", cleared for a new normalizer version" if stats['cleared'] else "")
+        return cache
+    except Exception as e:
+        logger.warning("Normalization cache unavailable, normalizing every message: %s", e)
+        return None
+
+# Function to evict, store and close the normalization cache, reporting its hit rate
+def close_normalization_cache(cache: NormalizationCache) -> None:
+    """Close the cache (eviction, then upload for the minio backend) and log its hit rate and size."""
+    try:
+        stats = cache.close()
+        logger.info("Normalization cache: %d hits, %d misses (hit rate %s), %d evicted, %d entries (%.1f MB) in %s",
+                    stats['hits'], stats['misses'], 'n/a' if stats['hit_rate'] is None else f"{stats['hit_rate']:.1%}",
+                    stats['evicted'], stats['entries'], stats['size_mb'], cache.describe())
+    except Exception as e:
+        logger.warning("Failed to store the normalization cache: %s", e)
+
 # Function for preprocessing the data
-def preprocess_df(df: pd.DataFrame, text_column='text', target_column='target') ->pd.DataFrame:
+def preprocess_df(df: pd.DataFrame, text_column='text', target_column='target', normalizer: Optional[TextNormalizer] = None,
+                  pool: Optional[Executor] = None, workers: int = 1, chunk_size: Optional[int] = None,
+                  cache: Optional[NormalizationCache] = None) ->pd.DataFrame:
     """
     Preprocesses the DataFrame by encoding the target column, removing duplicates, and transforming the text column.
+
+    :param normalizer: TextNormalizer to reuse across calls (defaults to the process-wide instance)
+    :param pool: Optional pool from create_normalizer_pool; when given, text is normalized across its workers
+    :param workers: Number of workers in pool
+    :param chunk_size: Messages per chunk sent to a worker
+    :param cache: Optional persistent cache; only messages missing from it are normalized
     """
     try:
         
@@ -120,8 +255,23 @@ def preprocess_df(df: pd.DataFrame, text_column='text', target_column='target')
         
         # Apply text transformation to the specified text column
         logger.debug("Starting input text data transformatoin....")
-        df[text_column] = df[text_column].apply(transform_text)
-        logger.info("Text Data Transformation Completed.")
+        if pool is not None:
+            normalize = lambda texts: normalize_parallel(texts, pool, workers, chunk_size)
+        else:
+            normalizer = normalizer or get_default_normalizer()
+            normalize = normalizer.normalize_batch
+        if cache is not None:
+            hits, misses = cache.hits, cache.misses
+            df[text_column] = cache.normalize_batch(df[text_column].tolist(), normalize)
+            hits, misses = cache.hits - hits, cache.misses - misses
+            logger.info("Normalization cache: %d of %d distinct messages found (hit rate %.1f%%)", hits, hits + misses,
+                        100.0 * hits / (hits + misses) if hits + misses else 0.0)
+        else:
+            df[text_column] = normalize(df[text_column].tolist())
+        if pool is not None:
+            logger.info("Text Data Transformation Completed using %d workers.", workers)
+        else:
+            logger.info("Text Data Transformation Completed. Stem cache: %s", normalizer.cache_info())
         return df
     
     except KeyError as e:
@@ -132,21 +282,14 @@ def preprocess_df(df: pd.DataFrame, text_column='text', target_column='target')
         raise
 
 # Function to save processed train and test dataset
-def save_data(train_data: pd.DataFrame, test_data: pd.DataFrame, train_output_path: str, test_output_path: str):
-    """Save the train and test datasets."""
+def save_data(train_data: pd.DataFrame, test_data: pd.DataFrame, train_output_path: str, test_output_path: str, fmt: str = 'csv'):
+    """Save the train and test datasets in the given artifact format ('parquet', 'arrow' or 'csv')."""
     try:
-        train_output_path = os.path.join(train_output_path, "train.csv")
-        test_output_path = os.path.join(test_output_path, "test.csv")
-
-        # Make sure parent directories exist
-        os.makedirs(os.path.dirname(train_output_path), exist_ok=True)
-        os.makedirs(os.path.dirname(test_output_path), exist_ok=True)
-        
-        logger.info("Saving train and test datasets...")
-        logger.info(f"Writing train.csv to: {train_output_path}")
-        train_data.to_csv(train_output_path, index=False)
-        logger.info(f"Writing test.csv to: {test_output_path}")
-        test_data.to_csv(test_output_path, index=False)
+        logger.info("Saving train and test datasets as %s...", fmt)
+        logger.info(f"Writing train data to: {train_output_path}")
+        train_output_path = write_dataset(train_data, train_output_path, "train", fmt)
+        logger.info(f"Writing test data to: {test_output_path}")
+        test_output_path = write_dataset(test_data, test_output_path, "test", fmt)
        
         logger.info('Training and test data saved to: "%s" & "%s" respectively.', train_output_path, test_output_path)
     except Exception as e:
@@ -155,25 +298,79 @@ def save_data(train_data: pd.DataFrame, test_data: pd.DataFrame, train_output_pa
 
 
 
-def main(train_data_path:str, test_data_path:str, train_output_path: str, test_output_path: str, text_column='text', target_column='target'):
+def main(train_data_path:str, test_data_path:str, train_output_path: str, test_output_path: str, text_column='text', target_column='target',
+         workers: int = 1, chunk_size: Optional[int] = None, param_file_path: Optional[str] = None,
+         stage_metrics_path: Optional[str] = None):
     """
     Main function to load raw data, preprocess it, and save the processed data.
+
+    :param workers: Number of processes used for text normalization (1 keeps everything in this process)
+    :param chunk_size: Messages per chunk sent to a worker when workers > 1
+    :param param_file_path: Optional params.yaml, used for the tokenizer, the step and normalization caches and instrumentation settings
+    :param stage_metrics_path: Optional output directory for stage_metrics.json
     """
+    pool = None
+    recorder = None
+    normalization_cache = None
     try:
+        # Skip the step when the input data, settings and code are unchanged since a cached run
+        params = load_params(param_file_path) if param_file_path else {}
+        recorder = StageRecorder.from_params('data_preprocessing', params)
+        cache = StepCache.from_params(params)
+        tokenizer = tokenizer_from_params(params)
+        outputs = {'train_processed': train_output_path, 'test_processed': test_output_path}
+        if cache is not None:
+            cache_key = StepCache.key('data_preprocessing', [os.path.abspath(__file__), *module_files(write_dataset, TextNormalizer)],
+                                      {'text_column': text_column, 'target_column': target_column, 'tokenizer': tokenizer},
+                                      [train_data_path, test_data_path])
+            with recorder.stage('cache_restore'):
+                restored = cache.restore(cache_key, outputs)
+            if restored:
+                logger.info("Step cache hit (%s): outputs restored from %s", cache_key[:16], cache.describe())
+                return
+            logger.info("Step cache miss (%s)", cache_key[:16])
+
         # Fetch the data from data/raw
-        train_data = load_data(train_data_path, train_data=True)
-        test_data = load_data(test_data_path, train_data=False)
+        with recorder.stage('load_data') as stage:
+            train_data = load_data(train_data_path, train_data=True)
+            test_data = load_data(test_data_path, train_data=False)
+            stage.rows = len(train_data) + len(test_data)
+        # Write outputs in the same artifact format the ingestion step produced
+        _, fmt = find_dataset(train_data_path, "train")
+
+        # Messages normalized by earlier runs are read back instead of being normalized again
+        with recorder.stage('normalization_cache_open'):
+            normalization_cache = open_normalization_cache(params)
+
+        # Share one normalizer (or one worker pool) between train and test data
+        if workers > 1:
+            pool = create_normalizer_pool(workers, tokenizer=tokenizer)
+            normalizer = None
+        else:
+            normalizer = create_normalizer(tokenizer=tokenizer)
 
         # Transform the data
         logger.debug("Starting DataFrame preprocessing for Training Data...")
-        train_processed_data = preprocess_df(train_data, text_column, target_column)
+        with recorder.stage('normalize_train', rows=len(train_data)):
+            train_processed_data = preprocess_df(train_data, text_column, target_column, normalizer=normalizer,
+                                                 pool=pool, workers=workers, chunk_size=chunk_size,
+                                                 cache=normalization_cache)
         logger.info(' Training Data Preprocessed Successfully')
         logger.debug("Starting DataFrame preprocessing for Test Data...")
-        test_processed_data = preprocess_df(test_data, text_column, target_column)
+        with recorder.stage('normalize_test', rows=len(test_data)):
+            test_processed_data = preprocess_df(test_data, text_column, target_column, normalizer=normalizer,
+                                                pool=pool, workers=workers, chunk_size=chunk_size,
+                                                cache=normalization_cache)
         logger.info(' Testing Data Preprocessed Successfully')
 
         # Save data 
-        save_data(train_data=train_processed_data,test_data=test_processed_data,train_output_path=train_output_path, test_output_path=test_output_path)
+        with recorder.stage('save_data', rows=len(train_processed_data) + len(test_processed_data)):
+            save_data(train_data=train_processed_data,test_data=test_processed_data,train_output_path=train_output_path, test_output_path=test_output_path, fmt=fmt)
+
+        if cache is not None:
+            with recorder.stage('cache_save'):
+                cache.save(cache_key, outputs, component='data_preprocessing')
+            logger.info("Step outputs stored in cache %s", cache.describe())
     except FileNotFoundError as e:
         logger.error('File not found: %s', e)
     except pd.errors.EmptyDataError as e:
@@ -181,14 +378,31 @@ def main(train_data_path:str, test_data_path:str, train_output_path: str, test_o
     except Exception as e:
         logger.error('Failed to complete the data transformation process: %s', e)
         print(f"Error: {e}")
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        if normalization_cache is not None:
+            with recorder.stage('normalization_cache_close'):
+                close_normalization_cache(normalization_cache)
+        # Stage timings are written even when the step failed or was restored from the cache
+        if recorder is not None:
+            logger.info("Stage metrics:\n%s", recorder.summary())
+            if stage_metrics_path:
+                recorder.write(stage_metrics_path)
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
-    parser.add_argument("train_data_path", type=str, help="Path to load train data CSV")
-    parser.add_argument("test_data_path", type=str, help="Path to load test data CSV")
-    parser.add_argument("train_output_path", type=str, help="Output file path for train.csv")
-    parser.add_argument("test_output_path", type=str, help="Output file path for test.csv")
+    parser.add_argument("train_data_path", type=str, help="Path to load train data")
+    parser.add_argument("test_data_path", type=str, help="Path to load test data")
+    parser.add_argument("train_output_path", type=str, help="Output directory for the processed train data")
+    parser.add_argument("test_output_path", type=str, help="Output directory for the processed test data")
     parser.add_argument("text_column", type=str, help="Name of Text Column to Preprocess")
     parser.add_argument("target_column", type=str, help="Name of Target Column to Preprocess")
+    parser.add_argument("--workers", type=int, default=1, help="Number of processes used for text normalization")
+    parser.add_argument("--chunk_size", type=int, default=None, help="Messages per chunk sent to a worker")
+    parser.add_argument("--param_file_path", type=str, default=None, help="Path of the Params.yaml (tokenizer, step cache, normalization cache and instrumentation settings)")
+    parser.add_argument("--stage_metrics_path", type=str, default=None, help="Output directory for stage_metrics.json")
     args = parser.parse_args()
-    main(train_data_path=args.train_data_path, test_data_path=args.test_data_path, train_output_path=args.train_output_path, test_output_path=args.test_output_path, text_column=args.text_column, target_column=args.target_column)
\ No newline at end of file
+    main(train_data_path=args.train_data_path, test_data_path=args.test_data_path, train_output_path=args.train_output_path, test_output_path=args.test_output_path, text_column=args.text_column, target_column=args.target_column,
+         workers=args.workers, chunk_size=args.chunk_size, param_file_path=args.param_file_path,
+         stage_metrics_path=args.stage_metrics_path)
\ No newline at end of file
@@ -2,13 +2,20 @@ import os
 import logging
 import pandas as pd
 import numpy as np
-from sklearn.metrics import accuracy_score,precision_score,recall_score,roc_auc_score
-import pickle
 import json 
-from sklearn.ensemble import RandomForestClassifier
+from sklearn.base import ClassifierMixin
+from typing import Optional
 from datetime import datetime
 import yaml
 import argparse
+import sys
+
+# Shared helpers live in components/common (copied next to this script inside the container image)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from feature_store import load_features
+import model_store
+from streaming_metrics import StreamingEvaluator
+from instrumentation import StageRecorder
 
 # Ensure that a directory named 'logs' exist in our root folder (if not it creates one)(for storing log file)
 log_dir = 'logs'
@@ -41,44 +48,57 @@ logger.info("\n" + " "*52 + "="*60)
 logger.info(f"NEW RUN STARTED AT {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
 logger.info("="*60 + "\n")
 
+# Function to Load Parameters from params.yaml
+def load_params(param_path:str) ->dict:
+    try:
+        logger.debug("Loading Params From: %s",param_path)
+        with open(param_path,'r') as file:
+            params = yaml.safe_load(file)
+        logger.info("Params Loaded Successfully From: %s",param_path)
+        return params
+    except FileNotFoundError:
+        logger.error('File not found: %s',param_path)
+        raise
+    except yaml.YAMLError as e:
+        logger.error('YAML error: %s',e)
+        raise
+    except Exception as e:
+        logger.debug('Unexpected error occured while loadind parameters: %s',e)
+        raise
+
 # Function for Loadind Trained Model
-def load_model(model_dir: str) -> RandomForestClassifier:
-    """Load a trained model from a directory (expects model.pkl inside)."""
+def load_model(model_dir: str) -> ClassifierMixin:
+    """Load a trained model from a directory (model.mstore, or model.pkl from older runs)."""
     try:
-        model_path = os.path.join(model_dir, "model.pkl")  # or whatever name you saved it as
-        logger.debug("Loading Model From: %s", model_path)
-        with open(model_path, 'rb') as file:
-            model = pickle.load(file)
+        logger.debug("Loading Model From: %s", model_dir)
+        # Memory-mapped and checksum-verified; array data is paged in as the model uses it
+        model = model_store.load_model(model_dir)
         logger.info("Model Loaded Successfully.")
         return model
     except FileNotFoundError:
-        logger.debug("File not found: %s", model_path)
+        logger.debug("Model not found in: %s", model_dir)
         raise
     except Exception as e:
         logger.debug("Unexpected error while loading the model: %s", e)
         raise
 
-# Function for loading the Dataset
-def load_data(input_dir: str, train_data: bool) -> pd.DataFrame:
+# Function for loading the sparse TF-IDF Dataset
+def load_data(input_dir: str, train_data: bool) -> tuple:
     """
-    Load train or test CSV from a Kubeflow-mounted directory path.
+    Memory-map the train or test feature set from a Kubeflow-mounted directory path.
 
     :param input_dir: Directory path (e.g., train_data.path or test_data.path)
-    :param train_data: Flag to determine whether to load 'train.csv' or 'test.csv'
-    :return: Loaded DataFrame
+    :param train_data: Flag to determine whether to load the 'train' or 'test' feature set
+    :return: (X, y) where X is a CSR matrix backed by the mapped files and y the label array
     """
     try:
-        filename = "train.csv" if train_data else "test.csv"
-        file_path = os.path.join(input_dir, filename)
+        name = "train" if train_data else "test"
 
-        logger.debug("Attempting to load data from: %s", file_path)
-        df = pd.read_csv(file_path)
-        logger.info("Data successfully loaded from %s", file_path)
-        return df
+        logger.debug("Attempting to load %s features from: %s", name, input_dir)
+        X, y = load_features(input_dir, name, mmap=True)
+        logger.info("Data successfully loaded from %s (%s, %s)", input_dir, X.shape, X.dtype)
+        return X, y
 
-    except pd.errors.ParserError as e:
-        logger.error("Failed to parse the CSV file: %s", e)
-        raise
     except FileNotFoundError as e:
         logger.error('File not found: %s', e)
         raise
@@ -87,27 +107,43 @@ def load_data(input_dir: str, train_data: bool) -> pd.DataFrame:
         raise
 
 
+# Function to get positive-class scores for the AUC from any classifier backend
+def positive_class_scores(clf: ClassifierMixin, X) -> np.ndarray:
+    """Return P(spam) from predict_proba, or the decision_function margin for models without probabilities."""
+    if hasattr(clf, 'predict_proba'):
+        return clf.predict_proba(X)[:, 1]
+    return clf.decision_function(X)
+
 # Function to Evaluate the Model
-def evaluate_model(clf:RandomForestClassifier,X_test:np.array,Y_test:np.array) ->dict:
-    """Evaluate the Model and Returns Evaluation Metrics"""
+def evaluate_model(clf:ClassifierMixin,X_test,Y_test:np.array, chunk_size: int = 10000, n_resamples: int = 1000,
+                   confidence_level: float = 0.95, n_bins: int = 1000, random_state: Optional[int] = None) ->dict:
+    """
+    Evaluate the model chunk by chunk and return its metrics with bootstrap confidence intervals.
+
+    Each chunk is scored once; the predicted label is derived from the same scores (P(spam) > 0.5, or a
+    positive margin), as the classifiers' own predict does.
+
+    :return: Flat dict with accuracy, precision, recall, f1_score and auc, a <metric>_ci_lower and
+             <metric>_ci_upper key for each, and n_samples / bootstrap_resamples / confidence_level
+    """
     try:
-        logger.debug("Predicting test data")
-        y_test_pred = clf.predict(X_test)
-        y_test_proba = clf.predict_proba(X_test)[:,1]
-        logger.info("Test Data Predicted Successfully")
-        
+        probabilities = hasattr(clf, 'predict_proba')
+        evaluator = StreamingEvaluator(n_bins=n_bins, n_resamples=n_resamples, random_state=random_state)
+        logger.debug("Predicting test data in chunks of %d rows (%d bootstrap resamples)", chunk_size, n_resamples)
+        for start in range(0, X_test.shape[0], chunk_size):
+            scores = positive_class_scores(clf, X_test[start:start + chunk_size])
+            y_pred = scores > (0.5 if probabilities else 0.0)
+            evaluator.update(Y_test[start:start + chunk_size], y_pred, scores, probabilities)
+        logger.info("Test Data Predicted Successfully (%d rows)", evaluator.n_samples)
+
         logger.debug("Calculating Evalutaion Metics")
-        accuracy = accuracy_score(Y_test,y_test_pred)
-        precision = precision_score(Y_test,y_test_pred)
-        recall = recall_score(Y_test,y_test_pred)
-        auc = roc_auc_score(Y_test,y_test_proba)
-
-        metrics_dict = {
-            'accuracy':accuracy,
-            'precision':precision,
-            'recall':recall,
-            'auc':auc
-        }
+        metrics_dict = evaluator.compute()
+        if n_resamples:
+            for name, (lower, upper) in evaluator.compute_intervals(confidence_level).items():
+                metrics_dict[f'{name}_ci_lower'] = lower
+                metrics_dict[f'{name}_ci_upper'] = upper
+        metrics_dict.update({'n_samples': evaluator.n_samples, 'bootstrap_resamples': n_resamples,
+                             'confidence_level': confidence_level})
         logger.info('Evaluation Metrics Calculated Successfully')
         return metrics_dict
     except Exception as e:
@@ -132,32 +168,54 @@ def save_metrics(metrics: dict, output_dir: str):
     except Exception as e:
         logger.error("Error while saving metrics: %s",e)
 
-def main(model_load_path:str, test_data_path:str, metrics_save_path:str):
+def main(model_load_path:str, test_data_path:str, metrics_save_path:str, param_file_path: Optional[str] = None,
+         stage_metrics_path: Optional[str] = None):
+    recorder = None
     try:
+        # Chunking and bootstrap settings (defaults apply when no params file is given)
+        all_params = load_params(param_file_path) if param_file_path else {}
+        params = all_params.get('6_Model_Evaluation', {}) or {}
+        recorder = StageRecorder.from_params('evaluate_model', all_params)
+
+        # Loading Trained Model; the test set is already vectorized, so an inference pipeline bundle
+        # is evaluated through its classifier
+        with recorder.stage('load_model'):
+            model = load_model(model_load_path)
+            clf = getattr(model, 'classifier', model)
         
-        # Loading Trained Model
-        clf = load_model(model_load_path)
-        
-        # Loading Test Data
-        test_data = load_data(test_data_path, train_data=False)
-
-        # Extract Input(independent) features and targer(dependent) feature from data
-        x_test = test_data.iloc[:,:-1]
-        y_test = test_data.iloc[:,-1]
+        # Loading Test Data (sparse input features and target labels)
+        with recorder.stage('load_data') as stage:
+            x_test, y_test = load_data(test_data_path, train_data=False)
+            stage.rows = x_test.shape[0]
 
         # Calculating Eavluation Metrics
-        metrics_dict = evaluate_model(clf,x_test,y_test)
+        with recorder.stage('evaluate', rows=x_test.shape[0]):
+            metrics_dict = evaluate_model(clf,x_test,y_test, chunk_size=params.get('chunk_size', 10000),
+                                          n_resamples=params.get('bootstrap_resamples', 1000),
+                                          confidence_level=params.get('confidence_level', 0.95),
+                                          n_bins=params.get('roc_bins', 1000), random_state=params.get('random_state'))
+        logger.info("Accuracy %.4f [%.4f, %.4f], AUC %.4f", metrics_dict['accuracy'], metrics_dict.get('accuracy_ci_lower', np.nan),
+                    metrics_dict.get('accuracy_ci_upper', np.nan), metrics_dict['auc'])
         
         # Saving evaluation metrics as json file
         save_metrics(metrics_dict,metrics_save_path)
     except Exception as e:
         logger.debug("Failed to complete the model evaluation: %s",e)
+    finally:
+        # Stage timings are written even when the step failed
+        if recorder is not None:
+            logger.info("Stage metrics:\n%s", recorder.summary())
+            if stage_metrics_path:
+                recorder.write(stage_metrics_path)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("model_load_path", type=str, help="Path to load trained Model")
-    parser.add_argument("test_data_path", type=str, help="Path to load test data CSV")
+    parser.add_argument("test_data_path", type=str, help="Path to load test data (feature store directory)")
     parser.add_argument("metrics_save_path", type=str, help="Path to save the metrics json")
+    parser.add_argument("--param_file_path", type=str, default=None, help="Path of the Params.yaml (6_Model_Evaluation section)")
+    parser.add_argument("--stage_metrics_path", type=str, default=None, help="Output directory for stage_metrics.json")
     args = parser.parse_args()
 
-    main(model_load_path=args.model_load_path, test_data_path=args.test_data_path, metrics_save_path=args.metrics_save_path)
+    main(model_load_path=args.model_load_path, test_data_path=args.test_data_path, metrics_save_path=args.metrics_save_path,
+         param_file_path=args.param_file_path, stage_metrics_path=args.stage_metrics_path)
@@ -5,6 +5,12 @@
  COPY params.yaml .
  # assume requirements.txt contains pandas==1.5.3 and scikit-learn==1.2.2
  RUN pip install --no-cache-dir -r requirements.txt
+ # Copy shared helpers
+ COPY components/common/artifact_io.py /app/artifact_io.py
+ COPY components/common/feature_store.py /app/feature_store.py
+ COPY components/common/document_frequency.py /app/document_frequency.py
+ COPY components/common/step_cache.py /app/step_cache.py
+ COPY components/common/instrumentation.py /app/instrumentation.py
  # Copy the training script
  COPY components/feature-engineering/feature_engineering.py /app/feature_engineering.py
  ENTRYPOINT ["python", "/app/feature_engineering.py"]
\ No newline at end of file
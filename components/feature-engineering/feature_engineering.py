@@ -1,10 +1,26 @@
 import pandas as pd
+import numpy as np
 import os
-from sklearn.feature_extraction.text import TfidfVectorizer
+import pickle
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from scipy import sparse
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer, TfidfVectorizer
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import Normalizer, normalize
 import logging
 import yaml
 from datetime import datetime
 import argparse
+import sys
+
+# Shared helpers live in components/common (copied next to this script inside the container image)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from artifact_io import read_dataset
+from document_frequency import DocumentFrequencyState
+from feature_store import save_features
+from step_cache import StepCache, module_files
+from instrumentation import StageRecorder
 
 # Ensure that a directory named 'logs' exist in our root folder (if not it creates one)(for storing log file)
 log_dir = 'logs'
@@ -59,19 +75,18 @@ def load_params(param_path:str) ->dict:
 # Function for loading the Dataset
 def load_data(input_dir: str, train_data: bool) -> pd.DataFrame:
     """
-    Load train or test CSV from a Kubeflow-mounted directory path.
+    Load the train or test dataset (parquet, arrow or CSV) from a Kubeflow-mounted directory path.
 
     :param input_dir: Directory path (e.g., train_data.path or test_data.path)
-    :param train_data: Flag to determine whether to load 'train.csv' or 'test.csv'
+    :param train_data: Flag to determine whether to load the 'train' or 'test' dataset
     :return: Loaded DataFrame
     """
     try:
-        filename = "train.csv" if train_data else "test.csv"
-        file_path = os.path.join(input_dir, filename)
+        name = "train" if train_data else "test"
 
-        logger.debug("Attempting to load data from: %s", file_path)
-        df = pd.read_csv(file_path)
-        logger.info("Data successfully loaded from %s", file_path)
+        logger.debug("Attempting to load %s data from: %s", name, input_dir)
+        df = read_dataset(input_dir, name, columns=['text', 'target'])
+        logger.info("Data successfully loaded from %s (%d rows)", input_dir, len(df))
         return df
 
     except pd.errors.ParserError as e:
@@ -88,8 +103,21 @@ def load_data(input_dir: str, train_data: bool) -> pd.DataFrame:
 # Function to apply TF-IDF transformation to the dataset
 # This function converts text data into numerical features using TF-IDF (Term Frequency-Inverse Document Frequency).
 # It assigns weights to words based on their importance and transforms the dataset into a numerical format.
-def apply_tfidf(train_data: pd.DataFrame, test_data: pd.DataFrame, max_features: int) -> tuple:
-    """Apply TF-IDF transformation to the dataset."""
+def apply_tfidf(train_data: pd.DataFrame, test_data: pd.DataFrame, max_features: int,
+                df_state: DocumentFrequencyState = None) -> tuple:
+    """
+    Apply TF-IDF transformation to the dataset.
+
+    With df_state, only the training documents the state has not counted yet are tokenized for the fit;
+    they are folded into the state (updated in place) and the vectorizer is rebuilt from its counts, which
+    gives the same vocabulary and IDF weights as fitting on all training documents. If the state counted
+    documents that are no longer in the training set, it is rebuilt from the training set.
+
+    :param df_state: Optional document-frequency state carried over from earlier runs
+
+    :return: ((X_train, y_train), (X_test, y_test), vectorizer) where X_* are sparse CSR matrices and
+             vectorizer is the fitted TfidfVectorizer
+    """
     try:
         logger.debug('Tranforming text Data using TDIDF...')
         # Validate that the input data contains the required 'text' and 'target' columns
@@ -120,76 +148,314 @@ def apply_tfidf(train_data: pd.DataFrame, test_data: pd.DataFrame, max_features:
         X_test = test_data['text'].values  # Testing text data
         y_test = test_data['target'].values  # Testing labels
 
-        # Fit the vectorizer on the training data and transform it into numerical format
-        X_train_tfidf = vectorizer.fit_transform(X_train)  # Learn vocabulary & transform training data
+        if df_state is not None:
+            # Fold the new training documents into the carried-over counts and rebuild the fitted vectorizer
+            new_rows = df_state.new_rows(X_train)
+            if new_rows is None:
+                logger.info("Training set no longer contains every document of the state; rebuilding it")
+                df_state.reset()
+                new_rows = np.arange(len(X_train))
+            logger.info("Document-frequency state: folding in %d new of %d training documents", len(new_rows), len(X_train))
+            df_state.update(X_train[new_rows])
+            vectorizer = df_state.vectorizer(max_features)
+            logger.info("Vectorizer rebuilt from %d documents (%d terms, %d kept)", df_state.n_documents,
+                        df_state.vocabulary_size, len(vectorizer.vocabulary_))
+            X_train_tfidf = vectorizer.transform(X_train)
+        else:
+            # Fit the vectorizer on the training data and transform it into numerical format
+            X_train_tfidf = vectorizer.fit_transform(X_train)  # Learn vocabulary & transform training data
         X_test_tfidf = vectorizer.transform(X_test)  # Transform test data using the same vocabulary
 
-        # Convert the transformed TF-IDF matrices into Pandas DataFrames
-        train_df = pd.DataFrame(X_train_tfidf.toarray())  # Convert sparse matrix to DataFrame
-        train_df['label'] = y_train  # Add the target labels to the DataFrame
-
-        test_df = pd.DataFrame(X_test_tfidf.toarray())  # Convert sparse matrix to DataFrame
-        test_df['label'] = y_test  # Add the target labels to the DataFrame
-
         # Log success message
-        logger.info('TF-IDF applied and data transformed successfully.')
+        logger.info('TF-IDF applied and data transformed successfully. Train matrix: %s with %d non-zeros',
+                    X_train_tfidf.shape, X_train_tfidf.nnz)
         
-        # Return the transformed training and testing datasets
-        return train_df, test_df
+        # Return the transformed training and testing datasets, kept sparse (CSR) together with their labels,
+        # and the fitted vectorizer so that inference can transform new text the same way
+        return (X_train_tfidf.tocsr(), y_train), (X_test_tfidf.tocsr(), y_test), vectorizer
 
     except Exception as e:
         # Log and raise any error encountered during processing
         logger.error('Error during TF-IDF transformation: %s', e)
         raise
 
-# Function to save Features Engineered train and test dataset
-def save_data(train_data: pd.DataFrame, test_data: pd.DataFrame, train_output_path: str, test_output_path: str):
-    """Save the train and test datasets."""
+# Function to hash one chunk of texts into raw term counts (runs in pool workers as well)
+def _hash_chunk(texts: list, n_features: int) -> sparse.csr_matrix:
+    """Hash texts into an (n_texts, n_features) CSR matrix of raw term counts."""
+    vectorizer = HashingVectorizer(n_features=n_features, alternate_sign=False, norm=None, dtype=np.float32)
+    return vectorizer.transform(texts)
+
+# Function to count the stored entries and bucket document frequencies of one chunk (runs in pool workers as well)
+def _count_chunk(texts: list, n_features: int) -> tuple:
+    """Return (non-zeros, per-bucket document frequency) of the hashed chunk; the matrix itself is dropped."""
+    chunk = _hash_chunk(texts, n_features)
+    # Every stored (row, bucket) entry is one document containing the bucket
+    return chunk.nnz, np.bincount(chunk.indices, minlength=n_features)
+
+# Function to hash texts chunk by chunk, optionally across a process pool
+def hash_texts(texts: np.ndarray, n_features: int, chunk_size: int, pool=None, fn=_hash_chunk, max_pending: int = 2):
+    """
+    Yield fn(chunk, n_features) for consecutive chunks of chunk_size texts, in input order.
+
+    The hashing is stateless, so chunks can be transformed independently and in parallel. Results are
+    produced lazily: with a pool at most max_pending chunks (two per worker is enough to keep them busy) are
+    in flight, so only those and the chunk being consumed are held in memory.
+    """
+    starts = range(0, len(texts), chunk_size)
+    if pool is None:
+        for start in starts:
+            yield fn(list(texts[start:start + chunk_size]), n_features)
+        return
+    pending = deque()
+    for start in starts:
+        pending.append(pool.submit(fn, list(texts[start:start + chunk_size]), n_features))
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+# Function to hash and reweight texts straight into one preallocated CSR matrix
+def stack_hashed(texts: np.ndarray, n_features: int, chunk_size: int, nnz: int, reweight, pool=None,
+                 max_pending: int = 2) -> sparse.csr_matrix:
+    """
+    Hash texts chunk by chunk, reweight each chunk and copy it into a CSR matrix allocated once for nnz
+    stored entries (counted by a first pass), releasing every chunk before the next one is hashed.
+
+    Reweighting scales the stored entries in place, so each chunk keeps the non-zeros it was counted with.
+    """
+    data = np.empty(nnz, dtype=np.float32)
+    index_dtype = np.int32 if nnz < 2**31 else np.int64
+    indices = np.empty(nnz, dtype=index_dtype)
+    indptr = np.zeros(len(texts) + 1, dtype=index_dtype)
+    row, offset = 0, 0
+    for chunk in hash_texts(texts, n_features, chunk_size, pool, max_pending=max_pending):
+        chunk = reweight(chunk)
+        rows, end = chunk.shape[0], offset + chunk.nnz
+        if end > nnz:
+            raise ValueError("Hashed chunks hold more entries than counted by the first pass.")
+        data[offset:end] = chunk.data
+        indices[offset:end] = chunk.indices
+        indptr[row + 1:row + rows + 1] = chunk.indptr[1:] + offset
+        row, offset = row + rows, end
+    if offset != nnz:
+        raise ValueError("Hashed chunks hold fewer entries than counted by the first pass.")
+    return sparse.csr_matrix((data, indices, indptr), shape=(len(texts), n_features))
+
+# Function to apply the hashing vectorizer (with optional IDF reweighting) to the dataset
+def apply_hashing(train_data: pd.DataFrame, test_data: pd.DataFrame, hashing_params: dict) -> tuple:
+    """
+    Apply hashing-trick featurization to the dataset.
+
+    Tokens are hashed into a fixed number of buckets, so there is no vocabulary to fit or to ship and each
+    chunk can be transformed independently. A first streaming pass counts the stored entries of every
+    split and, with use_idf, accumulates the training document frequencies; a second pass hashes the chunks
+    again, reweights them (IDF and L2 norm exactly as TfidfVectorizer with smooth_idf=True, or L2 norm only)
+    and copies them into matrices allocated once. Peak memory is the two output matrices plus the chunks in
+    flight, at the cost of hashing every text twice.
+
+    :param hashing_params: 'hashing' section of 3_Feature_Engineering (n_features, use_idf, chunk_size, n_jobs)
+    :return: ((X_train, y_train), (X_test, y_test), vectorizer) where X_* are sparse CSR matrices and vectorizer
+             is an equivalent single-pass transformer (HashingVectorizer followed by the IDF weights or L2 norm)
+    """
     try:
-        train_output_path = os.path.join(train_output_path, "train.csv")
-        test_output_path = os.path.join(test_output_path, "test.csv")
+        n_features = hashing_params.get('n_features', 2**20)
+        use_idf = hashing_params.get('use_idf', True)
+        chunk_size = hashing_params.get('chunk_size', 50000)
+        n_jobs = hashing_params.get('n_jobs', 1)
+        for name, value in (('n_features', n_features), ('chunk_size', chunk_size), ('n_jobs', n_jobs)):
+            if not isinstance(value, int) or value <= 0:
+                logger.error("Invalid %s: %s. It must be a positive integer.", name, value)
+                raise ValueError(f"{name} must be a positive integer.")
 
-        # Make sure parent directories exist
-        os.makedirs(os.path.dirname(train_output_path), exist_ok=True)
-        os.makedirs(os.path.dirname(test_output_path), exist_ok=True)
-        
+        for column in ('text', 'target'):
+            if column not in train_data.columns or column not in test_data.columns:
+                logger.error("Missing '%s' column in input data.", column)
+                raise KeyError(f"Column '{column}' not found in input data.")
+
+        logger.debug('Hashing text data into %d buckets (use_idf=%s, chunk_size=%d, n_jobs=%d)...',
+                     n_features, use_idf, chunk_size, n_jobs)
+        X_train_text = train_data['text'].fillna("").values
+        X_test_text = test_data['text'].fillna("").values
+
+        pool = ProcessPoolExecutor(max_workers=n_jobs) if n_jobs > 1 else None
+        max_pending = 2 * n_jobs
+        try:
+            # First pass: stored entries per split and training document frequencies, keeping no matrix
+            document_frequency = np.zeros(n_features, dtype=np.int64)
+            train_nnz = 0
+            for chunk_nnz, chunk_frequency in hash_texts(X_train_text, n_features, chunk_size, pool, _count_chunk, max_pending):
+                train_nnz += chunk_nnz
+                document_frequency += chunk_frequency
+            test_nnz = sum(chunk_nnz for chunk_nnz, _ in hash_texts(X_test_text, n_features, chunk_size, pool, _count_chunk, max_pending))
+
+            if use_idf:
+                n_documents = len(X_train_text)
+                transformer = TfidfTransformer(norm='l2', use_idf=True, smooth_idf=True)
+                transformer.idf_ = np.log((1 + n_documents) / (1 + document_frequency)) + 1
+                reweight = transformer.transform
+            else:
+                transformer = Normalizer(norm='l2')
+                reweight = lambda chunk: normalize(chunk, norm='l2')
+            del document_frequency
+            vectorizer = make_pipeline(HashingVectorizer(n_features=n_features, alternate_sign=False, norm=None, dtype=np.float32),
+                                       transformer)
+
+            # Second pass: hash again, reweight and copy every chunk into its place
+            X_train = stack_hashed(X_train_text, n_features, chunk_size, train_nnz, reweight, pool, max_pending)
+            X_test = stack_hashed(X_test_text, n_features, chunk_size, test_nnz, reweight, pool, max_pending)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        logger.info('Hashing features applied successfully. Train matrix: %s with %d non-zeros', X_train.shape, X_train.nnz)
+        return (X_train, train_data['target'].values), (X_test, test_data['target'].values), vectorizer
+
+    except Exception as e:
+        logger.error('Error during hashing transformation: %s', e)
+        raise
+
+# Function to save Features Engineered train and test dataset
+def save_data(train_data: tuple, test_data: tuple, train_output_path: str, test_output_path: str, dtype: str = 'float32'):
+    """
+    Save the sparse train and test datasets to the memory-mappable feature store.
+
+    :param train_data: (X_train, y_train) with X_train a sparse matrix
+    :param test_data: (X_test, y_test) with X_test a sparse matrix
+    :param dtype: dtype of the stored feature values (tree models work in float32 internally)
+    """
+    try:
         logger.info("Saving train and test datasets...")
-        train_data.to_csv(train_output_path, index=False)
-        test_data.to_csv(test_output_path, index=False)
+        train_output_path = save_features(*train_data, train_output_path, "train", dtype=dtype)
+        test_output_path = save_features(*test_data, test_output_path, "test", dtype=dtype)
        
         logger.info('Training and test data saved to: "%s" & "%s" respectively.', train_output_path, test_output_path)
     except Exception as e:
         logger.error('Unexpected error occurred while saving the data: %s', e)
         raise
 
-def main(param_file_path:str, train_data_path:str, test_data_path:str, train_output_path: str, test_output_path: str):
+# Function to save the fitted vectorizer for inference
+def save_vectorizer(vectorizer, output_dir: str) -> None:
+    """
+    Pickle the fitted vectorizer as vectorizer.pkl inside the Kubeflow output directory.
+
+    :param vectorizer: Fitted transformer mapping normalized text to the model's feature space
+    :param output_dir: Path to the Kubeflow artifact directory (vectorizer.path)
+    """
+    try:
+        os.makedirs(output_dir, exist_ok=True)
+        file_path = os.path.join(output_dir, "vectorizer.pkl")
+        logger.debug("Saving fitted vectorizer to: %s", file_path)
+        with open(file_path, 'wb') as file:
+            pickle.dump(vectorizer, file)
+        logger.info("Vectorizer saved to %s", file_path)
+    except Exception as e:
+        logger.error('Unexpected error occurred while saving the vectorizer: %s', e)
+        raise
+
+def main(param_file_path:str, train_data_path:str, test_data_path:str, train_output_path: str, test_output_path: str,
+         vectorizer_output_path: str = None, previous_df_state_path: str = None, df_state_output_path: str = None,
+         stage_metrics_path: str = None):
+    recorder = None
     try:
         # Loading Parameters From params.yaml
         params = load_params(param_file_path)
+        recorder = StageRecorder.from_params('feature_engineering', params)
+
+        feature_params = params['3_Feature_Engineering']
+        vectorizer_type = feature_params.get('vectorizer', 'tfidf')
+        max_features = feature_params['max_features']
+        feature_dtype = feature_params.get('feature_dtype', 'float32')
+        if vectorizer_type not in ('tfidf', 'hashing'):
+            raise ValueError(f"Unknown vectorizer '{vectorizer_type}'. Expected 'tfidf' or 'hashing'.")
+        # Incremental fitting only applies to the tfidf vocabulary (hashing has no fitted vocabulary)
+        incremental = vectorizer_type == 'tfidf' and bool(previous_df_state_path or df_state_output_path)
+        if previous_df_state_path and not incremental:
+            logger.warning("Document-frequency state ignored: the hashing vectorizer has no fitted vocabulary")
+        if df_state_output_path and not incremental:
+            # The pipeline always declares the state as an output, so leave an empty one behind
+            os.makedirs(df_state_output_path, exist_ok=True)
+        if previous_df_state_path and not DocumentFrequencyState.exists(previous_df_state_path):
+            logger.info("No document-frequency state in %s, counting every training document", previous_df_state_path)
+            previous_df_state_path = None
 
-        max_features = params['3_Feature_Engineering']['max_features']
+        # Skip the step when the input data, settings and code are unchanged since a cached run
+        cache = StepCache.from_params(params)
+        outputs = {'train_tfidf': train_output_path, 'test_tfidf': test_output_path}
+        if vectorizer_output_path:
+            outputs['vectorizer'] = vectorizer_output_path
+        if incremental and df_state_output_path:
+            outputs['df_state'] = df_state_output_path
+        if cache is not None:
+            cache_key = StepCache.key('feature_engineering',
+                                      [os.path.abspath(__file__), *module_files(read_dataset, save_features, DocumentFrequencyState)],
+                                      {'3_Feature_Engineering': params['3_Feature_Engineering'], 'incremental': incremental},
+                                      [train_data_path, test_data_path] + ([previous_df_state_path] if incremental and previous_df_state_path else []))
+            with recorder.stage('cache_restore'):
+                restored = cache.restore(cache_key, outputs)
+            if restored:
+                logger.info("Step cache hit (%s): outputs restored from %s", cache_key[:16], cache.describe())
+                return
+            logger.info("Step cache miss (%s)", cache_key[:16])
         
-        logger.debug("Attempting to load training data from: %s", './data/interim/train_processed.csv')
-        train_data = load_data(train_data_path, train_data=True)
-       
-        logger.debug("Attempting to load testing data from: %s", './data/interim/test_processed.csv')
-        test_data = load_data(test_data_path, train_data=False)
+        with recorder.stage('load_data') as stage:
+            logger.debug("Attempting to load training data from: %s", train_data_path)
+            train_data = load_data(train_data_path, train_data=True)
+           
+            logger.debug("Attempting to load testing data from: %s", test_data_path)
+            test_data = load_data(test_data_path, train_data=False)
+            stage.rows = len(train_data) + len(test_data)
         
+        # Document frequencies counted by earlier runs
+        df_state = None
+        if incremental:
+            with recorder.stage('load_df_state'):
+                df_state = DocumentFrequencyState.load(previous_df_state_path) if previous_df_state_path else DocumentFrequencyState()
+            logger.info("Document-frequency state: %d documents, %d terms", df_state.n_documents, df_state.vocabulary_size)
+
+        with recorder.stage(f'vectorize_{vectorizer_type}', rows=len(train_data) + len(test_data)):
+            if vectorizer_type == 'hashing':
+                train_features, test_features, vectorizer = apply_hashing(train_data, test_data, feature_params.get('hashing', {}) or {})
+            else:
+                train_features, test_features, vectorizer = apply_tfidf(train_data, test_data, max_features, df_state=df_state)
+
+        with recorder.stage('save_data', rows=train_features[0].shape[0] + test_features[0].shape[0]):
+            save_data(train_features, test_features, train_output_path=train_output_path, test_output_path=test_output_path,
+                      dtype=feature_dtype)
+            if vectorizer_output_path:
+                save_vectorizer(vectorizer, vectorizer_output_path)
 
-        train_df, test_df = apply_tfidf(train_data, test_data, max_features)
+        if df_state is not None and df_state_output_path:
+            with recorder.stage('save_df_state'):
+                df_state.save(df_state_output_path)
+            logger.info("Document-frequency state saved to %s", df_state_output_path)
 
-        save_data(train_df,test_df,train_output_path=train_output_path, test_output_path=test_output_path)
+        if cache is not None:
+            with recorder.stage('cache_save'):
+                cache.save(cache_key, outputs, component='feature_engineering')
+            logger.info("Step outputs stored in cache %s", cache.describe())
        
     except Exception as e:
         logger.error('Unexpected error occured while the feature engineering process: %s', e)
         print(f"Error: {e}")
+    finally:
+        # Stage timings are written even when the step failed or was restored from the cache
+        if recorder is not None:
+            logger.info("Stage metrics:\n%s", recorder.summary())
+            if stage_metrics_path:
+                recorder.write(stage_metrics_path)
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument("param_file_path", type=str, help="Path of the Params.yaml")
-    parser.add_argument("train_data_path", type=str, help="Path to load train data CSV")
-    parser.add_argument("test_data_path", type=str, help="Path to load test data CSV")
-    parser.add_argument("train_output_path", type=str, help="Output file path for train.csv")
-    parser.add_argument("test_output_path", type=str, help="Output file path for test.csv")
+    parser.add_argument("train_data_path", type=str, help="Path to load train data")
+    parser.add_argument("test_data_path", type=str, help="Path to load test data")
+    parser.add_argument("train_output_path", type=str, help="Output directory for the train feature set")
+    parser.add_argument("test_output_path", type=str, help="Output directory for the test feature set")
+    parser.add_argument("--vectorizer_output_path", type=str, default=None, help="Output directory for the fitted vectorizer (vectorizer.pkl)")
+    parser.add_argument("--previous_df_state_path", type=str, default=None, help="Directory of the document-frequency state of an earlier run (tfidf only)")
+    parser.add_argument("--df_state_output_path", type=str, default=None, help="Output directory for the updated document-frequency state (may equal --previous_df_state_path)")
+    parser.add_argument("--stage_metrics_path", type=str, default=None, help="Output directory for stage_metrics.json")
     args = parser.parse_args()
-    main(param_file_path=args.param_file_path, train_data_path=args.train_data_path, test_data_path=args.test_data_path, train_output_path=args.train_output_path, test_output_path=args.test_output_path)
+    main(param_file_path=args.param_file_path, train_data_path=args.train_data_path, test_data_path=args.test_data_path, train_output_path=args.train_output_path, test_output_path=args.test_output_path,
+         vectorizer_output_path=args.vectorizer_output_path, previous_df_state_path=args.previous_df_state_path,
+         df_state_output_path=args.df_state_output_path, stage_metrics_path=args.stage_metrics_path)
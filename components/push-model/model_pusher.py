@@ -1,15 +1,34 @@
 import os
+import time
 import logging
+import tempfile
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import pickle
-from sklearn.ensemble import RandomForestClassifier
+import numpy as np
+from scipy.stats import binomtest
+from sklearn.base import ClassifierMixin
 import dagshub
 import mlflow
 import argparse
 import json
 import yaml
+from mlflow.entities import Metric, Param
 from mlflow.tracking import MlflowClient
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Callable, List, Optional, Tuple
+import sys
+
+# Shared helpers live in components/common (copied next to this script inside the container image);
+# they are needed to load the model store and to unpickle a model saved as a raw-text inference pipeline
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+import model_store
+from artifact_io import read_dataset
+from artifact_upload import cleanup_stale_uploads, copy_directory, delete_directory, is_supported, upload_directory
+from step_cache import StepCache, digest_path
+from streaming_metrics import StreamingEvaluator
+from instrumentation import StageRecorder, timed
+from text_normalizer import tokenizer_from_params
 
 # Ensure that a directory named 'logs' exist in our root folder (if not it creates one)(for storing log file)
 log_dir = 'logs'
@@ -60,23 +79,48 @@ def load_params(param_path:str) ->dict:
         logger.debug('Unexpected error occured while loadind parameters: %s',e)
         raise
 
+# Function to turn nested params into the flat, searchable key/value pairs MLflow stores
+def flatten_params(params: Dict[str, Any], prefix: str = '') -> Dict[str, Any]:
+    """
+    Flatten nested params.yaml sections into dotted keys (e.g. '4_Model_Training.n_estimators').
+
+    Only scalar leaves (str, int, float, bool, None) are kept: a stringified section or list could exceed
+    MLflow's param value limit and fail the push, and could not be searched anyway.
+    """
+    flat = {}
+    for key, value in (params or {}).items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten_params(value, prefix=f"{name}."))
+        elif value is None or isinstance(value, (str, int, float, bool)):
+            flat[name] = value
+    return flat
+
 # Function for Loadind Trained Model
-def load_model(model_dir: str) -> RandomForestClassifier:
-    """Load a trained model from a directory (expects model.pkl inside)."""
+def load_model(model_dir: str) -> ClassifierMixin:
+    """Load a trained model from a directory (model.mstore, or model.pkl from older runs)."""
     try:
-        model_path = os.path.join(model_dir, "model.pkl")  # or whatever name you saved it as
-        logger.debug("Loading Model From: %s", model_path)
-        with open(model_path, 'rb') as file:
-            model = pickle.load(file)
+        logger.debug("Loading Model From: %s", model_dir)
+        # Memory-mapped and checksum-verified; array data is paged in as the model uses it
+        model = model_store.load_model(model_dir)
         logger.info("Model Loaded Successfully.")
         return model
     except FileNotFoundError:
-        logger.debug("File not found: %s", model_path)
+        logger.debug("Model not found in: %s", model_dir)
         raise
     except Exception as e:
         logger.debug("Unexpected error while loading the model: %s", e)
         raise
 
+# Function to list the source files MLflow must ship with an inference pipeline bundle
+def model_code_paths(model) -> Optional[List[str]]:
+    """Return the modules a SpamInferencePipeline needs to be unpickled elsewhere, or None for a bare classifier."""
+    if not hasattr(model, 'classifier'):
+        return None
+    import inference_pipeline
+    import text_normalizer
+    return [inference_pipeline.__file__, text_normalizer.__file__, model_store.__file__]
+
 # Function to Load the Evaluation Metrics as Json File
 def load_metrics(path: str) -> Dict[str, Any]:
     """Loads the Evaluation Metrics from a JSON file in a given output directory path from Kubeflow."""
@@ -144,32 +188,180 @@ def setup_dagshub_auth(dagshub_username: str, dagshub_token: str):
         logger.error("Failed to setup DagsHub authentication: %s", e)
         return False
 
+class RegistryClient:
+    """
+    One MlflowClient shared by the whole push, with a short-TTL cache of registry reads and call counts.
+
+    Reusing a single client keeps its tracking store and pooled HTTP connections for every call instead
+    of rebuilding them per helper. Registry reads (latest versions per stage, runs) are cached for
+    ttl_seconds and every registry write invalidates the cache, so repeated lookups within a push cost
+    one round trip. `calls` counts the remote calls made through this object, per method (fluent
+    MLflow calls such as log_model are recorded with `count`).
+    """
+
+    # MLflow's log_batch limits per request
+    MAX_PARAMS_PER_BATCH = 100
+    MAX_METRICS_PER_BATCH = 1000
+
+    def __init__(self, client: Optional[MlflowClient] = None, ttl_seconds: float = 30.0):
+        self.client = client or MlflowClient()
+        self.ttl_seconds = ttl_seconds
+        self.calls = Counter()
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def count(self, method: str) -> None:
+        with self._lock:
+            self.calls[method] += 1
+
+    @property
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+    def _call(self, method: str, fn: Callable, *args, **kwargs):
+        self.count(method)
+        return fn(*args, **kwargs)
+
+    def _cached(self, key: tuple, method: str, fn: Callable, *args, **kwargs):
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                return entry[1]
+        value = self._call(method, fn, *args, **kwargs)
+        with self._lock:
+            self._cache[key] = (time.monotonic() + self.ttl_seconds, value)
+        return value
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def get_latest_versions(self, model_name: str, stages: List[str]) -> list:
+        return self._cached(('latest_versions', model_name, tuple(stages)), 'get_latest_versions',
+                            self.client.get_latest_versions, model_name, stages=list(stages))
+
+    def get_run(self, run_id: str):
+        return self._cached(('run', run_id), 'get_run', self.client.get_run, run_id)
+
+    def register_model(self, model_uri: str, model_name: str):
+        self.invalidate()
+        return self._call('register_model', mlflow.register_model, model_uri=model_uri, name=model_name)
+
+    def transition_model_version_stage(self, model_name: str, version: str, stage: str,
+                                       archive_existing_versions: bool = False):
+        self.invalidate()
+        return self._call('transition_model_version_stage', self.client.transition_model_version_stage,
+                          name=model_name, version=version, stage=stage,
+                          archive_existing_versions=archive_existing_versions)
+
+    def log_batch(self, run_id: str, params: Optional[Dict[str, Any]] = None,
+                  metrics: Optional[Dict[str, float]] = None) -> None:
+        """Log params and metrics in as few log_batch requests as MLflow's per-request limits allow."""
+        timestamp = int(time.time() * 1000)
+        params = [Param(key, str(value)) for key, value in (params or {}).items()]
+        metrics = [Metric(key, float(value), timestamp, 0) for key, value in (metrics or {}).items()]
+        while params or metrics:
+            batch_params, params = params[:self.MAX_PARAMS_PER_BATCH], params[self.MAX_PARAMS_PER_BATCH:]
+            batch_metrics, metrics = metrics[:self.MAX_METRICS_PER_BATCH], metrics[self.MAX_METRICS_PER_BATCH:]
+            self._call('log_batch', self.client.log_batch, run_id, metrics=batch_metrics, params=batch_params)
+
+# Function to find where model uploads are staged so an interrupted push can resume them
+def upload_staging_root(artifact_uri: str, run_id: str, upload_params: Optional[dict] = None) -> str:
+    """
+    Return the directory model uploads are staged under, the same for every push to the experiment.
+
+    Every push starts a new MLflow run, so the run's artifact directory cannot hold a resumable upload.
+    The staging root is mlflow.upload.staging_uri or, by default, model-staging/ next to the experiment's
+    run directories (the run's artifact URI is <experiment location>/<run_id>/artifacts).
+    """
+    staging_root = (upload_params or {}).get('staging_uri')
+    if not staging_root:
+        experiment_location, separator, _ = artifact_uri.rstrip('/').rpartition(f'/{run_id}/')
+        if not separator:
+            raise ValueError(f"Cannot derive a staging location from the artifact URI {artifact_uri}; set mlflow.upload.staging_uri.")
+        staging_root = experiment_location + '/model-staging'
+    return staging_root.rstrip('/')
+
+# Function to save the model in MLflow's format and upload it into the run's artifacts
+@timed('upload_model')
+def upload_model(model, run_id: str, artifact_uri: str, registry: RegistryClient,
+                 upload_params: Optional[dict] = None, model_digest: Optional[str] = None) -> Dict[str, dict]:
+    """
+    Equivalent of mlflow.sklearn.log_model(model, "model") that uploads large files in concurrent,
+    resumable parts (artifact_upload) when the run's artifact store is S3/MinIO or a local directory;
+    other artifact stores (e.g. DagsHub's mlflow-artifacts proxy) go through MLflow's own uploader.
+
+    With model_digest (the content digest of the model artifact) the files are first uploaded to
+    <staging root>/<model_digest>/model (see upload_staging_root), which a restarted push of the same model finds again and resumes, then copied
+    into the run (server side on S3) and the staging copy is deleted. Unfinished staged uploads older
+    than mlflow.upload.stale_upload_hours are aborted first.
+
+    :return: Upload results per file ({} when MLflow's uploader was used)
+    """
+    upload_params = upload_params or {}
+    with tempfile.TemporaryDirectory() as tmp:
+        local_dir = os.path.join(tmp, 'model')
+        mlflow.sklearn.save_model(model, local_dir, code_paths=model_code_paths(model))
+        destination = artifact_uri.rstrip('/') + '/model'
+        if not is_supported(destination):
+            registry._call('log_artifacts', registry.client.log_artifacts, run_id, local_dir, 'model')
+            return {}
+        staging = None
+        if model_digest:
+            staging_root = upload_staging_root(artifact_uri, run_id, upload_params)
+            staging = f"{staging_root}/{model_digest}/model"
+            removed = cleanup_stale_uploads(staging_root, upload_params.get('stale_upload_hours', 24) * 3600)
+            if removed:
+                logger.info("Aborted %d stale unfinished model uploads under %s", removed, staging_root)
+        # Upload requests go to the artifact store, not the registry, so they are counted separately
+        requests = Counter()
+        results = upload_directory(local_dir, staging or destination,
+                                   part_size=int(upload_params.get('part_size_mb', 8) * 2**20),
+                                   max_workers=upload_params.get('max_workers', 8),
+                                   max_retries=upload_params.get('max_retries', 3),
+                                   retry_delay=upload_params.get('retry_delay_seconds', 0.5),
+                                   on_request=lambda operation: requests.update([operation]))
+        logger.info("Artifact store upload requests: %s", ", ".join(f"{name}={count}" for name, count in sorted(requests.items())))
+        if staging is not None:
+            copy_directory(staging, destination)
+            delete_directory(staging.rpartition('/')[0])
+            logger.info("Model copied from staging %s into the run's artifacts", staging)
+        return results
+
+# Function to get the registry version currently in production
+def get_production_model_version(model_name: str, registry: RegistryClient):
+    """Return the MLflow ModelVersion in the Production stage, or None if there is none."""
+    try:
+        latest_versions = registry.get_latest_versions(model_name, ["Production"])
+        return latest_versions[0] if latest_versions else None
+    except Exception as e:
+        logger.error("Failed to look up the production model version: %s", e)
+        return None
+
 # Function to get production model metrics from MLflow registry
-def get_production_model_metrics(model_name: str) -> Optional[Dict[str, Any]]:
+def get_production_model_metrics(model_name: str, registry: RegistryClient) -> Optional[Dict[str, Any]]:
     """
     Retrieve metrics from the current production model in MLflow registry.
     
     Args:
         model_name: Name of the model in MLflow registry
+        registry: Shared registry client (the version lookup is served from its cache afterwards)
         
     Returns:
         Dictionary containing production model metrics or None if no production model exists
     """
     try:
-        client = MlflowClient()
-        
         # Get the latest production model version
-        latest_versions = client.get_latest_versions(model_name, stages=["Production"])
+        production_version = get_production_model_version(model_name, registry)
         
-        if not latest_versions:
+        if production_version is None:
             logger.info("No production model found for %s", model_name)
             return None
             
-        production_version = latest_versions[0]
         logger.info("Found production model version: %s", production_version.version)
         
         # Get run details for the production model
-        run = client.get_run(production_version.run_id)
+        run = registry.get_run(production_version.run_id)
         
         # Extract metrics from the run
         metrics = run.data.metrics
@@ -181,6 +373,164 @@ def get_production_model_metrics(model_name: str) -> Optional[Dict[str, Any]]:
         logger.error("Failed to get production model metrics: %s", e)
         return None
 
+# Function to load the preprocessed test set both models are scored on
+def load_test_data(test_data_path: str) -> Tuple[List[str], np.ndarray]:
+    """Load the normalized test messages and encoded labels written by preprocessing."""
+    try:
+        df = read_dataset(test_data_path, "test", columns=['text', 'target'])
+        logger.info("Comparison test set loaded from %s (%d messages)", test_data_path, len(df))
+        return df['text'].fillna("").astype(str).tolist(), df['target'].to_numpy(dtype=np.int64)
+    except Exception as e:
+        logger.error("Error while loading the comparison test set: %s", e)
+        raise
+
+# Function to score a raw-text model on the normalized test messages
+def score_model(model, texts: List[str], chunk_size: int = 10000) -> Tuple[np.ndarray, np.ndarray, bool]:
+    """
+    Score an inference pipeline bundle with its own vectorizer and classifier.
+
+    The messages are already normalized by preprocessing, so only the model's vectorizer and classifier
+    run; each model therefore sees the test set through the feature space it was trained on.
+
+    :return: (predicted labels, positive-class scores, whether the scores are probabilities)
+    """
+    if not hasattr(model, 'vectorizer'):
+        raise ValueError(f"{type(model).__name__} is a bare classifier; paired comparison needs an inference pipeline bundle.")
+    classifier = model.classifier
+    probabilities = hasattr(classifier, 'predict_proba')
+    scores = []
+    for start in range(0, len(texts), chunk_size):
+        X = model.vectorizer.transform(texts[start:start + chunk_size])
+        scores.append(classifier.predict_proba(X)[:, 1] if probabilities else classifier.decision_function(X))
+    scores = np.concatenate(scores) if scores else np.empty(0)
+    return scores > (0.5 if probabilities else 0.0), scores, probabilities
+
+# Function to check that a bundle can be scored on the test messages preprocessing normalized
+def check_tokenizer(model, tokenizer: str, name: str):
+    """
+    Return the model if its normalizer uses `tokenizer` (the one that normalized the test set), otherwise
+    raise ValueError: a bundle trained with the other 2_Data_Preprocessing.tokenizer would be fed tokens
+    it never saw, biasing the comparison.
+    """
+    model_tokenizer = getattr(getattr(model, 'normalizer', None), 'tokenizer', 'nltk')
+    if model_tokenizer != tokenizer:
+        raise ValueError(f"{name} was trained with the '{model_tokenizer}' tokenizer but the test set was "
+                         f"normalized with '{tokenizer}'.")
+    return model
+
+# Function to get a model's test predictions from the prediction cache, scoring it on a miss
+def cached_predictions(cache: Optional[StepCache], name: str, identity: dict, inputs: List[str],
+                       load_fn: Callable, texts: List[str], chunk_size: int) -> Tuple[np.ndarray, np.ndarray, bool]:
+    """
+    Return (predicted labels, scores, probabilities) for a model, reusing cached predictions.
+
+    :param identity: Settings identifying the model (e.g. its registry name and version)
+    :param inputs: Artifacts the predictions depend on (the test set, and the model directory when the
+                   model has no registry version yet)
+    :param load_fn: Loads the model; only called on a cache miss
+    """
+    key = StepCache.key('model_predictions', [os.path.abspath(__file__)], identity, inputs) if cache is not None else None
+    with tempfile.TemporaryDirectory() as tmp:
+        outputs = {'predictions': tmp}
+        try:
+            if cache is not None and cache.restore(key, outputs):
+                cached = np.load(os.path.join(tmp, 'predictions.npz'))
+                logger.info("Prediction cache hit for %s (%s)", name, key[:16])
+                return cached['y_pred'], cached['scores'], bool(cached['probabilities'])
+        except Exception as e:
+            # An unreachable cache only costs the scoring time
+            logger.warning("Prediction cache lookup failed for %s: %s", name, e)
+
+        y_pred, scores, probabilities = score_model(load_fn(), texts, chunk_size)
+        logger.info("Scored %s on %d test messages", name, len(texts))
+        if cache is not None:
+            try:
+                np.savez(os.path.join(tmp, 'predictions.npz'), y_pred=y_pred, scores=scores, probabilities=probabilities)
+                cache.save(key, outputs, component='model_predictions')
+            except Exception as e:
+                logger.warning("Could not store the predictions of %s in the cache: %s", name, e)
+        return y_pred, scores, probabilities
+
+# Function to compare champion and challenger on the same test messages
+def compare_paired(y_true: np.ndarray, champion: tuple, challenger: tuple, n_resamples: int = 2000,
+                   random_state: Optional[int] = None, chunk_size: int = 10000) -> Dict[str, Any]:
+    """
+    Compute both models' metrics on identical data plus paired significance tests.
+
+    McNemar's exact test uses only the messages the two models classify differently: under "equally
+    accurate" the challenger-only correct ones follow Binomial(discordant, 0.5). The paired bootstrap
+    evaluates both models on the same Poisson resamples: the weights of every block of rows are drawn
+    once and given to both evaluators, so each resample gives a challenger - champion difference for
+    every metric.
+
+    :param champion: (predicted labels, scores, probabilities) of the production model
+    :param challenger: (predicted labels, scores, probabilities) of the new model
+    :return: Flat dict with champion_<metric>, challenger_<metric>, <metric>_bootstrap_p (share of
+             resamples where the challenger is not better), discordant counts and mcnemar_p
+    """
+    evaluators = [StreamingEvaluator(n_resamples=n_resamples, random_state=random_state) for _ in range(2)]
+    # Bound the [rows, n_resamples] weight matrix held at once
+    step = min(chunk_size, max(1, evaluators[0].max_weights // n_resamples)) if n_resamples else chunk_size
+    for start in range(0, len(y_true), step):
+        stop = min(start + step, len(y_true))
+        weights = evaluators[0].draw_weights(stop - start) if n_resamples else None
+        for evaluator, (y_pred, scores, probabilities) in zip(evaluators, (champion, challenger)):
+            evaluator.update(y_true[start:stop], y_pred[start:stop], scores[start:stop], probabilities, weights=weights)
+
+    results = {'n_samples': len(y_true)}
+    champion_metrics, challenger_metrics = (evaluator.compute() for evaluator in evaluators)
+    champion_resampled, challenger_resampled = (evaluator.resampled_metrics() for evaluator in evaluators)
+    for name in champion_metrics:
+        results[f'champion_{name}'] = champion_metrics[name]
+        results[f'challenger_{name}'] = challenger_metrics[name]
+        difference = challenger_resampled[name] - champion_resampled[name]
+        results[f'{name}_bootstrap_p'] = float(np.mean(~(difference > 0))) if n_resamples else 1.0
+
+    champion_correct = champion[0] == y_true
+    challenger_correct = challenger[0] == y_true
+    champion_only = int(np.count_nonzero(champion_correct & ~challenger_correct))
+    challenger_only = int(np.count_nonzero(challenger_correct & ~champion_correct))
+    results['champion_only_correct'] = champion_only
+    results['challenger_only_correct'] = challenger_only
+    discordant = champion_only + challenger_only
+    results['mcnemar_p'] = float(binomtest(challenger_only, discordant, 0.5, alternative='greater').pvalue) if discordant else 1.0
+    return results
+
+# Function to decide promotion from a paired comparison
+def should_promote_paired(comparison: Dict[str, Any], threshold: float, metric_name: str = 'accuracy',
+                          paired_test: str = 'mcnemar', significance_level: float = 0.05) -> bool:
+    """
+    Promote when the challenger beats the champion by `threshold` (relative) on the same test messages
+    and the improvement is significant: McNemar's p-value (accuracy) or the paired bootstrap p-value of
+    `metric_name` must be below `significance_level`.
+    """
+    champion_score = comparison[f'champion_{metric_name}']
+    challenger_score = comparison[f'challenger_{metric_name}']
+    improvement = challenger_score - champion_score
+    improvement_percentage = (improvement / champion_score) * 100 if champion_score else float('inf')
+    if paired_test == 'mcnemar':
+        if metric_name != 'accuracy':
+            logger.warning("McNemar's test compares error rates (accuracy), not %s", metric_name)
+        p_value = comparison['mcnemar_p']
+    elif paired_test == 'bootstrap':
+        p_value = comparison[f'{metric_name}_bootstrap_p']
+    else:
+        raise ValueError(f"Unknown paired_test '{paired_test}'. Expected 'mcnemar' or 'bootstrap'.")
+
+    logger.info("Paired comparison on %d test messages:", comparison['n_samples'])
+    logger.info("  Production model %s: %.4f", metric_name, champion_score)
+    logger.info("  New model %s: %.4f", metric_name, challenger_score)
+    logger.info("  Improvement: %.4f (%.2f%%), required %.2f%%", improvement, improvement_percentage, threshold * 100)
+    logger.info("  Discordant messages: new model only correct %d, production only correct %d",
+                comparison['challenger_only_correct'], comparison['champion_only_correct'])
+    logger.info("  %s p-value: %.4g (significance level %.3g)", paired_test, p_value, significance_level)
+
+    if improvement_percentage >= threshold * 100 and p_value < significance_level:
+        logger.info("New model is significantly better. Promoting to production.")
+        return True
+    logger.info("New model is not significantly better by the threshold. Keeping current production model.")
+    return False
+
 # Function to compare models and determine if new model should be promoted
 def should_promote_model(new_metrics: Dict[str, Any], production_metrics: Optional[Dict[str, Any]], 
                         threshold: float, metric_name: str = 'accuracy') -> bool:
@@ -236,54 +586,74 @@ def should_promote_model(new_metrics: Dict[str, Any], production_metrics: Option
         logger.error("Error during model comparison: %s", e)
         return False
 
-# Function to retire old production model
-def retire_production_model(model_name: str):
+# Function to run the paired champion/challenger comparison
+def paired_comparison(params: dict, model_name: str, production_version: str, model, model_path: str,
+                      test_data_path: str, registry: RegistryClient) -> Dict[str, Any]:
     """
-    Retire the current production model by archiving it.
-    
-    Args:
-        model_name: Name of the model in MLflow registry
+    Score the production model (registry version `production_version`) and the new model on the test
+    messages in parallel, reusing cached predictions, and return compare_paired's results.
+
+    The test messages are already normalized, so a production model trained with another tokenizer
+    cannot be compared on them; check_tokenizer raises and the caller compares the logged metrics.
     """
-    try:
-        client = MlflowClient()
-        
-        # Get current production versions
-        production_versions = client.get_latest_versions(model_name, stages=["Production"])
-        
-        for version in production_versions:
-            logger.info("Retiring production model version: %s", version.version)
-            client.transition_model_version_stage(
-                name=model_name,
-                version=version.version,
-                stage="Archived"
-            )
-            
-        logger.info("Successfully retired production model")
-        
-    except Exception as e:
-        logger.error("Failed to retire production model: %s", e)
-        raise
+    comparison_params = params.get('model_comparison', {}) or {}
+    # The prediction cache has the step_cache layout; predictions are keyed by model version and test data
+    cache = StepCache.from_params({'step_cache': comparison_params.get('prediction_cache')})
+    chunk_size = comparison_params.get('chunk_size', 10000)
+    texts, y_true = load_test_data(test_data_path)
+    # Both bundles must normalize text like the preprocessing run that produced the test set
+    tokenizer = tokenizer_from_params(params)
+    check_tokenizer(model, tokenizer, "The new model")
+
+    champion_uri = f"models:/{model_name}/{production_version}"
+
+    def load_champion():
+        registry.count('load_model')
+        return check_tokenizer(mlflow.sklearn.load_model(champion_uri), tokenizer, f"The production model {champion_uri}")
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        champion = pool.submit(cached_predictions, cache, f"production model {champion_uri}",
+                               {'registered_model': model_name, 'version': str(production_version)}, [test_data_path],
+                               load_champion, texts, chunk_size)
+        challenger = pool.submit(cached_predictions, cache, "new model", {'registered_model': None},
+                                 [test_data_path, model_path], lambda: model, texts, chunk_size)
+        champion, challenger = champion.result(), challenger.result()
+
+    return compare_paired(y_true, champion, challenger, n_resamples=comparison_params.get('bootstrap_resamples', 2000),
+                          random_state=comparison_params.get('random_state'), chunk_size=chunk_size)
 
 def main(repo_owner_name: str, repo_name: str, model_name: str, stage: str, 
          param_path: str, model_path: str, metrics_path: str,
-         dagshub_username: str, dagshub_token: str):
+         dagshub_username: str, dagshub_token: str, test_data_path: Optional[str] = None,
+         tracking_uri: Optional[str] = None, stage_metrics_path: Optional[str] = None):
+    recorder = None
     try:
-        # Setup DagsHub authentication using provided credentials
-        if not setup_dagshub_auth(dagshub_username, dagshub_token):
-            logger.error("Failed to setup DagsHub authentication. Exiting.")
-            return
-        
         # Loading Parameters From params.yaml
         params = load_params(param_path)
+        recorder = StageRecorder.from_params('push_model', params)
+        mlflow_params = params.get('mlflow', {}) or {}
+        tracking_uri = tracking_uri or mlflow_params.get('tracking_uri')
+
+        # A local tracking URI (e.g. file:./mlruns) stands in for DagsHub, e.g. to test the push offline
+        if not tracking_uri and not setup_dagshub_auth(dagshub_username, dagshub_token):
+            logger.error("Failed to setup DagsHub authentication. Exiting.")
+            return
         
         # Loading Trained Model
-        model = load_model(model_path)
+        with recorder.stage('load_model'):
+            model = load_model(model_path)
         
         # Loading Evaluation Metrics
         metrics = load_metrics(metrics_path)
         
         # Initialize DagsHub MLflow tracking
-        dagshub.init(repo_owner=repo_owner_name, repo_name=repo_name, mlflow=True)
+        if tracking_uri:
+            mlflow.set_tracking_uri(tracking_uri)
+            logger.info("Using MLflow tracking URI %s", tracking_uri)
+        else:
+            dagshub.init(repo_owner=repo_owner_name, repo_name=repo_name, mlflow=True)
+        registry = RegistryClient(ttl_seconds=mlflow_params.get('registry_cache_ttl_seconds', 30))
+        push_start = time.perf_counter()
         
         # Get model comparison parameters from params
         comparison_threshold = params.get('model_comparison', {}).get('improvement_threshold', 0.05)  # 5% default
@@ -293,63 +663,79 @@ def main(repo_owner_name: str, repo_name: str, model_name: str, stage: str,
         logger.info("  Improvement threshold: %.2f%%", comparison_threshold * 100)
         logger.info("  Primary metric: %s", primary_metric)
         
-        # Get current production model metrics
-        production_metrics = get_production_model_metrics(model_name)
-        
-        # Determine if new model should be promoted to production
-        should_promote = should_promote_model(metrics, production_metrics, comparison_threshold, primary_metric)
-        
-        # Log model to MLflow
-        with mlflow.start_run():
-            mlflow.log_params(params)
-            mlflow.log_metrics(metrics)
-            mlflow.sklearn.log_model(model, "model")
-            
-            # Register model based on comparison results
-            if should_promote:
-                logger.info("Promoting new model to production")
-                
-                # Retire current production model if it exists
-                if production_metrics is not None:
-                    retire_production_model(model_name)
-                
-                # Register new model as production
-                mlflow.register_model(
-                    model_uri=f"runs:/{mlflow.active_run().info.run_id}/model", 
-                    name=model_name
-                )
-                
-                # Transition to production stage
-                client = MlflowClient()
-                latest_version = client.get_latest_versions(model_name)[0]
-                client.transition_model_version_stage(
-                    name=model_name,
-                    version=latest_version.version,
-                    stage="Production"
-                )
-                
-                logger.info("New model successfully promoted to production")
+        # Start the run first so the model upload (the slowest step) runs while the champion is evaluated
+        registry.count('start_run')
+        with mlflow.start_run() as run, ThreadPoolExecutor(max_workers=1) as pool:
+            run_id = run.info.run_id
+            # A bundled model predicts from raw text, so the registered model can score messages directly
+            # The staging location is keyed by the model's content, so a restarted push resumes the upload
+            uploaded = pool.submit(upload_model, model, run_id, run.info.artifact_uri, registry,
+                                   mlflow_params.get('upload'), digest_path(model_path))
+
+            # Get current production model metrics
+            with recorder.stage('production_lookup'):
+                production_metrics = get_production_model_metrics(model_name, registry)
+                production_version = get_production_model_version(model_name, registry) if production_metrics is not None else None
+
+            # Score champion and challenger side by side on the same test messages when the test set is given;
+            # otherwise (or for a bare-classifier champion) compare the logged metrics
+            comparison = None
+            if production_version is not None and test_data_path:
+                try:
+                    with recorder.stage('paired_comparison') as stage:
+                        comparison = paired_comparison(params, model_name, production_version.version, model, model_path,
+                                                       test_data_path, registry)
+                        stage.rows = comparison['n_samples']
+                except Exception as e:
+                    logger.warning("Paired comparison unavailable, comparing logged metrics instead: %s", e)
+
+            # Determine if new model should be promoted to production
+            if comparison is not None:
+                comparison_params = params.get('model_comparison', {}) or {}
+                should_promote = should_promote_paired(comparison, comparison_threshold, primary_metric,
+                                                       comparison_params.get('paired_test', 'mcnemar'),
+                                                       comparison_params.get('significance_level', 0.05))
             else:
-                logger.info("Registering new model as staging (not promoted to production)")
-                mlflow.register_model(
-                    model_uri=f"runs:/{mlflow.active_run().info.run_id}/model", 
-                    name=model_name
-                )
-                
-                # Transition to staging stage
-                client = MlflowClient()
-                latest_version = client.get_latest_versions(model_name)[0]
-                client.transition_model_version_stage(
-                    name=model_name,
-                    version=latest_version.version,
-                    stage="Staging"
-                )
-                
-                logger.info("New model registered as staging")
+                should_promote = should_promote_model(metrics, production_metrics, comparison_threshold, primary_metric)
+
+            # Params and metrics go out in one batched request while the model is still uploading
+            all_metrics = dict(metrics)
+            if comparison is not None:
+                all_metrics.update({f'paired_{name}': value for name, value in comparison.items()})
+            with recorder.stage('log_batch'):
+                registry.log_batch(run_id, flatten_params(params), all_metrics)
+
+            # Registration needs the complete model artifact
+            with recorder.stage('wait_for_upload'):
+                upload_results = uploaded.result()
+            if upload_results:
+                logger.info("Model uploaded: %d files, %d bytes, %d parts (%d resumed)", len(upload_results),
+                            sum(result['bytes'] for result in upload_results.values()),
+                            sum(result['parts'] for result in upload_results.values()),
+                            sum(result['resumed_parts'] for result in upload_results.values()))
+
+            # Register the new version; promoting it archives the current production version in the same call
+            target_stage = "Production" if should_promote else "Staging"
+            logger.info("Registering new model as %s", target_stage.lower())
+            with recorder.stage('register'):
+                model_version = registry.register_model(f"runs:/{run_id}/model", model_name)
+                registry.transition_model_version_stage(model_name, model_version.version, target_stage,
+                                                        archive_existing_versions=should_promote)
+            logger.info("New model version %s registered as %s", model_version.version, target_stage)
+
+        logger.info("MLflow calls this push: %d (%s) in %.2fs", registry.total_calls,
+                    ", ".join(f"{method}={count}" for method, count in sorted(registry.calls.items())),
+                    time.perf_counter() - push_start)
                 
     except Exception as e:
         logger.error("Failed to complete the model pushing process: %s", e)
         raise
+    finally:
+        # Stage timings are written even when the push failed
+        if recorder is not None:
+            logger.info("Stage metrics:\n%s", recorder.summary())
+            if stage_metrics_path:
+                recorder.write(stage_metrics_path)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
@@ -362,8 +748,12 @@ if __name__ == "__main__":
     parser.add_argument("metrics_path", type=str, help="Path to load evaluation metrics")
     parser.add_argument("dagshub_username", type=str, help="DagsHub username for authentication")
     parser.add_argument("dagshub_token", type=str, help="DagsHub token for authentication")
+    parser.add_argument("--test_data_path", type=str, default=None, help="Preprocessed test set to score the production and new model on side by side")
+    parser.add_argument("--tracking_uri", type=str, default=None, help="MLflow tracking URI to use instead of DagsHub (e.g. file:./mlruns)")
+    parser.add_argument("--stage_metrics_path", type=str, default=None, help="Output directory for stage_metrics.json")
     args = parser.parse_args()
     main(repo_owner_name=args.repo_owner_name, repo_name=args.repo_name, model_name=args.model_name, 
          stage=args.stage, param_path=args.param_path, model_path=args.model_path, 
          metrics_path=args.metrics_path, dagshub_username=args.dagshub_username, 
-         dagshub_token=args.dagshub_token)
\ No newline at end of file
+         dagshub_token=args.dagshub_token, test_data_path=args.test_data_path, tracking_uri=args.tracking_uri,
+         stage_metrics_path=args.stage_metrics_path)
\ No newline at end of file
@@ -0,0 +1,289 @@
+import os
+import json
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, List, Optional
+import yaml
+from datetime import datetime
+import argparse
+import sys
+
+# Shared helpers live in components/common (copied next to this script inside the container image)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from inference_pipeline import LABELS, SpamInferencePipeline, load_inference_pipeline
+from instrumentation import StageRecorder
+from text_normalizer import tokenizer_from_params
+
+# Ensure that a directory named 'logs' exist in our root folder (if not it creates one)(for storing log file)
+log_dir = 'logs'
+os.makedirs(log_dir,exist_ok=True)
+
+# Logging Configuration
+logger = logging.getLogger('Inference_Server')
+logger.setLevel('DEBUG')
+
+# Creating Handlers
+console_handler = logging.StreamHandler()
+file_handler_path = os.path.join(log_dir,"Inference_Server.log")
+file_handler = logging.FileHandler(file_handler_path,encoding="utf-8")
+
+# Setting Log Levels for Handlers
+console_handler.setLevel('INFO')
+file_handler.setLevel('DEBUG')
+
+# Creating a Formatter and attaching it to handelers
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+console_handler.setFormatter(formatter)
+file_handler.setFormatter(formatter)
+
+# Adding handlers to the logger
+logger.addHandler(console_handler)
+logger.addHandler(file_handler)
+
+
+logger.info("\n" + " "*50 + "="*60)
+logger.info(f"NEW RUN STARTED AT {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+logger.info("="*60 + "\n")
+
+# Function to Load Parameters from params.yaml
+def load_params(param_path:str) ->dict:
+    try:
+        logger.debug("Loading Params From: %s",param_path)
+        with open(param_path,'r') as file:
+            params = yaml.safe_load(file)
+        logger.info("Params Loaded Successfully From: %s",param_path)
+        return params
+    except FileNotFoundError:
+        logger.error('File not found: %s',param_path)
+        raise
+    except yaml.YAMLError as e:
+        logger.error('YAML error: %s',e)
+        raise
+    except Exception as e:
+        logger.debug('Unexpected error occured while loadind parameters: %s',e)
+        raise
+
+# Function to load the raw-text model to serve
+def load_model(model_path: str, vectorizer_path: Optional[str] = None, stem_cache_size: int = 100_000,
+               tokenizer: str = 'nltk') -> SpamInferencePipeline:
+    """Load the saved model as an inference pipeline (wrapping a bare classifier with vectorizer.pkl from vectorizer_path)."""
+    try:
+        logger.debug("Loading model from: %s", model_path)
+        pipeline = load_inference_pipeline(model_path, vectorizer_path, stem_cache_size, tokenizer)
+        logger.info("Model loaded: TextNormalizer -> %s -> %s", type(pipeline.vectorizer).__name__,
+                    type(pipeline.classifier).__name__)
+        return pipeline
+    except FileNotFoundError as e:
+        logger.error("File not found: %s", e)
+        raise
+    except Exception as e:
+        logger.error("Unexpected error while loading the model: %s", e)
+        raise
+
+# Function to turn the pipeline's scores into JSON-ready predictions
+def predict_messages(pipeline: SpamInferencePipeline, texts: List[str]) -> List[dict]:
+    """Return {'label', 'spam_score'} for every message; spam_score is P(spam) or the decision margin."""
+    is_spam, scores = pipeline.predict_scores(texts)
+    return [{'label': LABELS[int(spam)], 'spam_score': float(score)} for spam, score in zip(is_spam, scores)]
+
+class MicroBatcher:
+    """
+    Group concurrent prediction requests into one vectorized call.
+
+    Requests are queued; a background thread takes the oldest request and keeps adding queued requests
+    until the batch holds max_batch_size messages or max_wait_ms have passed since it started waiting,
+    then runs predict_fn once on all their messages and hands every request its slice of the results.
+    A single request larger than max_batch_size is processed as one batch.
+    """
+
+    def __init__(self, predict_fn: Callable[[List[str]], list], max_batch_size: int = 64, max_wait_ms: float = 5.0):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1.")
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.batches = 0
+        self.messages = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, texts: List[str]) -> Future:
+        """Queue a request; the future resolves to the predictions for `texts`."""
+        future = Future()
+        self._queue.put((texts, future))
+        return future
+
+    def close(self) -> None:
+        """Stop the batching thread after the queued requests are served."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def stats(self) -> dict:
+        return {'batches': self.batches, 'messages': self.messages,
+                'mean_batch_size': self.messages / self.batches if self.batches else 0.0,
+                'max_batch_size': self.max_batch_size, 'max_wait_ms': self.max_wait * 1000.0}
+
+    def _collect(self, first: tuple) -> tuple:
+        batch, size, stop = [first], len(first[0]), False
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is None:
+                stop = True
+                break
+            batch.append(item)
+            size += len(item[0])
+        return batch, stop
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch, stop = self._collect(first)
+            texts = [text for request_texts, _ in batch for text in request_texts]
+            try:
+                predictions = self.predict_fn(texts)
+                start = 0
+                for request_texts, future in batch:
+                    future.set_result(predictions[start:start + len(request_texts)])
+                    start += len(request_texts)
+            except Exception as e:
+                logger.error("Prediction failed for a batch of %d messages: %s", len(texts), e)
+                for _, future in batch:
+                    future.set_exception(e)
+            self.batches += 1
+            self.messages += len(texts)
+            if stop:
+                return
+
+class InferenceRequestHandler(BaseHTTPRequestHandler):
+    """
+    HTTP API:
+
+        POST /predict  {"text": "..."}          -> {"label": "spam", "spam_score": 0.97}
+        POST /predict  {"texts": ["...", ...]}  -> {"predictions": [{"label": ..., "spam_score": ...}, ...]}
+        GET  /health                            -> {"status": "ok"}
+        GET  /stats                             -> micro-batching counters
+    """
+    protocol_version = 'HTTP/1.1'  # keep-alive, so clients can reuse connections
+    # Headers and body are written separately; with Nagle's algorithm on, the body waits for the
+    # client's delayed ACK (~40 ms) on every keep-alive response
+    disable_nagle_algorithm = True
+    access_log = False
+
+    def _send_json(self, status: int, payload: dict) -> None:
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send_json(200, {'status': 'ok'})
+        elif self.path == '/stats':
+            self._send_json(200, self.server.batcher.stats())
+        else:
+            self._send_json(404, {'error': f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        if self.path != '/predict':
+            self._send_json(404, {'error': f"Unknown path {self.path}"})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length) or b'{}')
+            single = 'text' in request
+            texts = [request['text']] if single else request['texts']
+            if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+                raise ValueError("'texts' must be a list of strings.")
+        except (ValueError, KeyError, TypeError) as e:
+            self._send_json(400, {'error': f"Expected {{'text': str}} or {{'texts': [str, ...]}}: {e}"})
+            return
+
+        try:
+            predictions = self.server.batcher.submit(texts).result(timeout=self.server.request_timeout) if texts else []
+        except Exception as e:
+            self._send_json(500, {'error': str(e)})
+            return
+        self._send_json(200, predictions[0] if single else {'predictions': predictions})
+
+    def log_message(self, format, *args):
+        # Per-request access logs are opt-in (serving.access_log) and go to the log file only
+        if self.access_log:
+            logger.debug("%s - %s", self.address_string(), format % args)
+
+class InferenceServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default listen backlog of 5 refuses connections when many clients connect at once
+    request_queue_size = 128
+
+# Function to create the HTTP server around a predictor
+def create_server(pipeline: SpamInferencePipeline, host: str, port: int, max_batch_size: int, max_wait_ms: float,
+                  request_timeout: float = 30.0, access_log: bool = False) -> InferenceServer:
+    """Create a threaded HTTP server whose handlers share one MicroBatcher over `pipeline`."""
+    handler = type('Handler', (InferenceRequestHandler,), {'access_log': access_log})
+    server = InferenceServer((host, port), handler)
+    server.batcher = MicroBatcher(lambda texts: predict_messages(pipeline, texts), max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+    server.request_timeout = request_timeout
+    return server
+
+def main(model_path: str, vectorizer_path: Optional[str] = None, param_file_path: Optional[str] = None, host: Optional[str] = None,
+         port: Optional[int] = None):
+    try:
+        params = load_params(param_file_path) if param_file_path else {}
+        serving_params = params.get('serving', {}) or {}
+        host = host or serving_params.get('host', '0.0.0.0')
+        port = port or serving_params.get('port', 8080)
+        max_batch_size = serving_params.get('max_batch_size', 64)
+        max_wait_ms = serving_params.get('max_wait_ms', 5)
+
+        # The server is long-running and outside the pipeline, so its startup stages are only logged
+        recorder = StageRecorder.from_params('serve_model', params)
+        with recorder.stage('load_model'):
+            pipeline = load_model(model_path, vectorizer_path, serving_params.get('stem_cache_size', 100_000),
+                                  tokenizer_from_params(params))
+        # Warm up the tokenizer and model so the first request does not pay the loading cost
+        with recorder.stage('warm_up'):
+            pipeline.predict_scores(["warm up"])
+        recorder.close()
+        logger.info("Startup stage metrics:\n%s", recorder.summary())
+
+        server = create_server(pipeline, host, port, max_batch_size, max_wait_ms,
+                               access_log=serving_params.get('access_log', False))
+        logger.info("Serving on http://%s:%d (max_batch_size=%d, max_wait_ms=%s)", host, port, max_batch_size, max_wait_ms)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            logger.info("Shutting down")
+        finally:
+            server.server_close()
+            server.batcher.close()
+    except Exception as e:
+        logger.error('Failed to start the inference server: %s', e)
+        print(f"Error: {e}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("model_path", type=str, help="Directory containing the saved model (model.mstore or model.pkl)")
+    parser.add_argument("vectorizer_path", type=str, nargs='?', default=None,
+                        help="Directory containing vectorizer.pkl (only needed when the saved model is a bare classifier)")
+    parser.add_argument("--param_file_path", type=str, default=None, help="Path of the Params.yaml (serving section)")
+    parser.add_argument("--host", type=str, default=None, help="Interface to bind (overrides serving.host)")
+    parser.add_argument("--port", type=int, default=None, help="Port to listen on (overrides serving.port)")
+    args = parser.parse_args()
+    main(model_path=args.model_path, vectorizer_path=args.vectorizer_path, param_file_path=args.param_file_path,
+         host=args.host, port=args.port)
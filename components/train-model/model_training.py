@@ -1,12 +1,30 @@
 import os
+import copy
+import json
 import numpy as np
 import pandas as pd
 import pickle
 import logging
-from sklearn.ensemble import RandomForestClassifier
+from operator import methodcaller
+from sklearn.ensemble import HistGradientBoostingClassifier, RandomForestClassifier
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.naive_bayes import MultinomialNB
+from sklearn.pipeline import Pipeline, make_pipeline
+from sklearn.preprocessing import FunctionTransformer
 import yaml
 from datetime import datetime
 import argparse
+import sys
+
+# Shared helpers live in components/common (copied next to this script inside the container image)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from feature_store import load_features
+from step_cache import StepCache, module_files
+from inference_pipeline import SpamInferencePipeline
+from model_store import has_model, load_model, save_model as store_model
+from text_normalizer import TextNormalizer, tokenizer_from_params
+from instrumentation import StageRecorder
 
 # Ensure that a directory named 'logs' exist in our root folder (if not it creates one)(for storing log file)
 log_dir = 'logs'
@@ -57,27 +75,23 @@ def load_params(param_path:str) ->dict:
         logger.debug('Unexpected error occured while loadind parameters: %s',e)
         raise
 
-# Function for loading the Dataset
-def load_data(input_dir: str, train_data: bool) -> pd.DataFrame:
+# Function for loading the sparse TF-IDF Dataset
+def load_data(input_dir: str, train_data: bool) -> tuple:
     """
-    Load train or test CSV from a Kubeflow-mounted directory path.
+    Memory-map the train or test feature set from a Kubeflow-mounted directory path.
 
     :param input_dir: Directory path (e.g., train_data.path or test_data.path)
-    :param train_data: Flag to determine whether to load 'train.csv' or 'test.csv'
-    :return: Loaded DataFrame
+    :param train_data: Flag to determine whether to load the 'train' or 'test' feature set
+    :return: (X, y) where X is a CSR matrix backed by the mapped files and y the label array
     """
     try:
-        filename = "train.csv" if train_data else "test.csv"
-        file_path = os.path.join(input_dir, filename)
+        name = "train" if train_data else "test"
 
-        logger.debug("Attempting to load data from: %s", file_path)
-        df = pd.read_csv(file_path)
-        logger.info("Data successfully loaded from %s", file_path)
-        return df
+        logger.debug("Attempting to load %s features from: %s", name, input_dir)
+        X, y = load_features(input_dir, name, mmap=True)
+        logger.info("Data successfully loaded from %s (%s, %s)", input_dir, X.shape, X.dtype)
+        return X, y
 
-    except pd.errors.ParserError as e:
-        logger.error("Failed to parse the CSV file: %s", e)
-        raise
     except FileNotFoundError as e:
         logger.error('File not found: %s', e)
         raise
@@ -85,26 +99,178 @@ def load_data(input_dir: str, train_data: bool) -> pd.DataFrame:
         logger.error("Unexpected error occurred while loading the data: %s", e)
         raise
 
-# Function to train our randomforest model
-def train_model(X_train: np.ndarray, y_train: np.ndarray, params: dict) -> RandomForestClassifier:
+# Builders for the classifier backends selectable with 4_Model_Training.model
+def _build_random_forest(params: dict) -> RandomForestClassifier:
+    return RandomForestClassifier(n_estimators=params['n_estimators'], random_state=params['random_state'],
+                                  max_depth=params.get('max_depth', None), n_jobs=params.get('n_jobs', None),
+                                  max_samples=params.get('max_samples', None), warm_start=params.get('warm_start', False))
+
+def _build_hist_gradient_boosting(params: dict):
+    # HistGradientBoosting only accepts dense input; densifying inside the model keeps evaluation and
+    # serving code identical for every backend (they always pass the sparse feature matrix)
+    return make_pipeline(FunctionTransformer(methodcaller('toarray'), accept_sparse=True),
+                         HistGradientBoostingClassifier(**params))
+
+# Registry of model backends: name -> (builder, params section under 4_Model_Training)
+# random_forest reads the keys directly under 4_Model_Training, where its hyperparameters have always lived.
+MODEL_BACKENDS = {
+    'random_forest': (_build_random_forest, None),
+    'sgd': (lambda params: SGDClassifier(**params), 'sgd'),
+    'logistic_regression': (lambda params: LogisticRegression(**params), 'logistic_regression'),
+    'multinomial_nb': (lambda params: MultinomialNB(**params), 'multinomial_nb'),
+    'hist_gradient_boosting': (_build_hist_gradient_boosting, 'hist_gradient_boosting'),
+}
+
+# Function to create the configured classifier
+def build_model(params: dict):
+    """
+    Create an unfitted classifier for the backend selected by params['model'] (default 'random_forest').
+
+    :param params: 4_Model_Training section of params.yaml
+    :return: Unfitted scikit-learn estimator
+    """
+    backend = params.get('model', 'random_forest')
+    if backend not in MODEL_BACKENDS:
+        raise ValueError(f"Unknown model backend '{backend}'. Expected one of {sorted(MODEL_BACKENDS)}.")
+    builder, section = MODEL_BACKENDS[backend]
+    backend_params = params if section is None else (params.get(section, {}) or {})
+    logger.debug('Initializing %s model with parameters: %s', backend, backend_params)
+    return builder(backend_params)
+
+# Function to apply hyperparameter overrides (e.g. the best tuning trial) to the 4_Model_Training section
+def apply_overrides(params: dict, overrides: dict) -> dict:
+    """
+    Return a copy of params with overrides applied. Keys may be dotted to reach a backend section,
+    e.g. {'model': 'sgd', 'sgd.alpha': 0.0001}.
+    """
+    params = copy.deepcopy(params)
+    for key, value in overrides.items():
+        *sections, name = key.split('.')
+        target = params
+        for section in sections:
+            if not isinstance(target.get(section), dict):
+                target[section] = {}
+            target = target[section]
+        target[name] = value
+    return params
+
+# Function to load the best hyperparameters found by the tuning step
+def load_best_params(best_params_dir: str) -> dict:
+    """Load the overrides from best_params.json written by model_tuning.py select."""
+    try:
+        file_path = os.path.join(best_params_dir, "best_params.json")
+        logger.debug("Loading tuned hyperparameters from: %s", file_path)
+        with open(file_path, 'r') as file:
+            best = json.load(file)
+        logger.info("Tuned hyperparameters loaded (trial %s, %s=%s): %s",
+                    best.get('trial'), best.get('metric'), best.get('score'), best['params'])
+        return best['params']
+    except FileNotFoundError:
+        logger.error("File not found: %s", file_path)
+        raise
+    except Exception as e:
+        logger.error("Unexpected error while loading tuned hyperparameters: %s", e)
+        raise
+
+# Function to load a previously trained model for incremental training
+def load_previous_model(model_dir: str) -> tuple:
+    """
+    Load a previous run's model store.
+
+    :return: (classifier, vectorizer) unwrapped from an inference pipeline bundle; vectorizer is None for
+             a bare classifier
+    """
+    try:
+        logger.debug("Loading previous model from: %s", model_dir)
+        # The copy-on-write map lets partial_fit update the loaded arrays without touching the file
+        model = load_model(model_dir)
+        vectorizer = getattr(model, 'vectorizer', None)
+        model = getattr(model, 'classifier', model)
+        logger.info("Previous model loaded: %s (vectorizer: %s)", type(model).__name__,
+                    type(vectorizer).__name__ if vectorizer is not None else 'none')
+        return model, vectorizer
+    except FileNotFoundError:
+        logger.error("Previous model not found: %s", model_dir)
+        raise
+    except Exception as e:
+        logger.error("Unexpected error while loading the previous model: %s", e)
+        raise
+
+def _hashing_step(vectorizer):
+    """Return the HashingVectorizer a (possibly pipelined) vectorizer starts with, or None."""
+    if isinstance(vectorizer, Pipeline):
+        vectorizer = vectorizer.steps[0][1]
+    return vectorizer if isinstance(vectorizer, HashingVectorizer) else None
+
+# Function to check that a previous model was trained on the same feature columns
+def same_feature_space(previous_vectorizer, vectorizer) -> bool:
     """
-    Train the RandomForest model.
+    Return True if column i of `vectorizer`'s output means what it meant for `previous_vectorizer`.
+
+    Hashed features send a token to the same bucket in every run, so only the hashing settings have to
+    match (the IDF weights that follow may differ). A TF-IDF vocabulary is refit on every run's data and
+    must be identical: with a fixed max_features a refit has the same width but other columns.
+    """
+    if previous_vectorizer is None or vectorizer is None:
+        return False
+    previous_hashing, hashing = _hashing_step(previous_vectorizer), _hashing_step(vectorizer)
+    if previous_hashing is not None or hashing is not None:
+        return (previous_hashing is not None and hashing is not None
+                and previous_hashing.get_params() == hashing.get_params())
+    previous_vocabulary = getattr(previous_vectorizer, 'vocabulary_', None)
+    return previous_vocabulary is not None and previous_vocabulary == getattr(vectorizer, 'vocabulary_', None)
+
+# Function to train the configured model
+def train_model(X_train, y_train: np.ndarray, params: dict, previous_model=None):
+    """
+    Train the model backend selected by params['model'] (RandomForest by default).
+
+    With warm_start enabled and a previous model given, the previous model is extended instead of
+    retrained from scratch: a RandomForest keeps its trees and grows incremental_estimators new trees
+    on the new data, and backends with partial_fit (sgd, multinomial_nb) continue learning from it.
     
-    :param X_train: Training features
+    :param X_train: Training features (sparse CSR matrix or dense array)
     :param y_train: Training labels
-    :param params: Dictionary of hyperparameters
-    :return: Trained RandomForestClassifier
+    :param params: 4_Model_Training section (model, n_estimators, random_state, n_jobs, max_samples,
+                   warm_start, incremental_estimators and the per-backend sections)
+    :param previous_model: Model from an earlier run to extend (used only when warm_start is true)
+    :return: Trained classifier
     """
     try:
         if X_train.shape[0] != y_train.shape[0]:
             raise ValueError("The number of samples in X_train and y_train must be the same.")
-        
-        logger.debug('Initializing RandomForest model with parameters: %s', params)
-        clf = RandomForestClassifier(n_estimators=params['n_estimators'], random_state=params['random_state'])
+
+        warm_start = params.get('warm_start', False)
+
+        if warm_start and previous_model is not None:
+            if previous_model.n_features_in_ != X_train.shape[1]:
+                raise ValueError(f"Previous model expects {previous_model.n_features_in_} features but the training data "
+                                 f"has {X_train.shape[1]}. Incremental training needs a stable feature space "
+                                 "(e.g. 3_Feature_Engineering.vectorizer: hashing).")
+            if not set(np.unique(y_train)) <= set(previous_model.classes_):
+                raise ValueError("Training data contains classes the previous model was not trained on.")
+
+            if isinstance(previous_model, RandomForestClassifier):
+                added = params.get('incremental_estimators', params['n_estimators'])
+                clf = previous_model
+                # Trees already in the forest are kept; fit() only grows the additional ones on the new data
+                clf.set_params(warm_start=True, n_estimators=len(clf.estimators_) + added,
+                               n_jobs=params.get('n_jobs', None), max_samples=params.get('max_samples', None))
+                logger.debug('Extending previous forest of %d trees with %d new trees', len(clf.estimators_), added)
+            elif hasattr(previous_model, 'partial_fit'):
+                logger.debug('Continuing training of previous %s with partial_fit on %d samples',
+                             type(previous_model).__name__, X_train.shape[0])
+                previous_model.partial_fit(X_train, y_train)
+                logger.info('Model training completed')
+                return previous_model
+            else:
+                raise ValueError(f"{type(previous_model).__name__} does not support incremental training.")
+        else:
+            clf = build_model(params)
         
         logger.debug('Model training started with %d samples', X_train.shape[0])
         clf.fit(X_train, y_train)
-        logger.info('Model training completed')
+        logger.info('Model training completed (%s)', type(clf).__name__)
         
         return clf
     except ValueError as e:
@@ -114,66 +280,152 @@ def train_model(X_train: np.ndarray, y_train: np.ndarray, params: dict) -> Rando
         logger.error('Unexpected error occured during model training: %s', e)
         raise
 
+# Function to load the vectorizer fitted by feature engineering
+def load_vectorizer(vectorizer_dir: str):
+    """Load vectorizer.pkl from the feature engineering vectorizer artifact."""
+    try:
+        file_path = os.path.join(vectorizer_dir, "vectorizer.pkl")
+        logger.debug("Loading fitted vectorizer from: %s", file_path)
+        with open(file_path, 'rb') as file:
+            vectorizer = pickle.load(file)
+        logger.info("Vectorizer loaded: %s", type(vectorizer).__name__)
+        return vectorizer
+    except FileNotFoundError:
+        logger.error("Vectorizer not found: %s", vectorizer_dir)
+        raise
+    except Exception as e:
+        logger.error("Unexpected error while loading the vectorizer: %s", e)
+        raise
+
+# Function to bundle preprocessing, vectorizer and classifier into one raw-text model
+def build_inference_pipeline(clf, vectorizer, tokenizer: str = 'nltk') -> SpamInferencePipeline:
+    """Wrap the trained classifier with the text normalizer (using preprocessing's tokenizer) and the fitted vectorizer."""
+    try:
+        pipeline = SpamInferencePipeline(normalizer=TextNormalizer(tokenizer=tokenizer), vectorizer=vectorizer, classifier=clf)
+        pipeline.check_compatible()
+        logger.info("Inference pipeline built: TextNormalizer (%s tokenizer) -> %s -> %s", tokenizer,
+                    type(vectorizer).__name__, type(clf).__name__)
+        return pipeline
+    except Exception as e:
+        logger.error("Failed to build the inference pipeline: %s", e)
+        raise
+
 # Function to save the trained model
-def save_model(model, output_dir: str) -> None:
+def save_model(model, output_dir: str, compression: str = None) -> None:
     """
-    Save the trained model to a file inside the Kubeflow-provided output directory using pickle.
+    Save the trained model as model.mstore inside the Kubeflow-provided output directory.
+
+    The model store keeps numpy arrays as out-of-band pickle buffers so loaders can memory-map them
+    (see components/common/model_store.py).
 
     :param model: Trained model object (e.g., a Scikit-learn model)
     :param output_dir: Path to the Kubeflow artifact directory (model.path)
+    :param compression: model_store.compression ('none' keeps the file memory-mappable)
     """
     try:
-        # Define full path with filename
-        file_path = os.path.join(output_dir, "model.pkl")
-
-        # Ensure the directory exists
-        logger.debug("Creating directory for saving Trained Model...")
-        os.makedirs(output_dir, exist_ok=True)
-        logger.info("Successfully Created Directory at: %s", output_dir)
-
-        # Save the model
-        logger.debug("Saving Trained Model...")
-        with open(file_path, 'wb') as file:
-            pickle.dump(model, file)
-        logger.info("Model successfully saved to %s", file_path)
+        logger.debug("Saving Trained Model (compression=%s)...", compression or 'none')
+        file_path = store_model(model, output_dir, compression)
+        logger.info("Model successfully saved to %s (%.1f MB)", file_path, os.path.getsize(file_path) / 2**20)
 
     except Exception as e:
         logger.error("Unexpected error occurred while saving the model: %s", e)
         raise
 
 # Main function to load data, train the model, and save it
-def main(param_file_path:str, train_data_path:str, model_save_path:str):
+def main(param_file_path:str, train_data_path:str, model_save_path:str, previous_model_path: str = None,
+         best_params_path: str = None, vectorizer_path: str = None, stage_metrics_path: str = None):
+    recorder = None
     try:
         # Loading Parameters From params.yaml
-        params = load_params(param_file_path)['4_Model_Training']
-        
-        # Load preprocessed training data (TF-IDF transformed)
-        train_data = load_data(train_data_path, train_data=True)
+        all_params = load_params(param_file_path)
+        recorder = StageRecorder.from_params('train_model', all_params)
+        params = all_params['4_Model_Training']
+
+        # Hyperparameters chosen by the tuning step take precedence over params.yaml
+        if best_params_path:
+            params = apply_overrides(params, load_best_params(best_params_path))
+
+        # Incremental mode only applies when warm_start is on and a previous model exists
+        if previous_model_path and not (params.get('warm_start', False) and has_model(previous_model_path)):
+            logger.info("No usable previous model (warm_start=%s), training from scratch", params.get('warm_start', False))
+            previous_model_path = None
+
+        # Skip the step when the training data, hyperparameters and code are unchanged since a cached run
+        cache = StepCache.from_params(all_params)
+        outputs = {'model': model_save_path}
+        if cache is not None:
+            cache_key = StepCache.key('train_model',
+                                      [os.path.abspath(__file__), *module_files(load_features, SpamInferencePipeline, TextNormalizer, store_model)],
+                                      {'4_Model_Training': params, 'model_store': all_params.get('model_store', {}),
+                                       'tokenizer': tokenizer_from_params(all_params)},
+                                      [train_data_path] + [path for path in (previous_model_path, vectorizer_path) if path])
+            with recorder.stage('cache_restore'):
+                restored = cache.restore(cache_key, outputs)
+            if restored:
+                logger.info("Step cache hit (%s): model restored from %s", cache_key[:16], cache.describe())
+                return
+            logger.info("Step cache miss (%s)", cache_key[:16])
         
-        # Extract input features (X_train) and target labels (y_train) from the dataset
-        X_train = train_data.iloc[:, :-1].values  # Select all columns except the last one (features)
-        y_train = train_data.iloc[:, -1].values   # Select the last column as target labels
+        # Load preprocessed training data (sparse TF-IDF features and target labels)
+        with recorder.stage('load_data') as stage:
+            X_train, y_train = load_data(train_data_path, train_data=True)
+            stage.rows = X_train.shape[0]
         
+        # Load the model to extend in incremental mode; it is only reused on the same feature columns
+        previous_model, vectorizer = None, None
+        if vectorizer_path:
+            with recorder.stage('load_vectorizer'):
+                vectorizer = load_vectorizer(vectorizer_path)
+        if previous_model_path:
+            with recorder.stage('load_previous_model'):
+                previous_model, previous_vectorizer = load_previous_model(previous_model_path)
+            if not same_feature_space(previous_vectorizer, vectorizer):
+                logger.warning("Previous model was trained on other feature columns (or they cannot be compared: "
+                               "warm_start needs both models bundled with their vectorizer and, for tfidf, an "
+                               "identical vocabulary), training from scratch")
+                previous_model = None
+
         # Train the model using the extracted features and target labels
-        clf = train_model(X_train, y_train, params)
+        with recorder.stage(f"fit_{params.get('model', 'random_forest')}", rows=X_train.shape[0]):
+            clf = train_model(X_train, y_train, params, previous_model=previous_model)
         
-        # Define the path where the trained model should be saved
-        model_save_path = model_save_path
+        # Bundle the classifier with the normalizer and vectorizer so the saved model predicts from raw text
+        if vectorizer_path:
+            with recorder.stage('bundle_inference_pipeline'):
+                clf = build_inference_pipeline(clf, vectorizer, tokenizer_from_params(all_params))
         
         # Save the trained model for future use
-        save_model(clf, model_save_path)
+        with recorder.stage('save_model'):
+            save_model(clf, model_save_path, (all_params.get('model_store', {}) or {}).get('compression'))
+
+        if cache is not None:
+            with recorder.stage('cache_save'):
+                cache.save(cache_key, outputs, component='train_model')
+            logger.info("Step outputs stored in cache %s", cache.describe())
 
     except Exception as e:
         # Log and print an error message if any step fails
         logger.error('Failed to complete the model building process: %s', e)
         print(f"Error: {e}")
+    finally:
+        # Stage timings are written even when the step failed or was restored from the cache
+        if recorder is not None:
+            logger.info("Stage metrics:\n%s", recorder.summary())
+            if stage_metrics_path:
+                recorder.write(stage_metrics_path)
 
 # Entry point of the script: Execute the main function when the script runs
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument("param_file_path", type=str, help="Path of the Params.yaml")
-    parser.add_argument("train_data_path", type=str, help="Path to load train data CSV")
+    parser.add_argument("train_data_path", type=str, help="Path to load train data (feature store directory)")
     parser.add_argument("model_save_path", type=str, help="Path to save the trained model")
+    parser.add_argument("--previous_model_path", type=str, default=None, help="Directory of a previous model to extend when warm_start is enabled")
+    parser.add_argument("--best_params_path", type=str, default=None, help="Directory of best_params.json from the tuning step")
+    parser.add_argument("--vectorizer_path", type=str, default=None, help="Directory of vectorizer.pkl; when given, the model is saved as a raw-text inference pipeline")
+    parser.add_argument("--stage_metrics_path", type=str, default=None, help="Output directory for stage_metrics.json")
     args = parser.parse_args()
-    main(param_file_path=args.param_file_path, train_data_path=args.train_data_path, model_save_path=args.model_save_path)
+    main(param_file_path=args.param_file_path, train_data_path=args.train_data_path, model_save_path=args.model_save_path,
+         previous_model_path=args.previous_model_path, best_params_path=args.best_params_path, vectorizer_path=args.vectorizer_path,
+         stage_metrics_path=args.stage_metrics_path)
 
@@ -0,0 +1,379 @@
+import os
+import json
+import math
+import logging
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+import numpy as np
+from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score, roc_auc_score
+import yaml
+from datetime import datetime
+import argparse
+import sys
+
+# Shared helpers live in components/common and the model backends in components/train-model
+# (both copied next to this script inside the container image)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'train-model'))
+from feature_store import load_features, read_header
+from step_cache import StepCache, module_files
+from instrumentation import StageRecorder
+from model_training import apply_overrides, build_model
+
+# Ensure that a directory named 'logs' exist in our root folder (if not it creates one)(for storing log file)
+log_dir = 'logs'
+os.makedirs(log_dir,exist_ok=True)
+
+# Logging Configuration
+logger = logging.getLogger('Model_Tuning')
+logger.setLevel('DEBUG')
+
+# Creating Handlers
+console_handler = logging.StreamHandler()
+file_handler_path = os.path.join(log_dir,"Model_Tuning.log")
+file_handler = logging.FileHandler(file_handler_path,encoding="utf-8")
+
+# Setting Log Levels for Handlers
+console_handler.setLevel('DEBUG')
+file_handler.setLevel('DEBUG')
+
+# Creating a Formatter and attaching it to handelers
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+console_handler.setFormatter(formatter)
+file_handler.setFormatter(formatter)
+
+# Adding handlers to the logger
+logger.addHandler(console_handler)
+logger.addHandler(file_handler)
+
+
+logger.info("\n" + " "*50 + "="*60)
+logger.info(f"NEW RUN STARTED AT {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+logger.info("="*60 + "\n")
+
+# Metrics a trial can be ranked by (higher is better)
+LABEL_METRICS = {
+    'accuracy': accuracy_score,
+    'precision': precision_score,
+    'recall': recall_score,
+    'f1': f1_score,
+}
+
+# Function to Load Parameters from params.yaml
+def load_params(param_path:str) ->dict:
+    try:
+        logger.debug("Loading Params From: %s",param_path)
+        with open(param_path,'r') as file:
+            params = yaml.safe_load(file)
+        logger.info("Params Loaded Successfully From: %s",param_path)
+        return params
+    except FileNotFoundError:
+        logger.error('File not found: %s',param_path)
+        raise
+    except yaml.YAMLError as e:
+        logger.error('YAML error: %s',e)
+        raise
+    except Exception as e:
+        logger.debug('Unexpected error occured while loadind parameters: %s',e)
+        raise
+
+# Function to turn the declared search space into the list of trial configurations
+def expand_search_space(tuning_params: dict) -> List[dict]:
+    """
+    Build the trial configurations (4_Model_Training overrides) from the 5_Model_Tuning section.
+
+    With search 'grid' every combination of the listed values is a trial. With search 'random',
+    n_trials configurations are sampled: a list is sampled uniformly, a {low, high, log} mapping is
+    sampled from that range (integers when both bounds are integers, log-uniform when log is true).
+    """
+    space = tuning_params['space']
+    keys = sorted(space)
+    search = tuning_params.get('search', 'grid')
+
+    if search == 'grid':
+        for key in keys:
+            if not isinstance(space[key], list):
+                raise ValueError(f"Grid search needs a list of values for '{key}'.")
+        return [dict(zip(keys, values)) for values in itertools.product(*(space[key] for key in keys))]
+
+    if search == 'random':
+        rng = np.random.default_rng(tuning_params.get('random_state', None))
+
+        def sample(values):
+            if isinstance(values, list):
+                return values[rng.integers(len(values))]
+            low, high = values['low'], values['high']
+            if values.get('log', False):
+                value = math.exp(rng.uniform(math.log(low), math.log(high)))
+            else:
+                value = rng.uniform(low, high)
+            return int(round(value)) if isinstance(low, int) and isinstance(high, int) else float(value)
+
+        return [{key: sample(space[key]) for key in keys} for _ in range(tuning_params['n_trials'])]
+
+    raise ValueError(f"Unknown search '{search}'. Expected 'grid' or 'random'.")
+
+# Function to compute the training-set sizes of the successive halving rungs
+def rung_sizes(n_rows: int, min_fraction: float, eta: int) -> List[int]:
+    """Return the number of training rows used at each rung: n*min_fraction, times eta per rung, ending at n."""
+    sizes = []
+    fraction = min_fraction
+    # A rung that would already use more than 1/eta of the rows is merged into the final full-size rung
+    while fraction * eta <= 1.0:
+        sizes.append(max(1, int(n_rows * fraction)))
+        fraction *= eta
+    sizes.append(n_rows)
+    return sizes
+
+# Per-worker trial state, set once per process by _init_trial_worker
+_train_X = None
+_train_y = None
+_fit_rows = None
+_valid_rows = None
+
+def _init_trial_worker(train_data, validation_fraction: float, seed: int, single_threaded: bool) -> None:
+    """
+    Memory-map the training features once per worker and fix the fit/validation row split.
+
+    train_data is a feature store directory or an (X, y) pair already in memory (forked workers inherit it).
+    """
+    global _train_X, _train_y, _fit_rows, _valid_rows
+    if isinstance(train_data, str):
+        # Every worker maps the same read-only files, so the feature pages are shared through the page cache
+        _train_X, _train_y = load_features(train_data, 'train', mmap=True)
+    else:
+        _train_X, _train_y = train_data
+    order = np.random.default_rng(seed).permutation(_train_X.shape[0])
+    n_valid = max(1, int(len(order) * validation_fraction))
+    _valid_rows, _fit_rows = np.sort(order[:n_valid]), order[n_valid:]
+    if single_threaded:
+        # Trials already run in parallel processes; keep native thread pools from oversubscribing the cores
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(limits=1)
+
+def _run_trial(task: tuple) -> tuple:
+    """Fit one configuration on the first n_rows fit rows and score it on the validation rows."""
+    trial_id, params, n_rows, metric = task
+    fit_rows = np.sort(_fit_rows[:n_rows])
+    try:
+        clf = build_model(params)
+        clf.fit(_train_X[fit_rows], _train_y[fit_rows])
+        X_valid, y_valid = _train_X[_valid_rows], _train_y[_valid_rows]
+        if metric == 'auc':
+            scores = clf.predict_proba(X_valid)[:, 1] if hasattr(clf, 'predict_proba') else clf.decision_function(X_valid)
+            return trial_id, float(roc_auc_score(y_valid, scores)), None
+        return trial_id, float(LABEL_METRICS[metric](y_valid, clf.predict(X_valid))), None
+    except Exception as e:
+        # An invalid combination of hyperparameters loses the trial, not the whole search
+        return trial_id, None, f"{type(e).__name__}: {e}"
+
+# Function to run successive halving over this shard's trials
+def successive_halving(trials: List[tuple], base_params: dict, sizes: List[int], eta: int, metric: str,
+                       pool: Optional[ProcessPoolExecutor] = None) -> List[dict]:
+    """
+    Evaluate trials on growing training subsets, keeping the best 1/eta after each rung.
+
+    :param trials: (trial_id, overrides) pairs
+    :param base_params: 4_Model_Training section the overrides are applied to
+    :param sizes: Training rows per rung (the last rung is the full fit split)
+    :param pool: Worker pool initialized with _init_trial_worker; None runs the trials in this process
+    :return: One record per trial with its score at every rung it reached
+    """
+    records = {trial_id: {'trial': trial_id, 'params': overrides, 'scores': [], 'completed': False}
+               for trial_id, overrides in trials}
+    trial_params = {trial_id: apply_overrides(base_params, overrides) for trial_id, overrides in trials}
+    alive = [trial_id for trial_id, _ in trials]
+    run = pool.map if pool is not None else map
+
+    for rung, n_rows in enumerate(sizes):
+        logger.debug("Rung %d: %d trials on %d rows", rung, len(alive), n_rows)
+        tasks = [(trial_id, trial_params[trial_id], n_rows, metric) for trial_id in alive]
+        for trial_id, score, error in run(_run_trial, tasks):
+            records[trial_id]['scores'].append({'rows': n_rows, 'score': score})
+            if error is not None:
+                records[trial_id]['error'] = error
+                logger.warning("Trial %d failed at rung %d: %s", trial_id, rung, error)
+
+        scored = [trial_id for trial_id in alive if records[trial_id]['scores'][-1]['score'] is not None]
+        if rung == len(sizes) - 1:
+            for trial_id in scored:
+                records[trial_id]['completed'] = True
+            break
+        # Keep the top 1/eta of this rung for the next, larger one
+        scored.sort(key=lambda trial_id: records[trial_id]['scores'][-1]['score'], reverse=True)
+        alive = scored[:max(1, math.ceil(len(scored) / eta))]
+        logger.info("Rung %d done: %d of %d trials promoted", rung, len(alive), len(tasks))
+        if not alive:
+            break
+
+    return [records[trial_id] for trial_id, _ in trials]
+
+# Function to save the trial results of one shard
+def save_results(results: dict, output_dir: str) -> None:
+    """Save the shard's trial results as trials.json inside the Kubeflow output directory."""
+    try:
+        os.makedirs(output_dir, exist_ok=True)
+        file_path = os.path.join(output_dir, "trials.json")
+        logger.debug("Saving trial results to: %s", file_path)
+        with open(file_path, 'w') as file:
+            json.dump(results, file, indent=4)
+        logger.info("Trial results saved to %s", file_path)
+    except Exception as e:
+        logger.error("Unexpected error occurred while saving trial results: %s", e)
+        raise
+
+# Function to run one shard's trials
+def run_search(train_data, tuning_params: dict, base_params: dict, shard_index: int = 0, num_shards: int = 1) -> dict:
+    """
+    Run successive halving over the trials of one shard and return the content of trials.json.
+
+    :param train_data: Feature store directory of the training set, or an (X, y) pair already in memory
+    :param tuning_params: The 5_Model_Tuning section of params.yaml
+    :param base_params: The 4_Model_Training section the trial overrides are applied to
+    """
+    # Trials are dealt round-robin to the pods of the ParallelFor
+    all_trials = expand_search_space(tuning_params)
+    trials = [(trial_id, overrides) for trial_id, overrides in enumerate(all_trials) if trial_id % num_shards == shard_index]
+    logger.info("Shard %d/%d: %d of %d trials", shard_index, num_shards, len(trials), len(all_trials))
+
+    metric = tuning_params.get('metric', 'auc')
+    if metric != 'auc' and metric not in LABEL_METRICS:
+        raise ValueError(f"Unknown metric '{metric}'. Expected 'auc' or one of {sorted(LABEL_METRICS)}.")
+    validation_fraction = tuning_params.get('validation_fraction', 0.2)
+    seed = tuning_params.get('random_state', 0)
+    eta = tuning_params.get('eta', 3)
+
+    workers = tuning_params.get('n_jobs', 1) or 1
+    if workers < 0:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(trials)))
+    if workers > 1:
+        # Trials get one core each; a searched n_jobs is left as declared
+        base_params = {**base_params, 'n_jobs': 1}
+
+    n_rows = read_header(train_data, 'train')['shape'][0] if isinstance(train_data, str) else train_data[0].shape[0]
+    sizes = rung_sizes(n_rows - max(1, int(n_rows * validation_fraction)), tuning_params.get('min_fraction', 0.1), eta)
+    logger.debug("Successive halving rungs (eta=%d): %s rows", eta, sizes)
+
+    init_args = (train_data, validation_fraction, seed, workers > 1)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_trial_worker, initargs=init_args) as pool:
+            records = successive_halving(trials, base_params, sizes, eta, metric, pool=pool)
+    else:
+        _init_trial_worker(*init_args)
+        records = successive_halving(trials, base_params, sizes, eta, metric)
+    return {'metric': metric, 'shard_index': shard_index, 'num_shards': num_shards, 'rung_sizes': sizes, 'trials': records}
+
+# Search step: run this pod's share of the trials
+def search(param_file_path: str, train_data_path: str, output_dir: str, shard_index: int = 0, num_shards: int = 1,
+           stage_metrics_path: str = None):
+    recorder = None
+    try:
+        all_params = load_params(param_file_path)
+        recorder = StageRecorder.from_params('model_tuning', all_params)
+        tuning_params = all_params['5_Model_Tuning']
+        base_params = all_params['4_Model_Training']
+        if not 0 <= shard_index < num_shards:
+            raise ValueError(f"shard_index must be in [0, {num_shards}), got {shard_index}.")
+
+        # Skip the search when the features, search settings and code are unchanged since a cached run
+        cache = StepCache.from_params(all_params)
+        outputs = {'trials': output_dir}
+        if cache is not None:
+            cache_key = StepCache.key('model_tuning', [os.path.abspath(__file__), *module_files(load_features, build_model)],
+                                      {'5_Model_Tuning': tuning_params, '4_Model_Training': base_params,
+                                       'shard': [shard_index, num_shards]},
+                                      [train_data_path])
+            with recorder.stage('cache_restore'):
+                restored = cache.restore(cache_key, outputs)
+            if restored:
+                logger.info("Step cache hit (%s): trial results restored from %s", cache_key[:16], cache.describe())
+                return
+            logger.info("Step cache miss (%s)", cache_key[:16])
+
+        # Rows: training rows summed over every trial and rung
+        with recorder.stage('successive_halving') as stage:
+            results = run_search(train_data_path, tuning_params, base_params, shard_index, num_shards)
+            stage.rows = sum(score['rows'] for record in results['trials'] for score in record['scores'])
+        save_results(results, output_dir)
+
+        if cache is not None:
+            with recorder.stage('cache_save'):
+                cache.save(cache_key, outputs, component='model_tuning')
+            logger.info("Step outputs stored in cache %s", cache.describe())
+
+    except Exception as e:
+        logger.error('Failed to complete the hyperparameter search: %s', e)
+        print(f"Error: {e}")
+    finally:
+        # Stage timings are written even when the step failed or was restored from the cache
+        if recorder is not None:
+            logger.info("Stage metrics:\n%s", recorder.summary())
+            if stage_metrics_path:
+                recorder.write(stage_metrics_path)
+
+# Function to pick the best completed trial from the shards' results
+def best_trial(shard_results: List[dict]) -> dict:
+    """
+    Return best_params (trial, metric, score, params) from the trials.json contents of all shards.
+
+    Only trials that completed the last rung (trained on the full fit split) are compared.
+    """
+    completed = []
+    metric = None
+    for results in shard_results:
+        metric = results['metric']
+        completed.extend(trial for trial in results['trials'] if trial['completed'])
+    if not completed:
+        raise ValueError("No trial completed the search; check the trial errors in trials.json.")
+
+    best = max(completed, key=lambda trial: trial['scores'][-1]['score'])
+    best_params = {'trial': best['trial'], 'metric': metric, 'score': best['scores'][-1]['score'], 'params': best['params']}
+    logger.info("Best of %d completed trials: trial %d, %s=%.4f, %s", len(completed), best['trial'],
+                metric, best_params['score'], best['params'])
+    return best_params
+
+# Select step: pick the best completed trial across all shards
+def select(result_dirs: List[str], output_dir: str) -> dict:
+    """Merge the trials.json files of all shards and write best_params.json for train_model."""
+    try:
+        shard_results = []
+        for result_dir in result_dirs:
+            with open(os.path.join(result_dir, "trials.json"), 'r') as file:
+                shard_results.append(json.load(file))
+        best_params = best_trial(shard_results)
+
+        os.makedirs(output_dir, exist_ok=True)
+        with open(os.path.join(output_dir, "best_params.json"), 'w') as file:
+            json.dump(best_params, file, indent=4)
+        logger.info("Best parameters saved to %s", output_dir)
+        return best_params
+    except Exception as e:
+        logger.error('Failed to select the best trial: %s', e)
+        raise
+
+# Entry point of the script
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    search_parser = subparsers.add_parser('search', help="Run this shard's trials")
+    search_parser.add_argument("param_file_path", type=str, help="Path of the Params.yaml")
+    search_parser.add_argument("train_data_path", type=str, help="Path to load train data (feature store directory)")
+    search_parser.add_argument("output_dir", type=str, help="Path to save trials.json")
+    # KFP passes list items as JSON numbers, so the shard index may arrive as e.g. '1.0'
+    search_parser.add_argument("--shard_index", type=lambda value: int(float(value)), default=0, help="Index of this shard")
+    search_parser.add_argument("--shards", type=str, default="[0]", help="JSON list of all shard indices (its length is the number of shards)")
+    search_parser.add_argument("--stage_metrics_path", type=str, default=None, help="Output directory for stage_metrics.json")
+
+    select_parser = subparsers.add_parser('select', help="Pick the best trial across shards")
+    select_parser.add_argument("output_dir", type=str, help="Path to save best_params.json")
+    select_parser.add_argument("result_dirs", type=str, nargs='+', help="Directories holding the shards' trials.json")
+
+    args = parser.parse_args()
+    if args.command == 'search':
+        search(param_file_path=args.param_file_path, train_data_path=args.train_data_path, output_dir=args.output_dir,
+               shard_index=args.shard_index, num_shards=len(json.loads(args.shards)), stage_metrics_path=args.stage_metrics_path)
+    else:
+        select(result_dirs=args.result_dirs, output_dir=args.output_dir)
@@ -0,0 +1,368 @@
+"""
+Run spam_detection_pipeline (pipeline.py) locally in one process: no Kubeflow cluster, images or MinIO.
+
+The DAG is the same as the compiled pipeline and each step calls the same component functions, but
+DataFrames, sparse feature matrices, the vectorizer and the model are handed from step to step in memory
+instead of being written to artifact storage and read back:
+
+    data_ingestion -> data_preprocessing -> feature_engineering -> model_tuning (one branch per shard)
+    -> select_best_trial -> train_model -> evaluate_model | batch_score (when --score_data_url is given)
+
+Independent branches (the tuning shards, then evaluation and batch scoring) run one after the other, or
+concurrently on a pool of --workers forked processes that inherit the in-memory inputs without copying.
+push_model is not run: it needs an MLflow registry (run components/push-model/model_pusher.py on the
+saved model and metrics for that).
+
+Nothing is written unless --output_dir is given; then only the artifacts listed in --save are, each into
+output_dir/<artifact> (trials as trials_<shard>) in the layout its component writes in the pipeline, so a
+saved model, vectorizer or feature set can be passed on to the component scripts. Every step is timed
+with the components' StageRecorder; compare with benchmarks/bench_pipeline.py (the same steps exchanging
+artifacts on disk) to see how much of a run is artifact I/O and orchestration.
+
+Usage:
+    python local_runner.py --data_url data/spam.csv
+    python local_runner.py --data_url data/spam.csv --output_dir local_run --save model metrics vectorizer
+    python local_runner.py --data_url data/spam.csv --tuning_shards 4 --workers 4 --score_data_url backlog.csv
+"""
+import os
+import sys
+import json
+import logging
+import argparse
+import importlib.util
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import yaml
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+COMPONENTS = os.path.join(ROOT, 'components')
+sys.path.append(os.path.join(COMPONENTS, 'common'))
+from instrumentation import StageRecorder  # noqa: E402
+from text_normalizer import tokenizer_from_params  # noqa: E402
+
+# Artifacts that can be written with --save, named like the pipeline's outputs
+ARTIFACTS = ['train_data', 'test_data', 'train_processed', 'test_processed', 'train_tfidf', 'test_tfidf', 'vectorizer',
+             'trials', 'best_params', 'model', 'metrics', 'scores', 'stage_metrics']
+
+# Component scripts, loaded in dependency order (model_tuning imports model_training)
+COMPONENT_SCRIPTS = {
+    'ingest': 'data-ingestion/ingest.py',
+    'preprocess': 'data-preprocessing/preprocess.py',
+    'feature_engineering': 'feature-engineering/feature_engineering.py',
+    'model_training': 'train-model/model_training.py',
+    'model_tuning': 'tune-model/model_tuning.py',
+    'model_evaluation': 'evaluate-model/model_evaluation.py',
+    'batch_scoring': 'batch-score/batch_scoring.py',
+}
+
+# Ensure that a directory named 'logs' exist in our root folder (if not it creates one)(for storing log file)
+log_dir = 'logs'
+os.makedirs(log_dir, exist_ok=True)
+
+# Logging Configuration
+logger = logging.getLogger('Local_Runner')
+logger.setLevel('DEBUG')
+
+console_handler = logging.StreamHandler()
+file_handler = logging.FileHandler(os.path.join(log_dir, "Local_Runner.log"), encoding="utf-8")
+console_handler.setLevel('INFO')
+file_handler.setLevel('DEBUG')
+
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+console_handler.setFormatter(formatter)
+file_handler.setFormatter(formatter)
+
+logger.addHandler(console_handler)
+logger.addHandler(file_handler)
+
+
+def load_components(verbose: bool = False) -> dict:
+    """
+    Import the component scripts (their directory names are not valid package names) as modules.
+
+    They are registered in sys.modules under their own names, so model_tuning shares model_training and
+    functions sent to worker pools resolve in the workers.
+    """
+    modules = {}
+    for name, relative_path in COMPONENT_SCRIPTS.items():
+        if name not in sys.modules:
+            spec = importlib.util.spec_from_file_location(name, os.path.join(COMPONENTS, relative_path))
+            module = importlib.util.module_from_spec(spec)
+            sys.modules[name] = module
+            spec.loader.exec_module(module)
+        modules[name] = sys.modules[name]
+        # Component logs still go to logs/<Component>.log
+        if not verbose and hasattr(modules[name], 'console_handler'):
+            modules[name].console_handler.setLevel(logging.WARNING)
+    return modules
+
+
+# Branch functions and their in-memory inputs, set before the branch pool is forked
+_branches = {}
+
+
+def _run_branch(name: str):
+    fn, args = _branches[name]
+    return fn(*args)
+
+
+def run_branches(recorder: StageRecorder, branches: dict, workers: int) -> dict:
+    """
+    Run independent branches {name: (fn, args)}, where fn returns (result, rows); return {name: result}.
+
+    With workers > 1 each branch runs in a forked process (inputs are inherited, only results are pickled)
+    and is timed from submission to result; otherwise the branches run here one after the other.
+    """
+    results = {}
+    if workers <= 1 or len(branches) <= 1 or 'fork' not in multiprocessing.get_all_start_methods():
+        for name, (fn, args) in branches.items():
+            with recorder.stage(name) as stage:
+                results[name], stage.rows = fn(*args)
+        return results
+
+    _branches.clear()
+    _branches.update(branches)
+    try:
+        with ProcessPoolExecutor(max_workers=min(workers, len(branches)), mp_context=multiprocessing.get_context('fork')) as pool:
+            def wait(name):
+                # One waiting thread per branch, so the branches' stages overlap like the branches do
+                with recorder.stage(name) as stage:
+                    result, stage.rows = pool.submit(_run_branch, name).result()
+                return result
+
+            with ThreadPoolExecutor(max_workers=len(branches)) as waiters:
+                futures = {name: waiters.submit(wait, name) for name in branches}
+                results = {name: future.result() for name, future in futures.items()}
+    finally:
+        _branches.clear()
+    return results
+
+
+def _tune_shard(modules: dict, train_features: tuple, tuning_params: dict, base_params: dict, shard_index: int,
+                num_shards: int, output_dir: str = None) -> tuple:
+    results = modules['model_tuning'].run_search(train_features, tuning_params, base_params, shard_index, num_shards)
+    if output_dir:
+        modules['model_tuning'].save_results(results, os.path.join(output_dir, f"trials_{shard_index}"))
+    return results, sum(score['rows'] for record in results['trials'] for score in record['scores'])
+
+
+def _evaluate(modules: dict, model, test_features: tuple, params: dict, output_dir: str = None) -> tuple:
+    evaluation_params = params.get('6_Model_Evaluation', {}) or {}
+    # The test set is already vectorized, so the inference pipeline is evaluated through its classifier
+    X_test, y_test = test_features
+    metrics = modules['model_evaluation'].evaluate_model(
+        getattr(model, 'classifier', model), X_test, y_test, chunk_size=evaluation_params.get('chunk_size', 10000),
+        n_resamples=evaluation_params.get('bootstrap_resamples', 1000),
+        confidence_level=evaluation_params.get('confidence_level', 0.95),
+        n_bins=evaluation_params.get('roc_bins', 1000), random_state=evaluation_params.get('random_state'))
+    if output_dir:
+        modules['model_evaluation'].save_metrics(metrics, os.path.join(output_dir, 'metrics'))
+    return metrics, X_test.shape[0]
+
+
+def _batch_score(modules: dict, model, input_path: str, text_column: str, params: dict, output_dir: str = None) -> tuple:
+    scoring_params = params.get('batch_scoring', {}) or {}
+    workers = scoring_params.get('workers', 1)
+    if workers < 0:
+        workers = os.cpu_count() or 1
+    fmt, compression = modules['batch_scoring'].artifact_settings(params)
+    scores_dir = os.path.join(output_dir, 'scores') if output_dir else None
+    summary = modules['batch_scoring'].score_file(
+        input_path, scores_dir, None, text_column=text_column, chunk_size=scoring_params.get('chunk_size', 10000),
+        workers=workers, fmt=fmt, compression=compression, encoding=scoring_params.get('encoding', 'utf-8'),
+        pipeline=model)
+    if scores_dir:
+        with open(os.path.join(scores_dir, 'summary.json'), 'w') as file:
+            json.dump(summary, file, indent=4)
+    return summary, summary['rows']
+
+
+def run(params: dict, data_url: str, text_column: str = 'text', target_column: str = 'target', preprocess_workers: int = 1,
+        tuning_shards: int = 2, score_data_url: str = '', score_text_column: str = 'text', workers: int = 1,
+        output_dir: str = None, save: tuple = (), recorder: StageRecorder = None, modules: dict = None) -> dict:
+    """
+    Execute the pipeline DAG in this process and return its in-memory outputs.
+
+    :param params: Parsed params.yaml
+    :param tuning_shards: Number of tuning shards (0 skips the search and trains with 4_Model_Training as is)
+    :param workers: Processes for independent branches (1 runs them one after the other)
+    :param output_dir: Directory the artifacts in `save` are written to (nothing is written without it)
+    :return: model, vectorizer, best_params, metrics and the batch scoring summary (when scored)
+    """
+    modules = modules or load_components()
+    recorder = recorder or StageRecorder.from_params('local_runner', params)
+    saved = lambda artifact: output_dir is not None and artifact in save
+    path = lambda artifact: os.path.join(output_dir, artifact)
+    fmt, compression = modules['ingest'].artifact_settings(params)
+    outputs = {}
+
+    # data_ingestion: the streaming mode's hash split assigns every row on its own, so applying it to the
+    # whole frame gives the same train/test rows as the pipeline
+    ingestion_params = params['1_Data_Ingestion']
+    with recorder.stage('data_ingestion') as stage:
+        df = modules['ingest'].preprocessing_data(modules['ingest'].load_data(data_url=data_url))
+        stage.rows = len(df)
+        if ingestion_params.get('streaming', False):
+            train_data, test_data = modules['ingest'].hash_split(df, ingestion_params['test_size'],
+                                                                 ingestion_params.get('random_state', 2))
+        else:
+            train_data, test_data = modules['ingest'].train_test_split(
+                df, test_size=ingestion_params['test_size'], random_state=ingestion_params.get('random_state', 2))
+        # Fresh frames, like the ones the next step reads back from the artifacts
+        train_data, test_data = train_data.reset_index(drop=True), test_data.reset_index(drop=True)
+        # Each split is written only when asked for, in the layout of the component's output
+        for artifact, data, name in (('train_data', train_data, 'train'), ('test_data', test_data, 'test')):
+            if saved(artifact):
+                modules['ingest'].write_dataset(data, path(artifact), name, fmt, compression)
+    del df
+
+    # data_preprocessing: one normalizer (or worker pool) shared by train and test, as in the component
+    preprocess = modules['preprocess']
+    with recorder.stage('data_preprocessing', rows=len(train_data) + len(test_data)):
+        tokenizer = tokenizer_from_params(params)
+        pool = preprocess.create_normalizer_pool(preprocess_workers, tokenizer=tokenizer) if preprocess_workers > 1 else None
+        normalizer = preprocess.create_normalizer(tokenizer=tokenizer) if pool is None else None
+        normalization_cache = preprocess.open_normalization_cache(params)
+        try:
+            train_processed = preprocess.preprocess_df(train_data, text_column, target_column, normalizer=normalizer,
+                                                       pool=pool, workers=preprocess_workers, cache=normalization_cache)
+            test_processed = preprocess.preprocess_df(test_data, text_column, target_column, normalizer=normalizer,
+                                                      pool=pool, workers=preprocess_workers, cache=normalization_cache)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+            if normalization_cache is not None:
+                preprocess.close_normalization_cache(normalization_cache)
+        for artifact, data, name in (('train_processed', train_processed, 'train'), ('test_processed', test_processed, 'test')):
+            if saved(artifact):
+                preprocess.write_dataset(data, path(artifact), name, fmt)
+    del train_data, test_data
+
+    # feature_engineering: features are cast to the stored dtype, so later steps see what they would load
+    feature_params = params['3_Feature_Engineering']
+    vectorizer_type = feature_params.get('vectorizer', 'tfidf')
+    feature_dtype = feature_params.get('feature_dtype', 'float32')
+    with recorder.stage('feature_engineering', rows=len(train_processed) + len(test_processed)):
+        features = modules['feature_engineering']
+        if vectorizer_type == 'hashing':
+            train_features, test_features, vectorizer = features.apply_hashing(train_processed, test_processed,
+                                                                               feature_params.get('hashing', {}) or {})
+        elif vectorizer_type == 'tfidf':
+            train_features, test_features, vectorizer = features.apply_tfidf(train_processed, test_processed,
+                                                                             feature_params['max_features'])
+        else:
+            raise ValueError(f"Unknown vectorizer '{vectorizer_type}'. Expected 'tfidf' or 'hashing'.")
+        train_features = (train_features[0].astype(feature_dtype, copy=False), train_features[1])
+        test_features = (test_features[0].astype(feature_dtype, copy=False), test_features[1])
+        for artifact, data, name in (('train_tfidf', train_features, 'train'), ('test_tfidf', test_features, 'test')):
+            if saved(artifact):
+                features.save_features(*data, path(artifact), name, dtype=feature_dtype)
+        if saved('vectorizer'):
+            features.save_vectorizer(vectorizer, path('vectorizer'))
+    del train_processed, test_processed
+    outputs['vectorizer'] = vectorizer
+
+    # model_tuning: one branch per shard, then select_best_trial
+    training_params = params['4_Model_Training']
+    best_params = None
+    if tuning_shards > 0:
+        trials_dir = output_dir if saved('trials') else None
+        shard_results = run_branches(recorder, {
+            f'model_tuning[{shard_index}]': (_tune_shard, (modules, train_features, params['5_Model_Tuning'], training_params,
+                                                           shard_index, tuning_shards, trials_dir))
+            for shard_index in range(tuning_shards)}, workers)
+        with recorder.stage('select_best_trial'):
+            best_params = modules['model_tuning'].best_trial(list(shard_results.values()))
+            training_params = modules['model_training'].apply_overrides(training_params, best_params['params'])
+            if saved('best_params'):
+                os.makedirs(path('best_params'), exist_ok=True)
+                with open(os.path.join(path('best_params'), 'best_params.json'), 'w') as file:
+                    json.dump(best_params, file, indent=4)
+    outputs['best_params'] = best_params
+
+    # train_model: the classifier is bundled with the normalizer and vectorizer into a raw-text pipeline
+    with recorder.stage('train_model', rows=train_features[0].shape[0]):
+        training = modules['model_training']
+        clf = training.train_model(train_features[0], train_features[1], training_params)
+        model = training.build_inference_pipeline(clf, vectorizer, tokenizer)
+        if saved('model'):
+            training.save_model(model, path('model'), (params.get('model_store', {}) or {}).get('compression'))
+    outputs['model'] = model
+    del train_features
+
+    # evaluate_model and batch_score both only need the model, so they are independent branches
+    branches = {'evaluate_model': (_evaluate, (modules, model, test_features, params,
+                                               output_dir if saved('metrics') else None))}
+    if score_data_url:
+        branches['batch_score'] = (_batch_score, (modules, model, score_data_url, score_text_column, params,
+                                                  output_dir if saved('scores') else None))
+    results = run_branches(recorder, branches, workers)
+    outputs['metrics'] = results['evaluate_model']
+    outputs['scoring'] = results.get('batch_score')
+    return outputs
+
+
+def main(param_file_path: str, data_url: str, text_column: str = 'text', target_column: str = 'target',
+         preprocess_workers: int = 1, tuning_shards: int = 2, score_data_url: str = '', score_text_column: str = 'text',
+         workers: int = 1, output_dir: str = None, save: list = None, verbose: bool = False) -> dict:
+    recorder = None
+    try:
+        with open(param_file_path, 'r') as file:
+            params = yaml.safe_load(file)
+        save = ['model', 'metrics', 'stage_metrics'] if save is None else save
+        unknown = sorted(set(save) - set(ARTIFACTS))
+        if unknown:
+            raise ValueError(f"Unknown artifacts {unknown}. Expected some of {ARTIFACTS}.")
+
+        modules = load_components(verbose)
+        recorder = StageRecorder.from_params('local_runner', params)
+        logger.info("Running the pipeline locally on %s (%d tuning shards, %d workers)", data_url, tuning_shards, workers)
+        outputs = run(params, data_url, text_column=text_column, target_column=target_column,
+                      preprocess_workers=preprocess_workers, tuning_shards=tuning_shards, score_data_url=score_data_url,
+                      score_text_column=score_text_column, workers=workers, output_dir=output_dir, save=save,
+                      recorder=recorder, modules=modules)
+
+        if outputs['best_params'] is not None:
+            logger.info("Best trial %d: %s=%.4f, %s", outputs['best_params']['trial'], outputs['best_params']['metric'],
+                        outputs['best_params']['score'], outputs['best_params']['params'])
+        logger.info("Accuracy %.4f, precision %.4f, recall %.4f, AUC %.4f", outputs['metrics']['accuracy'],
+                    outputs['metrics']['precision'], outputs['metrics']['recall'], outputs['metrics']['auc'])
+        if outputs['scoring'] is not None:
+            logger.info("Scored %d messages (%d spam)", outputs['scoring']['rows'], outputs['scoring']['spam'])
+        if output_dir and save:
+            logger.info("Saved %s to %s", ', '.join(save), output_dir)
+        return outputs
+    except Exception as e:
+        logger.error('Failed to run the pipeline locally: %s', e)
+        print(f"Error: {e}")
+    finally:
+        if recorder is not None:
+            logger.info("Stage metrics (total %.2fs):\n%s", recorder.to_dict()['total_seconds'], recorder.summary())
+            if output_dir and 'stage_metrics' in (save or []):
+                recorder.write(os.path.join(output_dir, 'stage_metrics'))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run the spam detection pipeline in one process, without Kubeflow")
+    parser.add_argument("--param_file_path", type=str, default=os.path.join(ROOT, 'params.yaml'), help="Path of the Params.yaml")
+    parser.add_argument("--data_url", type=str, default='https://raw.githubusercontent.com/PrakashD2003/DATASETS/main/spam.csv',
+                        help="Raw spam.csv (local path or URL)")
+    parser.add_argument("--text_column", type=str, default='text', help="Text column after ingestion")
+    parser.add_argument("--target_column", type=str, default='target', help="Target column after ingestion")
+    parser.add_argument("--preprocess_workers", type=int, default=1, help="Processes used for text normalization")
+    parser.add_argument("--tuning_shards", type=int, default=2, help="Tuning shards (0 trains with 4_Model_Training as is)")
+    parser.add_argument("--score_data_url", type=str, default='', help="Messages to batch score with the new model")
+    parser.add_argument("--score_text_column", type=str, default='text', help="Column of --score_data_url holding the messages")
+    parser.add_argument("--workers", type=int, default=1, help="Processes for independent branches (tuning shards, evaluation and scoring)")
+    parser.add_argument("--output_dir", type=str, default=None, help="Directory for the artifacts listed in --save (nothing is written without it)")
+    parser.add_argument("--save", type=str, nargs='*', default=None, choices=ARTIFACTS, metavar='ARTIFACT',
+                        help=f"Artifacts to write into --output_dir (default: model metrics stage_metrics; one of {', '.join(ARTIFACTS)})")
+    parser.add_argument("--verbose", action='store_true', help="Show the components' debug logs on the console")
+    args = parser.parse_args()
+    outputs = main(param_file_path=args.param_file_path, data_url=args.data_url, text_column=args.text_column,
+                   target_column=args.target_column, preprocess_workers=args.preprocess_workers,
+                   tuning_shards=args.tuning_shards, score_data_url=args.score_data_url,
+                   score_text_column=args.score_text_column, workers=args.workers, output_dir=args.output_dir,
+                   save=args.save, verbose=args.verbose)
+    sys.exit(0 if outputs is not None else 1)
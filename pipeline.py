@@ -1,5 +1,6 @@
+from typing import List
 from kfp import dsl, compiler
-from kfp.dsl import Input, Output, Dataset, Model, Metrics
+from kfp.dsl import Input, Output, Artifact, Dataset, Model, Metrics
 
 @dsl.container_component
 def data_ingestion(
@@ -7,6 +8,7 @@ def data_ingestion(
     data_url: str,
     train_data: Output[Dataset],
     test_data: Output[Dataset],
+    stage_metrics: Output[Metrics],
     )-> dsl.ContainerSpec:
     return dsl.ContainerSpec(
         image='prakash3112/kubeflow-pipeline:ingestv1',
@@ -15,18 +17,22 @@ def data_ingestion(
             param_file_path,
             data_url,
             train_data.path,
-            test_data.path
+            test_data.path,
+            '--stage_metrics_path', stage_metrics.path
         ]
     )
 
 @dsl.container_component
 def data_preprocessing(
+    param_file_path: str,
     train_data: Input[Dataset],
     test_data: Input[Dataset],
     text_column: str,
     target_column: str,
+    workers: int,
     train_processed: Output[Dataset],
     test_processed: Output[Dataset],
+    stage_metrics: Output[Metrics],
 )-> dsl.ContainerSpec:
     return dsl.ContainerSpec(
         image='prakash3112/kubeflow-pipeline:preprocess-v1',
@@ -37,7 +43,10 @@ def data_preprocessing(
             train_processed.path,
             test_processed.path,
             text_column,
-            target_column
+            target_column,
+            '--workers', workers,
+            '--param_file_path', param_file_path,
+            '--stage_metrics_path', stage_metrics.path
         ]
     )
 
@@ -50,6 +59,10 @@ def feature_engineering(
     test_processed: Input[Dataset],
     train_tfidf: Output[Dataset],
     test_tfidf: Output[Dataset],
+    vectorizer: Output[Model],
+    df_state: Output[Artifact],
+    stage_metrics: Output[Metrics],
+    previous_df_state: Input[Artifact] = None,
 )-> dsl.ContainerSpec:
     return dsl.ContainerSpec(
         image='prakash3112/kubeflow-pipeline:feature_engineering-v1',
@@ -59,30 +72,78 @@ def feature_engineering(
             train_processed.path,
             test_processed.path,
             train_tfidf.path,
-            test_tfidf.path
+            test_tfidf.path,
+            '--vectorizer_output_path', vectorizer.path,
+            '--df_state_output_path', df_state.path,
+            dsl.IfPresentPlaceholder(input_name='previous_df_state',
+                                     then=['--previous_df_state_path', previous_df_state.path]),
+            '--stage_metrics_path', stage_metrics.path
         ]
     )
 
+@dsl.container_component
+def tune_model(
+    param_file_path: str,
+    train_tfidf: Input[Dataset],
+    shard_index: int,
+    shards: list,
+    trials: Output[Artifact],
+    stage_metrics: Output[Metrics],
+)-> dsl.ContainerSpec:
+    return dsl.ContainerSpec(
+        image='prakash3112/kubeflow-pipeline:tune-v1',
+        command=['python', '/app/model_tuning.py'],
+        args=['search',
+              param_file_path,
+              train_tfidf.path,
+              trials.path,
+              '--shard_index', shard_index,
+              '--shards', shards,
+              '--stage_metrics_path', stage_metrics.path],
+    )
+
+# Fan-in of the tuning shards; a Python component because container components cannot take a list of artifacts
+@dsl.component(base_image='prakash3112/kubeflow-pipeline:tune-v1', install_kfp_package=False)
+def select_best_trial(
+    trials: Input[List[Artifact]],
+    best_params: Output[Artifact],
+):
+    import sys
+    sys.path.append('/app')
+    from model_tuning import select
+    select(result_dirs=[trial.path for trial in trials], output_dir=best_params.path)
+
 @dsl.container_component
 def train_model(
     param_file_path: str,
     train_tfidf: Input[Dataset],
+    best_params: Input[Artifact],
+    vectorizer: Input[Model],
     model: Output[Model],
+    stage_metrics: Output[Metrics],
+    previous_model: Input[Model] = None,
 )-> dsl.ContainerSpec:
     return dsl.ContainerSpec(
         image='prakash3112/kubeflow-pipeline:train-v1',
         command=['python', '/app/model_training.py'],
         args=[param_file_path, 
               train_tfidf.path, 
-              model.path],
+              model.path,
+              '--best_params_path', best_params.path,
+              '--vectorizer_path', vectorizer.path,
+              dsl.IfPresentPlaceholder(input_name='previous_model',
+                                       then=['--previous_model_path', previous_model.path]),
+              '--stage_metrics_path', stage_metrics.path],
     )
 
 
 @dsl.container_component
 def evaluate_model(
+    param_file_path: str,
     model: Input[Model],
     test_tfidf: Input[Dataset],
     metrics: Output[Metrics],
+    stage_metrics: Output[Metrics],
 )-> dsl.ContainerSpec:
     return dsl.ContainerSpec(
         image='prakash3112/kubeflow-pipeline:model_evaluation-v1',
@@ -90,7 +151,31 @@ def evaluate_model(
         args=[
             model.path,           # ✔ model_load_path
             test_tfidf.path,      # ✔ test_data_path
-            metrics.path
+            metrics.path,
+            '--param_file_path', param_file_path,
+            '--stage_metrics_path', stage_metrics.path
+        ]
+    )
+
+@dsl.container_component
+def batch_score(
+    param_file_path: str,
+    model: Input[Model],
+    input_url: str,
+    text_column: str,
+    scores: Output[Dataset],
+    stage_metrics: Output[Metrics],
+)-> dsl.ContainerSpec:
+    return dsl.ContainerSpec(
+        image='prakash3112/kubeflow-pipeline:batch_score-v1',
+        command=['python', '/app/batch_scoring.py'],
+        args=[
+            model.path,
+            input_url,
+            scores.path,
+            '--param_file_path', param_file_path,
+            '--text_column', text_column,
+            '--stage_metrics_path', stage_metrics.path
         ]
     )
 
@@ -98,6 +183,7 @@ def evaluate_model(
 def push_model(
     model: Input[Model],
     metrics: Input[Metrics],
+    test_data: Input[Dataset],
     repo_owner_name: str,
     repo_name: str,
     model_name: str,
@@ -105,6 +191,7 @@ def push_model(
     param_path: str,
     dagshub_username: str,
     dagshub_token: str,
+    stage_metrics: Output[Metrics],
 ) -> dsl.ContainerSpec:
     return dsl.ContainerSpec(
         image='prakash3112/kubeflow-pipeline:push_model-v2',
@@ -118,7 +205,9 @@ def push_model(
             model.path,
             metrics.path,
             dagshub_username,
-            dagshub_token
+            dagshub_token,
+            '--test_data_path', test_data.path,
+            '--stage_metrics_path', stage_metrics.path
         ]
     )
 
@@ -131,6 +220,12 @@ def spam_detection_pipeline(
     data_url: str = 'https://raw.githubusercontent.com/PrakashD2003/DATASETS/main/spam.csv',
     text_column: str = 'text',
     target_column: str = 'target',
+    preprocess_workers: int = 1,
+    previous_df_state_uri: str = '',
+    previous_model_uri: str = '',
+    tuning_shards: list = [0, 1],
+    score_data_url: str = '',
+    score_text_column: str = 'text',
     repo_owner_name: str = 'your_dagshub_username',
     repo_name: str = 'your_repo_name',
     model_name: str = 'spam_detection_model',
@@ -143,31 +238,92 @@ def spam_detection_pipeline(
                                data_url=data_url)
     
     preprocess_op = data_preprocessing(
+        param_file_path=param_file_path,
         train_data=ingest_op.outputs['train_data'],
         test_data=ingest_op.outputs['test_data'],
         text_column=text_column,
-        target_column=target_column
+        target_column=target_column,
+        workers=preprocess_workers
     )
 
-    feature_op = feature_engineering(
-        param_file_path=param_file_path,
-        train_processed=preprocess_op.outputs['train_processed'],
-        test_processed=preprocess_op.outputs['test_processed']
-    )
+    # Continue the TF-IDF document frequencies of an earlier run (its df_state artifact URI) when one is given
+    with dsl.If(previous_df_state_uri != '', name='incremental-vocabulary'):
+        df_state_importer = dsl.importer(
+            artifact_uri=previous_df_state_uri,
+            artifact_class=Artifact,
+            reimport=False
+        )
+        incremental_feature_op = feature_engineering(
+            param_file_path=param_file_path,
+            train_processed=preprocess_op.outputs['train_processed'],
+            test_processed=preprocess_op.outputs['test_processed'],
+            previous_df_state=df_state_importer.output
+        )
+    with dsl.Else(name='full-vocabulary'):
+        full_feature_op = feature_engineering(
+            param_file_path=param_file_path,
+            train_processed=preprocess_op.outputs['train_processed'],
+            test_processed=preprocess_op.outputs['test_processed']
+        )
+    train_tfidf = dsl.OneOf(incremental_feature_op.outputs['train_tfidf'], full_feature_op.outputs['train_tfidf'])
+    test_tfidf = dsl.OneOf(incremental_feature_op.outputs['test_tfidf'], full_feature_op.outputs['test_tfidf'])
+    vectorizer = dsl.OneOf(incremental_feature_op.outputs['vectorizer'], full_feature_op.outputs['vectorizer'])
 
-    train_op = train_model(
-        param_file_path=param_file_path,
-        train_tfidf=feature_op.outputs['train_tfidf']
+    # One tuning pod per shard index; each runs its share of the trials
+    with dsl.ParallelFor(tuning_shards) as shard_index:
+        tune_op = tune_model(
+            param_file_path=param_file_path,
+            train_tfidf=train_tfidf,
+            shard_index=shard_index,
+            shards=tuning_shards
+        )
+
+    select_op = select_best_trial(
+        trials=dsl.Collected(tune_op.outputs['trials'])
     )
 
+    # Extend an earlier run's model (its model artifact URI) when one is given and 4_Model_Training.warm_start is on
+    with dsl.If(previous_model_uri != '', name='incremental-training'):
+        previous_model_importer = dsl.importer(
+            artifact_uri=previous_model_uri,
+            artifact_class=Model,
+            reimport=False
+        )
+        incremental_train_op = train_model(
+            param_file_path=param_file_path,
+            train_tfidf=train_tfidf,
+            best_params=select_op.outputs['best_params'],
+            vectorizer=vectorizer,
+            previous_model=previous_model_importer.output
+        )
+    with dsl.Else(name='full-training'):
+        full_train_op = train_model(
+            param_file_path=param_file_path,
+            train_tfidf=train_tfidf,
+            best_params=select_op.outputs['best_params'],
+            vectorizer=vectorizer
+        )
+    model = dsl.OneOf(incremental_train_op.outputs['model'], full_train_op.outputs['model'])
+
     evaluate_op = evaluate_model(
-        model=train_op.outputs['model'],
-        test_tfidf=feature_op.outputs['test_tfidf']
+        param_file_path=param_file_path,
+        model=model,
+        test_tfidf=test_tfidf
     )
 
+    # Score a backlog of raw messages with the new model when a file is given
+    with dsl.If(score_data_url != '', name='score-backlog'):
+        batch_score(
+            param_file_path=param_file_path,
+            model=model,
+            input_url=score_data_url,
+            text_column=score_text_column
+        )
+
     push_op = push_model(
-        model=train_op.outputs['model'],
+        model=model,
         metrics=evaluate_op.outputs['metrics'],
+        test_data=preprocess_op.outputs['test_processed'],
         repo_owner_name=repo_owner_name,
         repo_name=repo_name,
         model_name=model_name,
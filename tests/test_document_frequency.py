@@ -0,0 +1,82 @@
+"""DocumentFrequencyState must rebuild exactly the TfidfVectorizer a full refit gives."""
+import os
+import sys
+
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT_DIR, 'components', 'common'))
+sys.path.append(os.path.join(ROOT_DIR, 'benchmarks'))
+
+from document_frequency import DocumentFrequencyState  # noqa: E402
+from synthetic_sms import generate_messages  # noqa: E402
+
+# Every term occurs exactly twice, so any max_features below the vocabulary size cuts through a tie
+TIED = ["alpha beta", "gamma delta", "beta alpha", "delta gamma", "epsilon zeta eta", "eta zeta epsilon"]
+
+
+def corpus(n_messages: int, seed: int):
+    return [text for _, text in generate_messages(n_messages, seed=seed, noise=0.1)]
+
+
+def assert_same_vectorizer(rebuilt: TfidfVectorizer, fitted: TfidfVectorizer, texts):
+    assert rebuilt.vocabulary_ == fitted.vocabulary_
+    np.testing.assert_array_equal(rebuilt.idf_, fitted.idf_)
+    np.testing.assert_array_equal(rebuilt.transform(texts).toarray(), fitted.transform(texts).toarray())
+
+
+@pytest.mark.parametrize('max_features', [None, 1, 3, 5, 7, 50])
+def test_matches_full_refit_with_ties(max_features):
+    state = DocumentFrequencyState()
+    state.update(TIED)
+    assert_same_vectorizer(state.vectorizer(max_features),
+                           TfidfVectorizer(max_features=max_features).fit(TIED), TIED)
+
+
+@pytest.mark.parametrize('max_features', [None, 10, 40, 100])
+def test_incremental_updates_match_full_refit(max_features):
+    texts = corpus(600, seed=1)
+    # Repeated messages must be counted as often as they occur
+    texts += texts[:50]
+    state = DocumentFrequencyState()
+    for end in (200, 450, len(texts)):
+        rows = state.new_rows(texts[:end])
+        state.update([texts[i] for i in rows])
+    assert state.n_documents == len(texts)
+    assert_same_vectorizer(state.vectorizer(max_features),
+                           TfidfVectorizer(max_features=max_features).fit(texts), texts)
+
+
+def test_new_rows_skips_counted_documents():
+    texts = ["a b", "c d", "a b"]
+    state = DocumentFrequencyState()
+    state.update(texts[:2])
+    np.testing.assert_array_equal(state.new_rows(texts), [2])
+    state.update(["a b"])
+    assert len(state.new_rows(texts)) == 0
+
+
+def test_new_rows_signals_rebuild_when_documents_leave():
+    state = DocumentFrequencyState()
+    state.update(["a b", "c d"])
+    assert state.new_rows(["a b", "e f"]) is None
+
+
+def test_save_and_load(tmp_path):
+    texts = corpus(300, seed=2)
+    state = DocumentFrequencyState()
+    state.update(texts)
+    state.save(str(tmp_path))
+    assert DocumentFrequencyState.exists(str(tmp_path))
+
+    loaded = DocumentFrequencyState.load(str(tmp_path))
+    assert loaded.n_documents == state.n_documents
+    assert len(loaded.new_rows(texts)) == 0
+    assert_same_vectorizer(loaded.vectorizer(25), TfidfVectorizer(max_features=25).fit(texts), texts)
+
+
+def test_empty_state_has_no_vocabulary():
+    with pytest.raises(ValueError):
+        DocumentFrequencyState().vectorizer()
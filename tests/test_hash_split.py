@@ -0,0 +1,63 @@
+"""hash_split must split rows in the requested proportion, reproducibly and independently of chunking."""
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT_DIR, 'components', 'data-ingestion'))
+sys.path.append(os.path.join(ROOT_DIR, 'benchmarks'))
+
+from ingest import hash_split  # noqa: E402
+from synthetic_sms import generate_messages  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def df():
+    frame = pd.DataFrame(generate_messages(20000, seed=3), columns=['target', 'text'])
+    # Make every row distinct so the hashes of the rows are independent
+    frame['text'] = frame['text'] + ' #' + frame.index.astype(str)
+    return frame
+
+
+@pytest.mark.parametrize('test_size', [0.1, 0.3, 0.5, 0.8])
+def test_fraction(df, test_size):
+    train, test = hash_split(df, test_size=test_size, seed=2)
+    # The binomial standard deviation at 20000 rows is below 0.004
+    assert abs(len(test) / len(df) - test_size) < 0.02
+    assert len(train) + len(test) == len(df)
+
+
+def test_partition(df):
+    train, test = hash_split(df, test_size=0.3, seed=2)
+    assert set(train.index).isdisjoint(test.index)
+    assert set(train.index) | set(test.index) == set(df.index)
+
+
+def test_deterministic(df):
+    first_train, first_test = hash_split(df, test_size=0.3, seed=2)
+    second_train, second_test = hash_split(df, test_size=0.3, seed=2)
+    pd.testing.assert_frame_equal(first_train, second_train)
+    pd.testing.assert_frame_equal(first_test, second_test)
+
+
+def test_seed_changes_split(df):
+    _, first_test = hash_split(df, test_size=0.3, seed=2)
+    _, second_test = hash_split(df, test_size=0.3, seed=3)
+    assert set(first_test.index) != set(second_test.index)
+
+
+def test_independent_of_chunking_and_order(df):
+    _, whole_test = hash_split(df, test_size=0.3, seed=2)
+    chunked_test = pd.concat([hash_split(df.iloc[start:start + 1234], test_size=0.3, seed=2)[1]
+                              for start in range(0, len(df), 1234)])
+    shuffled_test = hash_split(df.sample(frac=1.0, random_state=0), test_size=0.3, seed=2)[1]
+    assert set(chunked_test.index) == set(whole_test.index)
+    assert set(shuffled_test.index) == set(whole_test.index)
+
+
+@pytest.mark.parametrize('test_size', [0, 1, -0.1, 1.5])
+def test_invalid_test_size(df, test_size):
+    with pytest.raises(ValueError):
+        hash_split(df.head(10), test_size=test_size, seed=2)
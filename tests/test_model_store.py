@@ -0,0 +1,107 @@
+"""model.mstore round-trips models and rejects corrupted or truncated files."""
+import os
+import sys
+import pickle
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT_DIR, 'components', 'common'))
+
+from model_store import LEGACY_FILE, load_model, read_manifest, save_model, store_path  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def data():
+    rng = np.random.default_rng(0)
+    X = rng.random((200, 20))
+    y = (X[:, 0] + X[:, 1] > 1).astype(int)
+    return X, y
+
+
+@pytest.fixture(scope='module', params=['random_forest', 'logistic_regression'])
+def model(request, data):
+    X, y = data
+    if request.param == 'random_forest':
+        return RandomForestClassifier(n_estimators=5, random_state=0).fit(X, y)
+    return LogisticRegression().fit(X, y)
+
+
+def _corrupt(path: str, offset_from_end: int) -> None:
+    with open(path, 'r+b') as file:
+        file.seek(-offset_from_end, os.SEEK_END)
+        byte = file.read(1)
+        file.seek(-offset_from_end, os.SEEK_END)
+        file.write(bytes([byte[0] ^ 0xFF]))
+
+
+@pytest.mark.parametrize('compression', ['none', 'zlib', 'lz4', 'zstd'])
+@pytest.mark.parametrize('use_mmap', [True, False])
+def test_round_trip(tmp_path, model, data, compression, use_mmap):
+    X, _ = data
+    save_model(model, str(tmp_path), compression=compression)
+    assert read_manifest(store_path(str(tmp_path)))['compression'] == compression
+
+    loaded = load_model(str(tmp_path), use_mmap=use_mmap)
+    assert type(loaded) is type(model)
+    np.testing.assert_array_equal(loaded.predict_proba(X), model.predict_proba(X))
+
+
+def test_loaded_model_is_writable(tmp_path, data):
+    X, y = data
+    save_model(LogisticRegression().fit(X, y), str(tmp_path))
+    loaded = load_model(str(tmp_path))
+    # The map is copy-on-write: changing the loaded model leaves the file intact
+    loaded.coef_[:] = 0.0
+    assert np.any(load_model(str(tmp_path)).coef_ != 0.0)
+
+
+@pytest.mark.parametrize('offset_from_end', [1, 100])
+def test_checksum_mismatch_is_rejected(tmp_path, model, offset_from_end):
+    path = save_model(model, str(tmp_path))
+    _corrupt(path, offset_from_end)
+    with pytest.raises(ValueError, match='Checksum mismatch'):
+        load_model(str(tmp_path))
+
+
+def test_unverified_load_skips_checksum(tmp_path, data):
+    X, y = data
+    path = save_model(LogisticRegression().fit(X, y), str(tmp_path))
+    # Zero padding at the end of the payload is covered by the checksum but not read by pickle
+    with open(path, 'rb') as file:
+        assert file.read()[-1] == 0
+    _corrupt(path, 1)
+    with pytest.raises(ValueError):
+        load_model(str(tmp_path))
+    assert isinstance(load_model(str(tmp_path), verify=False), LogisticRegression)
+
+
+def test_truncated_file_is_rejected(tmp_path, model):
+    path = save_model(model, str(tmp_path))
+    with open(path, 'r+b') as file:
+        file.truncate(os.path.getsize(path) - 64)
+    with pytest.raises(ValueError, match='truncated'):
+        load_model(str(tmp_path))
+
+
+def test_bad_magic_is_rejected(tmp_path, model):
+    path = save_model(model, str(tmp_path))
+    with open(path, 'r+b') as file:
+        file.write(b'NOTASTOR')
+    with pytest.raises(ValueError, match='magic'):
+        load_model(str(tmp_path))
+
+
+def test_legacy_pickle_is_loaded(tmp_path, model, data):
+    X, _ = data
+    with open(os.path.join(str(tmp_path), LEGACY_FILE), 'wb') as file:
+        pickle.dump(model, file)
+    np.testing.assert_array_equal(load_model(str(tmp_path)).predict(X), model.predict(X))
+
+
+def test_missing_model_raises(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        load_model(str(tmp_path))
@@ -0,0 +1,59 @@
+"""TextNormalizer with the default 'nltk' tokenizer must match the original per-row transform_text."""
+import os
+import sys
+import string
+
+import pytest
+import nltk
+from nltk.corpus import stopwords
+from nltk.stem.porter import PorterStemmer
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT_DIR, 'components', 'common'))
+sys.path.append(os.path.join(ROOT_DIR, 'benchmarks'))
+
+from text_normalizer import TextNormalizer  # noqa: E402
+from synthetic_sms import generate_messages  # noqa: E402
+
+MESSAGES = [
+    "",
+    "   ",
+    "Go until jurong point, crazy.. Available only in bugis n great world la e buffet... Cine there got amore wat...",
+    "FREE entry in 2 a wkly comp to win FA Cup final tkts 21st May 2005. Text FA to 87121 to receive entry question(std txt rate)T&C's apply 08452810075over18's",
+    "I don't think he goes to usf, he lives around here though",
+    "WINNER!! As a valued network customer you have been selected to receivea £900 prize reward!",
+    "Call me at 555-1234 or e-mail me@example.com :) &lt;#&gt;",
+    "U.S. visa? naïve café résumé... isn't it ok?!",
+    "Running runs ran RUNNER runner's",
+    "<b>html</b> https://www.example.com/win?a=1&b=2",
+]
+
+
+# Original implementation of transform_text from preprocess.py, kept as the reference
+def legacy_transform_text(text: str) -> str:
+    ps = PorterStemmer()
+    text = text.lower()
+    text = nltk.word_tokenize(text)
+    text = [word for word in text if word.isalnum()]
+    text = [word for word in text if word not in stopwords.words('english')]
+    text = [word for word in text if word not in string.punctuation]
+    text = [ps.stem(word) for word in text]
+    return " ".join(text)
+
+
+@pytest.mark.parametrize('text', MESSAGES)
+def test_normalize_matches_legacy(text):
+    assert TextNormalizer(tokenizer='nltk').normalize(text) == legacy_transform_text(text)
+
+
+def test_normalize_batch_matches_legacy():
+    texts = MESSAGES + [text for _, text in generate_messages(500, seed=7)]
+    # Repeated messages are normalized once per batch; the small stem cache also forces evictions
+    normalized = TextNormalizer(tokenizer='nltk', stem_cache_size=64).normalize_batch(texts + texts)
+    expected = [legacy_transform_text(text) for text in texts]
+    assert normalized == expected + expected
+    assert all(isinstance(text, str) for text in normalized)
+
+
+def test_default_tokenizer_is_nltk():
+    assert TextNormalizer().tokenizer == 'nltk'